@@ -21,12 +21,17 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import
+
 import sys
+import signal
 import logging
 import argparse
 import textwrap
+from acmedns import metrics
 from acmedns.config import ConfigurationManager
-from acmedns.domain import DomainManager
+from acmedns.daemon import RenewalDaemon
+from acmedns.domain import DomainManager, SignResult
 
 
 def main(argv):
@@ -39,19 +44,43 @@ def main(argv):
 
             ===Example Usage===
             python acmedns.py --config acmedns.conf
+            python acmedns.py --config acmedns.conf --daemon
+            python3 acmedns.py --config acmedns.conf --async
             ===================
 
             """)
     )
     parser.add_argument("--config", required=True, help="path to your acmedns config file")
     parser.add_argument("--log", default='info', help="define log level")
+    parser.add_argument("--workers", type=int, help="number of CSR signed concurrently (overrides config)")
+    parser.add_argument("--daemon", action="store_true", help="keep running and renew certificates when due")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="sign CSR concurrently on an asyncio event loop, 100 at once unless --workers "
+                             "(Python 3, ACME v2); waits are coroutines, HTTP requests and file I/O run in "
+                             "executor threads")
+    parser.add_argument("--metrics-textfile", help="write timing metrics to this Prometheus textfile")
+    parser.add_argument("--metrics-json", help="write a JSON summary of timing metrics to this file")
     args = parser.parse_args(argv)
+    if args.use_async and (args.daemon or sys.version_info < (3, 5)):
+        parser.error("--async requires Python 3 and cannot be used with --daemon")
     numeric_level = getattr(logging, args.log.upper(), None)
     logging.basicConfig(level=numeric_level)
+    if args.metrics_textfile or args.metrics_json:
+        metrics.enable(args.metrics_textfile, args.metrics_json)
+
+    if args.daemon:
+        daemon = RenewalDaemon(args.config, args.workers)
+        signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+        daemon.run()
+        return 0
 
     config_mngt = ConfigurationManager.from_filename(args.config)
-    domain_mngt = DomainManager.from_config(config_mngt)
-    domain_mngt.sign_all()
+    domain_mngt = DomainManager.from_config(config_mngt, args.workers, args.use_async)
+    results = domain_mngt.sign_all()
+    metrics.export()
+    if [result for result in results if result.status == SignResult.FAILED]:
+        return 1
+    return 0
 
 if __name__ == "__main__":
-    main(sys.argv[1:])
+    sys.exit(main(sys.argv[1:]))
@@ -1,3 +1,6 @@
 #from config import ConfigurationManager
-from client import ClientConfig
-from client import Client
\ No newline at end of file
+from __future__ import absolute_import
+
+from acmedns.client import ClientConfig
+from acmedns.client import Client
+from acmedns.client_v2 import ClientV2
\ No newline at end of file
@@ -1,3 +1,5 @@
-from adapter import Adapter
-from ovh_adapter import OvhAdapter
-from manual_adapter import ManualAdapter
+from __future__ import absolute_import
+
+from acmedns.adapter.adapter import Adapter
+from acmedns.adapter.ovh_adapter import OvhAdapter
+from acmedns.adapter.manual_adapter import ManualAdapter
@@ -20,6 +20,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import
+
 import abc
 
 
@@ -37,3 +39,23 @@ class Adapter(object):
     @abc.abstractmethod
     def delete_challenge(self, record):
         raise NotImplementedError('users must define delete_challenge to use this base class')
+
+    def list_zones(self):
+        """
+        Return the names of the DNS zones managed by the adapter, or None when unknown.
+        """
+        return None
+
+    def deploy_challenges(self, challenges):
+        """
+        Deploy a batch of challenges given as (basedomain, subdomain, token) tuples and return their records.
+        Adapters able to group API calls should override it, default deploys each challenge in turn.
+        """
+        return [self.deploy_challenge(basedomain, subdomain, token) for basedomain, subdomain, token in challenges]
+
+    def delete_challenges(self, records):
+        """
+        Delete a batch of records returned by deploy_challenge or deploy_challenges.
+        """
+        for record in records:
+            self.delete_challenge(record)
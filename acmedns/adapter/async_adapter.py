@@ -0,0 +1,120 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Adapter interface for asyncio clients, Python 3 only.
+"""
+
+import abc
+import asyncio
+import logging
+from acmedns.adapter.adapter import Adapter
+
+log = logging.getLogger(__name__)
+
+
+class AsyncAdapter(abc.ABC):
+
+    @abc.abstractmethod
+    def setup(self, params):
+        raise NotImplementedError('users must define setup to use this base class')
+
+    @abc.abstractmethod
+    async def deploy_challenge(self, basedomain, subdomain, token):
+        raise NotImplementedError('users must define deploy_challenge to use this base class')
+
+    @abc.abstractmethod
+    async def delete_challenge(self, record):
+        raise NotImplementedError('users must define delete_challenge to use this base class')
+
+    def list_zones(self):
+        """
+        Return the names of the DNS zones managed by the adapter, or None when unknown. Called from
+        the loop executor.
+        """
+        return None
+
+    async def deploy_challenges(self, challenges):
+        """
+        Deploy a batch of challenges given as (basedomain, subdomain, token) tuples concurrently and
+        return their records. The records already deployed are deleted when one deployment fails.
+        """
+        results = await asyncio.gather(*[self.deploy_challenge(basedomain, subdomain, token)
+                                         for basedomain, subdomain, token in challenges], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            await self.delete_challenges([result for result in results if not isinstance(result, Exception)])
+            raise errors[0]
+        return results
+
+    async def delete_challenges(self, records):
+        """
+        Delete a batch of records returned by deploy_challenge or deploy_challenges concurrently.
+        """
+        results = await asyncio.gather(*[self.delete_challenge(record) for record in records],
+                                       return_exceptions=True)
+        for record, result in zip(records, results):
+            if isinstance(result, Exception):
+                log.error("Error deleting challenge %s: %s", record, result)
+
+
+class SyncAdapter(AsyncAdapter):
+    '''
+    Run a blocking Adapter in ``executor``, the event loop default executor when None.
+    '''
+
+    def __init__(self, adapter, executor=None):
+        self.adapter = adapter
+        self.executor = executor
+
+    def setup(self, params):
+        self.adapter.setup(params)
+
+    def list_zones(self):
+        return self.adapter.list_zones()
+
+    async def __run(self, function, *args):
+        return await asyncio.get_event_loop().run_in_executor(self.executor, function, *args)
+
+    async def deploy_challenge(self, basedomain, subdomain, token):
+        return await self.__run(self.adapter.deploy_challenge, basedomain, subdomain, token)
+
+    async def delete_challenge(self, record):
+        return await self.__run(self.adapter.delete_challenge, record)
+
+    async def deploy_challenges(self, challenges):
+        # keep the batching of the wrapped adapter
+        return await self.__run(self.adapter.deploy_challenges, challenges)
+
+    async def delete_challenges(self, records):
+        return await self.__run(self.adapter.delete_challenges, records)
+
+
+def async_adapter(adapter):
+    """
+    Return ``adapter`` as an AsyncAdapter, wrapping blocking adapters.
+    """
+    if isinstance(adapter, AsyncAdapter):
+        return adapter
+    if isinstance(adapter, Adapter):
+        return SyncAdapter(adapter)
+    raise ValueError("Not an adapter: {0}".format(adapter))
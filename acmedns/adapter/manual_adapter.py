@@ -20,8 +20,15 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import, print_function
+
 from acmedns.adapter.adapter import Adapter
 
+try:
+    input = raw_input  # Python 2
+except NameError:
+    pass
+
 
 class ManualAdapter(Adapter):
 
@@ -29,10 +36,10 @@ class ManualAdapter(Adapter):
         pass
 
     def deploy_challenge(self, basedomain, subdomain, tokenin):
-        print "Deploy challenge in TXT domain: {0} subdomain: {1} value: {2}".format(basedomain, subdomain, tokenin)
-        raw_input("and press Enter to continue...")
+        print("Deploy challenge in TXT domain: {0} subdomain: {1} value: {2}".format(basedomain, subdomain, tokenin))
+        input("and press Enter to continue...")
         return subdomain
 
     def delete_challenge(self, record):
-        print "Please remove TXT entry %s" % record
-        raw_input("and press Enter to continue...")
+        print("Please remove TXT entry %s" % record)
+        input("and press Enter to continue...")
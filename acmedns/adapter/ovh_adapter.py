@@ -20,9 +20,10 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import
+
 import logging
-import ovh
-from adapter import Adapter
+from acmedns.adapter.adapter import Adapter
 
 log = logging.getLogger(__name__)
 
@@ -34,26 +35,79 @@ class OvhAdapter(Adapter):
         self.application_key = None
         self.application_secret = None
         self.consumer_key = None
-        self.client = None
+        self.__client = None
 
     def setup(self, params):
         self.endpoint = params['endpoint']
         self.application_key = params['application_key']
         self.application_secret = params['application_secret']
         self.consumer_key = params['consumer_key']
-        self.client = ovh.Client(self.endpoint, self.application_key, self.application_secret, self.consumer_key)
 
-    def deploy_challenge(self, basedomain, subdomain, tokenin):
-        token = "\"" + tokenin + "\""
-        log.info("Deploy challenge in TXT domain: {0} subdomain: {1}".format(basedomain, subdomain))
-        record = self.client.post('/domain/zone/%s/record' % basedomain, fieldType="TXT", subDomain=subdomain, ttl=60,
-                                  target=token)
-        log.debug("Deploy record id: {0}".format(record))
+    @property
+    def client(self):
+        # ovh is imported on first API call, runs with nothing to sign do not load it
+        if self.__client is None:
+            import ovh
+            self.__client = ovh.Client(self.endpoint, self.application_key, self.application_secret,
+                                       self.consumer_key)
+        return self.__client
 
-        self.client.post('/domain/zone/%s/refresh' % basedomain)
+    @client.setter
+    def client(self, client):
+        self.__client = client
 
-        return record
+    def list_zones(self):
+        return self.client.get('/domain/zone')
+
+    def deploy_challenge(self, basedomain, subdomain, tokenin):
+        return self.deploy_challenges([(basedomain, subdomain, tokenin)])[0]
 
     def delete_challenge(self, record):
-        self.client.delete('/domain/zone/%s/record/%s' % (record['zone'], record['id']))
-        self.client.post('/domain/zone/%s/refresh' % record['zone'])
+        self.delete_challenges([record])
+
+    def deploy_challenges(self, challenges):
+        records = []
+        try:
+            for basedomain, subdomain, tokenin in challenges:
+                token = "\"" + tokenin + "\""
+                log.info("Deploy challenge in TXT domain: {0} subdomain: {1}".format(basedomain, subdomain))
+                record = self.client.post('/domain/zone/%s/record' % basedomain, fieldType="TXT",
+                                          subDomain=subdomain, ttl=60, target=token)
+                log.debug("Deploy record id: {0}".format(record))
+                records.append(record)
+        except:
+            self.__delete_records(records)
+            raise
+
+        self.__refresh_zones(records)
+        return records
+
+    def delete_challenges(self, records):
+        errors = self.__delete_records(records)
+        if errors:
+            raise errors[0]
+
+    def __delete_records(self, records):
+        # delete every record and refresh their zones even when a deletion fails, return the errors
+        from ovh.exceptions import ResourceNotFoundError
+        errors = []
+        for record in records:
+            try:
+                self.client.delete('/domain/zone/%s/record/%s' % (record['zone'], record['id']))
+            except ResourceNotFoundError:
+                # already deleted by a previous attempt
+                log.debug("Record %s of %s already deleted", record['id'], record['zone'])
+            except Exception as e:
+                log.error("Error deleting record %s of %s: %s", record['id'], record['zone'], e)
+                errors.append(e)
+        self.__refresh_zones(records)
+        return errors
+
+    def __refresh_zones(self, records):
+        # refresh each zone once per batch, OVH throttles zone refresh
+        zones = []
+        for record in records:
+            if record['zone'] not in zones:
+                zones.append(record['zone'])
+        for zone in zones:
+            self.client.post('/domain/zone/%s/refresh' % zone)
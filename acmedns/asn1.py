@@ -0,0 +1,151 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Minimal DER decoder, enough to read RSA keys, certificate signing requests and certificates
+without forking openssl.
+"""
+
+from __future__ import absolute_import
+
+import base64
+import binascii
+import re
+import textwrap
+
+INTEGER = 0x02
+BIT_STRING = 0x03
+OCTET_STRING = 0x04
+OBJECT_IDENTIFIER = 0x06
+UTF8_STRING = 0x0c
+PRINTABLE_STRING = 0x13
+IA5_STRING = 0x16
+UTC_TIME = 0x17
+GENERALIZED_TIME = 0x18
+SEQUENCE = 0x30
+SET = 0x31
+
+PEM_RE = re.compile(r"-----BEGIN ([A-Z0-9 ]+)-----\s*(.+?)\s*-----END \1-----", re.DOTALL)
+
+
+class Element(object):
+    '''
+    A decoded DER element, ``content`` holds the value bytes and ``der`` the full encoding.
+    '''
+
+    def __init__(self, tag, content, der):
+        self.tag = tag
+        self.content = content
+        self.der = der
+
+    def children(self):
+        return decode_all(self.content)
+
+    def integer(self):
+        if not self.content:
+            return 0
+        value = int(binascii.hexlify(self.content), 16)
+        if bytearray(self.content)[0] & 0x80:
+            value -= 1 << (8 * len(self.content))
+        return value
+
+    def oid(self):
+        content = bytearray(self.content)
+        arcs = [content[0] // 40, content[0] % 40]
+        value = 0
+        for byte in content[1:]:
+            value = (value << 7) | (byte & 0x7f)
+            if not byte & 0x80:
+                arcs.append(value)
+                value = 0
+        return ".".join(str(arc) for arc in arcs)
+
+    def bit_string(self):
+        # first byte is the number of unused bits, always 0 for keys and signatures
+        return self.content[1:]
+
+    def string(self):
+        return self.content.decode('utf8')
+
+    def __repr__(self):
+        return "Element(0x{0:02x}, {1} bytes)".format(self.tag, len(self.content))
+
+
+def decode(data, offset=0):
+    """
+    Decode the DER element at ``offset`` and return it with the offset of the next element.
+    """
+    raw = bytearray(data[offset:offset + 6])
+    if len(raw) < 2:
+        raise ValueError("Truncated DER element at offset {0}".format(offset))
+    tag = raw[0]
+    length = raw[1]
+    header = 2
+    if length & 0x80:
+        size = length & 0x7f
+        if size == 0 or size > 4:
+            raise ValueError("Unsupported DER length at offset {0}".format(offset))
+        length = int(binascii.hexlify(data[offset + 2:offset + 2 + size]), 16)
+        header += size
+    end = offset + header + length
+    if end > len(data):
+        raise ValueError("Truncated DER element at offset {0}".format(offset))
+    return Element(tag, data[offset + header:end], data[offset:end]), end
+
+
+def decode_all(data):
+    elements = []
+    offset = 0
+    while offset < len(data):
+        element, offset = decode(data, offset)
+        elements.append(element)
+    return elements
+
+
+def pem_to_der(text, label=None):
+    """
+    Return ``(label, der)`` of the first PEM block of ``text``, restricted to ``label`` when given.
+    Data that is not PEM is returned unchanged as DER.
+    """
+    if isinstance(text, bytes):
+        try:
+            text = text.decode('ascii')
+        except UnicodeDecodeError:
+            return None, text
+    for match in PEM_RE.finditer(text):
+        if label is None or match.group(1) == label:
+            return match.group(1), base64.b64decode(re.sub(r"\s", "", match.group(2)))
+    if "-----BEGIN" in text:
+        raise ValueError("No PEM {0} block found".format(label or ''))
+    return None, text.encode('latin1')
+
+
+def der_to_pem(der, label='CERTIFICATE'):
+    return "-----BEGIN {0}-----\n{1}\n-----END {0}-----\n".format(
+        label, "\n".join(textwrap.wrap(base64.b64encode(der).decode('ascii'), 64)))
+
+
+def int_to_bytes(value):
+    hexa = "{0:x}".format(value)
+    if len(hexa) % 2:
+        hexa = "0" + hexa
+    return binascii.unhexlify(hexa.encode('utf8'))
@@ -0,0 +1,375 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Asyncio ACME v2 client, Python 3 only.
+
+Waits are coroutines: a single event loop drives many issuances and their pending challenges at once,
+deploying, checking and deleting challenge records concurrently. The protocol is the one of ClientV2,
+whose blocking calls, HTTP requests, account key signatures and file I/O, run in threads of the loop
+default executor, so they are not coroutines and remain bounded by the executor size.
+
+DomainManager signs with an AsyncClient when ``use_async`` is set, see :func:`sign_domains`.
+"""
+
+import asyncio
+import logging
+import struct
+import time
+from acmedns import client_v2, metrics
+from acmedns.adapter.async_adapter import async_adapter
+from acmedns.client import ValidationError
+from acmedns.domain import SignResult
+from acmedns.lazy import LazyModule
+from acmedns.poller import PENDING_STATUS, StatusPoller
+from acmedns.propagation import PropagationChecker, resolve_txt, txt_values
+
+dns = LazyModule('dns', 'dns.exception', 'dns.flags', 'dns.message')
+log = logging.getLogger(__name__)
+
+#: seconds between attempts to acquire the pending authorizations of a CSR
+ACQUIRE_DELAY = 1
+
+
+async def run_blocking(function, *args):
+    """
+    Return the result of the blocking call ``function(*args)`` run in the loop default executor.
+    """
+    return await asyncio.get_event_loop().run_in_executor(None, function, *args)
+
+
+class _DnsProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, request, future):
+        self.request = request
+        self.future = future
+
+    def connection_made(self, transport):
+        transport.sendto(self.request.to_wire())
+
+    def datagram_received(self, data, addr):
+        try:
+            response = dns.message.from_wire(data)
+        except dns.exception.DNSException:
+            return
+        if self.request.is_response(response) and not self.future.done():
+            self.future.set_result(response)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def udp(request, nameserver, port=53):
+    """
+    Send the DNS ``request`` to ``nameserver`` over UDP and return its response.
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+    transport, protocol = await loop.create_datagram_endpoint(lambda: _DnsProtocol(request, future),
+                                                              remote_addr=(nameserver, port))
+    try:
+        return await future
+    finally:
+        transport.close()
+
+
+async def tcp(request, nameserver, port=53):
+    """
+    Send the DNS ``request`` to ``nameserver`` over TCP and return its response.
+    """
+    reader, writer = await asyncio.open_connection(nameserver, port)
+    try:
+        wire = request.to_wire()
+        writer.write(struct.pack("!H", len(wire)) + wire)
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+        return dns.message.from_wire(await reader.readexactly(length))
+    finally:
+        writer.close()
+
+
+def sign_domains(manager, config, csr_files, forced=()):
+    """
+    Sign ``csr_files`` sharing ``config`` for the DomainManager ``manager`` on a new event loop and return
+    their SignResult, ``manager.workers`` at once.
+    """
+    loop = asyncio.new_event_loop()
+    client = AsyncClient(config, manager.adapter, concurrency=manager.workers)
+    try:
+        return loop.run_until_complete(client.sign_managed(manager, csr_files, forced))
+    finally:
+        # challenge records are deleted by sign_managed, close the blocking client with its own
+        client.close()
+        loop.close()
+
+
+class AsyncPropagationChecker(PropagationChecker):
+    '''
+    PropagationChecker querying the nameservers of every record concurrently from the event loop.
+    '''
+
+    def __init__(self, timeout=2400, query_timeout=5, initial_delay=2, max_delay=60, nameservers_ttl=3600, port=53):
+        PropagationChecker.__init__(self, timeout, query_timeout, initial_delay, max_delay,
+                                    nameservers_ttl=nameservers_ttl)
+        self.port = port
+
+    async def wait(self, records):
+        """
+        Wait for ``(zone, name, token)`` records to be deployed and return the names still not deployed.
+        """
+        start = time.time()
+        attempt = 0
+        pending = await self.__check(records)
+        while pending and time.time() - start < self.timeout:
+            await asyncio.sleep(self.delay(attempt))
+            attempt += 1
+            pending = await self.__check(pending)
+        return [name for zone, name, token in pending]
+
+    async def __check(self, records):
+        # nameservers are looked up with the system resolver, then cached
+        queries = await run_blocking(self.queries, records)
+        found = await asyncio.gather(*[self.__query(record, nameserver) for record, nameserver in queries])
+        return self.pending(records, [(record, record_found)
+                                      for (record, nameserver), record_found in zip(queries, found)])
+
+    async def __query(self, record, nameserver):
+        zone, name, token = record
+        try:
+            if nameserver is None:
+                values = await run_blocking(resolve_txt, name)
+            else:
+                request = dns.message.make_query(name, 'TXT')
+                response = await asyncio.wait_for(udp(request, nameserver, self.port), self.query_timeout)
+                if response.flags & dns.flags.TC:
+                    response = await asyncio.wait_for(tcp(request, nameserver, self.port), self.query_timeout)
+                values = txt_values(response)
+        except (dns.exception.DNSException, OSError, EOFError, asyncio.TimeoutError) as e:
+            log.debug("TXT %s not found on %s: %r", name, nameserver, e)
+            return False
+        return token.encode('ascii') in values
+
+
+class AsyncClient(object):
+    '''
+    ACME v2 client for asyncio, driving a ClientV2.
+
+    ``adapter`` is an AsyncAdapter or a blocking Adapter run in the loop executor. Every CSR of
+    :meth:`sign_all` is signed concurrently, up to ``concurrency`` at once, then the DeployHooks
+    ``hooks`` run once for the certificates signed.
+    '''
+
+    def __init__(self, config, adapter, transport=None, propagation=None, concurrency=100,
+                 poll_delay=1, poll_max_delay=30, poll_timeout=600, cleanup_retries=3, cleanup_delay=30,
+                 hooks=None):
+        self.config = config
+        self.adapter = async_adapter(adapter)
+        # requests, nonces, signatures and challenge records of the blocking client
+        self.client = client_v2.ClientV2(config, self.adapter, transport)
+        if propagation is None:
+            propagation = AsyncPropagationChecker(timeout=config.propagation_timeout)
+        self.propagation = propagation
+        self.poller = StatusPoller(None, initial_delay=poll_delay, max_delay=poll_max_delay, timeout=poll_timeout)
+        self.concurrency = concurrency
+        self.cleanup_retries = cleanup_retries
+        self.cleanup_delay = cleanup_delay
+        self.hooks = hooks
+        self.cleanups = []
+
+    def close(self):
+        self.client.close()
+
+    async def reg_account(self):
+        await run_blocking(self.client.reg_account)
+
+    async def sign_all(self, csr_files):
+        """
+        Sign ``csr_files`` concurrently and return their SignResult, failures are isolated.
+        """
+        if self.client.kid is None:
+            await self.reg_account()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sign(csr_file):
+            async with semaphore:
+                try:
+                    cert_file = await self.sign(csr_file)
+                except Exception as e:
+                    log.exception("Error signing %s", csr_file)
+                    return SignResult(csr_file, SignResult.FAILED, error=e)
+            if cert_file is None:
+                return SignResult(csr_file, SignResult.VALID)
+            return SignResult(csr_file, SignResult.SIGNED, cert_file=cert_file)
+
+        results = await asyncio.gather(*[sign(csr_file) for csr_file in csr_files])
+        await self.flush()
+        if self.hooks is not None:
+            signed = [(self.config.deploy_hooks, result.cert_file)
+                      for result in results if result.status == SignResult.SIGNED]
+            await run_blocking(self.hooks.run, signed)
+        return results
+
+    async def sign_managed(self, manager, csr_files, forced=()):
+        """
+        Sign ``csr_files`` concurrently within the rate limits and keys of the DomainManager ``manager``
+        and return their SignResult, the deploy hooks are left to ``manager``.
+        """
+        if self.client.kid is None:
+            await self.reg_account()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sign(csr_file):
+            async with semaphore:
+                # a blocking acquire would hold an executor thread the holders need to complete
+                while not await run_blocking(manager._acquire, csr_file, False):
+                    await asyncio.sleep(ACQUIRE_DELAY)
+                result = await run_blocking(manager._deferred, csr_file)
+                if result is not None:
+                    return result
+                start = time.time()
+                try:
+                    cert_file = await self.sign(csr_file, csr_file in forced)
+                except Exception as e:
+                    log.exception("Error signing %s", csr_file)
+                    return await run_blocking(manager._signed, csr_file, None, e, start)
+                return await run_blocking(manager._signed, csr_file, cert_file, None, start)
+
+        results = await asyncio.gather(*[sign(csr_file) for csr_file in csr_files])
+        await self.flush()
+        return list(results)
+
+    async def flush(self):
+        """
+        Wait for the deletion of challenge records running in the background.
+        """
+        cleanups, self.cleanups = self.cleanups, []
+        await asyncio.gather(*cleanups)
+
+    async def sign(self, csr_file, force=False):
+        csr = await run_blocking(self.client._load_csr, csr_file, force)
+        if csr is None:
+            return None
+
+        with metrics.timer('issue'):
+            cert, chain = await self._issue(csr, csr_file)
+
+        cert_file = await run_blocking(self.client._write_certificate, csr_file, cert)
+        await run_blocking(self.client._write_chain, csr_file, cert, chain)
+        return cert_file
+
+    async def _issue(self, csr, csr_file):
+        with metrics.timer('phase', phase='authorization'):
+            order_url, order, challenges = await self._order(csr)
+
+        await self._validate(challenges, csr_file)
+
+        log.info("Signing certificate...")
+        with metrics.timer('phase', phase='issuance'):
+            return await self._finalize(csr, order_url, order)
+
+    async def _order(self, csr):
+        # one order for every name of the CSR, its authorizations are fetched concurrently
+        directory = await run_blocking(self.client.nonces.directory)
+        order_url, order = client_v2.created_order(
+            await run_blocking(self.client._send_signed_request, directory['newOrder'], client_v2.new_order(csr)))
+        authorizations = await asyncio.gather(*[self._post_as_get_json(url) for url in order['authorizations']])
+        challenges = [client_v2.dns_challenge(authorization) for authorization in authorizations]
+        challenges = await asyncio.gather(*[run_blocking(self.client._challenge, *challenge)
+                                            for challenge in challenges if challenge is not None])
+        return order_url, order, list(challenges)
+
+    async def _post_as_get_json(self, url):
+        return client_v2.json_document(await run_blocking(self.client.post_as_get, url), url)
+
+    async def _validate(self, challenges, csr_file):
+        # deploy every TXT record, wait for them to propagate together, then validate
+        records = []
+        try:
+            with metrics.timer('adapter_call', adapter=type(self.adapter).__name__, call='deploy_challenges'):
+                records = await self.adapter.deploy_challenges(
+                    [(challenge['zone'], challenge['subdomain'], challenge['dnstoken']) for challenge in challenges])
+
+            with metrics.timer('phase', phase='propagation'):
+                not_deployed = await self.propagation.wait(
+                    [(c['zone'], c['subdomain'] + "." + c['zone'], c['dnstoken']) for c in challenges])
+            if not_deployed:
+                log.error("TXT not deployed: %s", ", ".join(not_deployed))
+                raise ValueError("Challenges not deployed for {0}".format(csr_file))
+
+            with metrics.timer('phase', phase='validation'):
+                await asyncio.gather(*[run_blocking(self.client._trigger_challenge, challenge)
+                                       for challenge in challenges])
+                statuses = await asyncio.gather(*[self._poll(challenge['uri']) for challenge in challenges])
+            for challenge, challenge_status in zip(challenges, statuses):
+                if challenge_status['status'] != "valid":
+                    raise ValidationError("{0} challenge did not pass: {1}".format(challenge['domain'],
+                                                                                   challenge_status),
+                                          challenge['domain'])
+                log.debug("{0} verified!".format(challenge['domain']))
+        finally:
+            # records are deleted in the background, grouped by zone
+            zones = {}
+            for challenge, record in zip(challenges, records):
+                zones.setdefault(challenge['zone'], []).append(record)
+            self.cleanups.extend(asyncio.ensure_future(self._delete(zone, zone_records))
+                                 for zone, zone_records in zones.items())
+
+    async def _delete(self, zone, records):
+        for attempt in range(self.cleanup_retries + 1):
+            try:
+                with metrics.timer('adapter_call', adapter=type(self.adapter).__name__, call='delete_challenges'):
+                    await self.adapter.delete_challenges(records)
+                return
+            except Exception as e:
+                if attempt >= self.cleanup_retries:
+                    log.error("Giving up deleting challenge records of %s: %s", zone, e)
+                    return
+                delay = self.cleanup_delay * 2 ** attempt
+                log.warning("Error deleting challenge records of %s, retrying in %ds: %s", zone, delay, e)
+                await asyncio.sleep(delay)
+
+    async def _poll(self, uri):
+        """
+        Return the status of the resource at ``uri`` once no longer pending, see StatusPoller.
+        """
+        deadline = time.time() + self.poller.timeout
+        attempt = 0
+        while True:
+            metrics.count('status_polls')
+            response = await run_blocking(self.client.post_as_get, uri)
+            status = self.poller.status(response)
+            if status['status'] not in PENDING_STATUS:
+                return status
+            delay = self.poller.delay(response, attempt)
+            if time.time() + delay > deadline:
+                raise ValueError("Timeout waiting for {0}".format(uri))
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _finalize(self, csr, order_url, order):
+        order = client_v2.finalized_order(
+            await run_blocking(self.client._send_signed_request, order['finalize'], client_v2.finalize(csr)))
+        if order['status'] != "valid":
+            order = await self._poll(order_url)
+            client_v2.check_valid(order_url, order)
+        return client_v2.certificate_chain(await run_blocking(self.client.post_as_get, order['certificate']),
+                                           order['certificate'])
@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import calendar
+import datetime
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+#: Authorizations expiring within this delay (seconds) are not used anymore
+EXPIRY_MARGIN = 3600
+
+FINAL_STATUS = ("invalid", "revoked", "deactivated", "expired")
+
+
+def parse_expires(value):
+    """
+    Return the epoch time of an ACME ``expires`` date like ``2016-01-20T14:09:07.99Z``.
+    """
+    date = datetime.datetime.strptime(value[:19], "%Y-%m-%dT%H:%M:%S")
+    return calendar.timegm(date.timetuple())
+
+
+class AuthorizationCache(object):
+    '''
+    Authorization uris of an account by identifier, with their expiry.
+    '''
+
+    def __init__(self, store, thumbprint):
+        self.store = store
+        self.thumbprint = thumbprint
+
+    def __key(self, identifier):
+        return "{0}:{1}".format(self.thumbprint, identifier)
+
+    def get(self, identifier):
+        entry = self.store.get(self.__key(identifier))
+        if entry is None:
+            return None
+        if entry['expires'] - EXPIRY_MARGIN < time.time():
+            log.debug("Authorization of %s expired", identifier)
+            self.evict(identifier)
+            return None
+        return entry['uri']
+
+    def add(self, identifier, uri, expires):
+        self.store.set(self.__key(identifier), {'uri': uri, 'expires': parse_expires(expires)})
+
+    def evict(self, identifier):
+        self.store.delete(self.__key(identifier))
+
+    def check(self, identifier, uri, authorization):
+        """
+        Update the cache from the ``authorization`` document found at ``uri``, return True if it is still valid.
+        """
+        status = authorization.get('status')
+        if status == "valid" and authorization.get('expires'):
+            self.add(identifier, uri, authorization['expires'])
+            return self.get(identifier) is not None
+        if status in FINAL_STATUS:
+            log.debug("Authorization of %s is %s", identifier, status)
+            self.evict(identifier)
+        return False
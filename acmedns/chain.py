@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import re
+import threading
+import time
+from acmedns import asn1
+from acmedns.transport import TRANSIENT_ERRORS
+try:
+    from urllib.parse import urljoin  # Python 3
+except ImportError:
+    from urlparse import urljoin  # Python 2
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHAIN_URL = "https://letsencrypt.org/certs/lets-encrypt-x3-cross-signed.pem"
+
+LINK_UP_RE = re.compile(r'<([^>]+)>\s*;\s*rel="?up"?')
+
+
+def link_up(response, url):
+    """
+    Return the absolute url of the ``Link: <...>;rel="up"`` header of ``response`` to ``url``, or None.
+    """
+    match = LINK_UP_RE.search(response.header('Link', ''))
+    if match is None:
+        return None
+    return urljoin(url, match.group(1))
+
+
+class ChainCache(object):
+    '''
+    Intermediate certificates by url, kept in ``store`` and revalidated with ETag and Last-Modified
+    once older than ``ttl`` seconds. A stale copy is used when the download fails.
+    '''
+
+    def __init__(self, transport, store, ttl=86400):
+        self.transport = transport
+        self.store = store
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+
+    def get(self, url):
+        with self.__lock:
+            entry = self.store.get(url)
+            if entry is not None and entry['fetched'] + self.ttl > time.time():
+                return entry['pem'].encode('ascii')
+
+            headers = {}
+            if entry is not None and entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry is not None and entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            try:
+                response = self.transport.get(url, headers)
+            except TRANSIENT_ERRORS + (IOError,) as e:
+                # the transport retries are exhausted, fall back on the stale copy
+                response = None
+                log.warning("Error downloading intermediate certificate %s: %s", url, e)
+
+            if response is not None and response.code == 304 and entry is not None:
+                log.debug("Intermediate certificate %s not modified", url)
+                entry['fetched'] = time.time()
+            elif response is not None and response.code == 200:
+                log.debug("Intermediate certificate %s downloaded", url)
+                label, der = asn1.pem_to_der(response.body, 'CERTIFICATE')
+                pem = response.body.decode('ascii') if label is not None else asn1.der_to_pem(der)
+                entry = {
+                    'pem': pem,
+                    'etag': response.header('ETag'),
+                    'last_modified': response.header('Last-Modified'),
+                    'fetched': time.time(),
+                }
+            elif entry is None:
+                raise IOError("Error downloading intermediate certificate {0}: {1}".format(
+                    url, response.code if response is not None else None))
+            else:
+                log.warning("Using stale intermediate certificate %s", url)
+                return entry['pem'].encode('ascii')
+
+            self.store.set(url, entry)
+            return entry['pem'].encode('ascii')
@@ -0,0 +1,162 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+from acmedns import metrics
+
+log = logging.getLogger(__name__)
+
+
+class CleanupQueue(object):
+    '''
+    Delete challenge records in a background thread, off the issuance path.
+
+    Records are collected for ``delay`` seconds then deleted with one adapter call per zone. Failed
+    deletions are retried up to ``retries`` times, waiting ``retry_delay`` seconds doubled on each
+    attempt. :meth:`flush` deletes every queued record at once and waits for the retries of failed
+    deletions, at the end of a batch or at shutdown.
+    '''
+
+    def __init__(self, adapter, delay=5, retries=3, retry_delay=30):
+        self.adapter = adapter
+        self.delay = delay
+        self.retries = retries
+        self.retry_delay = retry_delay
+        # zone -> list of (due, attempt, record)
+        self.__pending = {}
+        self.__running = 0
+        self.__closed = False
+        self.__thread = None
+        self.__condition = threading.Condition()
+
+    def put(self, zone, records):
+        """
+        Queue ``records`` of ``zone`` for deletion.
+        """
+        if not records:
+            return
+        with self.__condition:
+            if self.__closed:
+                raise ValueError("Cleanup queue closed")
+            due = time.time() + self.delay
+            self.__pending.setdefault(zone, []).extend((due, 0, record) for record in records)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="acmedns-cleanup")
+                self.__thread.daemon = True
+                self.__thread.start()
+            self.__condition.notify_all()
+
+    def pending(self):
+        with self.__condition:
+            return sum(len(entries) for entries in self.__pending.values()) + self.__running
+
+    def flush(self, timeout=None):
+        """
+        Delete every queued record now, including those waiting for a retry, then wait for the retries of
+        failed deletions until they succeed, give up or ``timeout`` expires. Return the number of records
+        still queued.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self.__condition:
+            if self.__thread is None:
+                return 0
+            # due now, failed deletions are then retried with their backoff
+            for entries in self.__pending.values():
+                entries[:] = [(0, attempt, record) for due, attempt, record in entries]
+            self.__condition.notify_all()
+            while (self.__pending or self.__running) and self.__thread.is_alive():
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    break
+                self.__condition.wait(remaining)
+            return sum(len(entries) for entries in self.__pending.values()) + self.__running
+
+    def close(self, timeout=None):
+        """
+        Flush the queue and stop the background thread.
+        """
+        left = self.flush(timeout)
+        if left:
+            log.error("Giving up deleting %d challenge records, the queue is closed", left)
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+            thread = self.__thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                batches = self.__take_due()
+                while not batches:
+                    if self.__closed:
+                        return
+                    self.__condition.wait(self.__next_due())
+                    batches = self.__take_due()
+                self.__running = sum(len(entries) for entries in batches.values())
+            for zone, entries in batches.items():
+                self.__delete(zone, entries)
+            with self.__condition:
+                self.__running = 0
+                # wake up flush
+                self.__condition.notify_all()
+
+    def __take_due(self):
+        now = time.time()
+        batches = {}
+        for zone, entries in list(self.__pending.items()):
+            due = [entry for entry in entries if entry[0] <= now]
+            if due:
+                batches[zone] = due
+                entries[:] = [entry for entry in entries if entry[0] > now]
+            if not entries:
+                del self.__pending[zone]
+        return batches
+
+    def __next_due(self):
+        dues = [entry[0] for entries in self.__pending.values() for entry in entries]
+        if not dues:
+            return None
+        return max(0, min(dues) - time.time())
+
+    def __delete(self, zone, entries):
+        records = [record for due, attempt, record in entries]
+        log.debug("Deleting %d challenge records of %s", len(records), zone)
+        try:
+            with metrics.timer('adapter_call', adapter=type(self.adapter).__name__, call='delete_challenges'):
+                self.adapter.delete_challenges(records)
+        except Exception as e:
+            attempt = max(attempt for due, attempt, record in entries) + 1
+            if attempt > self.retries:
+                log.error("Giving up deleting challenge records of %s: %s", zone, e)
+                return
+            delay = self.retry_delay * 2 ** (attempt - 1)
+            log.warning("Error deleting challenge records of %s, attempt %d of %d: %s", zone, attempt,
+                        self.retries + 1, e)
+            with self.__condition:
+                self.__pending.setdefault(zone, []).extend(
+                    (time.time() + delay, attempt, record) for record in records)
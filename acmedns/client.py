@@ -20,256 +20,425 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import
+
 import base64
 import logging
-import subprocess
 import re
-import binascii
 import json
 import hashlib
 import copy
-import dns.resolver
-import dns.exception
-import time
-import textwrap
-import sys
 import os
-import shutil
-try:
-    from urllib.request import urlopen  # Python 3
-except ImportError:
-    from urllib2 import urlopen  # Python 2
+import time
+from acmedns import metrics
+from acmedns.asn1 import der_to_pem, int_to_bytes
+from acmedns.authz import AuthorizationCache
+from acmedns.chain import ChainCache, DEFAULT_CHAIN_URL, link_up
+from acmedns.cleanup import CleanupQueue
+from acmedns.delegation import DelegationResolver
+from acmedns.nonce import NoncePool, is_bad_nonce
+from acmedns.poller import StatusPoller, retry_after
+from acmedns.propagation import PropagationChecker
+from acmedns.signer import LazySigner
+from acmedns.store import JsonStore, write_file
+from acmedns.transport import HttpTransport, TRANSIENT_ERRORS
+from acmedns.x509 import Certificate, CertificateRequest
+from acmedns.zones import ZoneResolver
 
 log = logging.getLogger(__name__)
 
 
+class RateLimitError(ValueError):
+    '''
+    ACME server refused a request with a ``rateLimited`` problem, ``retry_after`` is in seconds when known.
+    '''
+
+    def __init__(self, message, detail=None, retry_after=None):
+        super(RateLimitError, self).__init__(message)
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ValidationError(ValueError):
+    '''
+    Challenge of ``domain`` did not pass.
+    '''
+
+    def __init__(self, message, domain):
+        super(ValidationError, self).__init__(message)
+        self.domain = domain
+
+
 class ClientConfig(object):
 
-    def __init__(self, acme_url, account_key, contact_email, checkend):
+    def __init__(self, acme_url, account_key, contact_email, checkend, timeout=30, retries=3,
+                 propagation_timeout=2400, cache_dir=None, chain_ttl=86400, acme_version=1, challenge_zone=None,
+                 deploy_hooks=None, key_size=2048, rotate_key=True):
         self.acme_url = acme_url
         self.account_key = account_key
         self.contact_email = contact_email
         self.checkend = checkend
+        self.timeout = timeout
+        self.retries = retries
+        self.propagation_timeout = propagation_timeout
+        self.cache_dir = cache_dir
+        self.chain_ttl = chain_ttl
+        self.acme_version = acme_version
+        self.challenge_zone = challenge_zone
+        # names of the hooks deploying the certificates, None for every hook
+        self.deploy_hooks = deploy_hooks
+        # private keys generated for [hostnames] entries
+        self.key_size = key_size
+        self.rotate_key = rotate_key
+
+    def cache_file(self, filename):
+        """
+        Return the path of ``filename`` in the cache directory, None when caches are not persisted.
+        """
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, filename)
 
 
 class Client:
 
-    def __init__(self, config, adapter):
+    BAD_NONCE_RETRY = 3
+    RETRY_BACKOFF = 0.5
+
+    def __init__(self, config, adapter, transport=None):
         self.config = config
         self.adapter = adapter
+        if transport is None:
+            transport = HttpTransport(timeout=config.timeout, retries=config.retries)
+        self.transport = transport
+        self.nonces = NoncePool(config.acme_url, transport)
+        self.propagation = PropagationChecker(timeout=config.propagation_timeout)
+        self.poller = StatusPoller(transport, self.nonces)
         self.__load_account_key()
+        self.authorizations = AuthorizationCache(JsonStore(config.cache_file('authorizations.json')),
+                                                 self.thumbprint)
+        self.chains = ChainCache(transport, JsonStore(config.cache_file('chains.json')), config.chain_ttl)
+        self.delegation = DelegationResolver(config.challenge_zone) if config.challenge_zone else None
+        self.zones = ZoneResolver(adapter)
+        self.cleanup = CleanupQueue(adapter)
+
+    def close(self):
+        """
+        Delete the challenge records still queued, stop the DNS query threads and close the connections.
+        """
+        self.cleanup.close()
+        self.propagation.close()
+        self.transport.close()
 
     # helper function base64 encode for jose spec
     @staticmethod
-    def __b64(b):
+    def _b64(b):
         return base64.urlsafe_b64encode(b).decode('utf8').replace("=", "")
 
     def __load_account_key(self):
-        # parse account key to get public key
-        log.debug("Parsing account key %s", self.config.account_key)
-        proc = subprocess.Popen(["openssl", "rsa", "-in", self.config.account_key, "-noout", "-text"],
-                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = proc.communicate()
-        if proc.returncode != 0:
-            raise IOError("OpenSSL Error: {0}".format(err))
-        pub_hex, pub_exp = re.search(
-            r"modulus:\n\s+00:([a-f0-9\:\s]+?)\npublicExponent: ([0-9]+)",
-            out.decode('utf8'), re.MULTILINE | re.DOTALL).groups()
-        pub_exp = "{0:x}".format(int(pub_exp))
-        pub_exp = "0{0}".format(pub_exp) if len(pub_exp) % 2 else pub_exp
-        self.header = {
-            "alg": "RS256",
-            "jwk": {
-                "e": Client.__b64(binascii.unhexlify(pub_exp.encode("utf-8"))),
-                "kty": "RSA",
-                "n": Client.__b64(binascii.unhexlify(re.sub(r"(\s|:)", "", pub_hex).encode("utf-8"))),
-            },
+        # the account key is parsed on first signature, its JWK comes from cache
+        log.debug("Loading account key %s", self.config.account_key)
+        self.signer = LazySigner(self.config.account_key)
+        accounts = JsonStore(self.config.cache_file('accounts.json'))
+        jwk, self.thumbprint = Client.cached_account_jwk(self.signer, accounts)
+        self.header = {"alg": "RS256", "jwk": jwk}
+
+    @staticmethod
+    def cached_account_jwk(signer, store):
+        """
+        Return the JWK of the account key of ``signer`` and its thumbprint, cached in ``store`` by
+        SHA-256 of the key file.
+        """
+        with open(signer.key_file, 'rb') as key:
+            digest = hashlib.sha256(key.read()).hexdigest()
+        cached = store.get(digest)
+        if cached is None:
+            jwk, thumbprint = Client.account_jwk(signer)
+            cached = {'jwk': jwk, 'thumbprint': thumbprint}
+            store.set(digest, cached)
+        return cached['jwk'], cached['thumbprint']
+
+    @staticmethod
+    def account_jwk(signer):
+        """
+        Return the JWK of the account key of ``signer`` and its thumbprint.
+        """
+        jwk = {
+            "e": Client._b64(int_to_bytes(signer.exponent)),
+            "kty": "RSA",
+            "n": Client._b64(int_to_bytes(signer.modulus)),
         }
-        account_key_json = json.dumps(self.header['jwk'], sort_keys=True, separators=(',', ':'))
-        self.thumbprint = Client.__b64(hashlib.sha256(account_key_json.encode('utf8')).digest())
+        account_key_json = json.dumps(jwk, sort_keys=True, separators=(',', ':'))
+        return jwk, Client._b64(hashlib.sha256(account_key_json.encode('utf8')).digest())
 
-    # helper function make signed requests
-    def __send_signed_request(self, url, payload):
-        payload64 = Client.__b64(json.dumps(payload).encode('utf8'))
+    # helper function build the signed request body
+    def _jws(self, url, payload, nonce):
+        payload64 = Client._b64(json.dumps(payload).encode('utf8'))
         protected = copy.deepcopy(self.header)
-        protected["nonce"] = urlopen(self.config.acme_url + "/directory").headers['Replay-Nonce']
-        protected64 = Client.__b64(json.dumps(protected).encode('utf8'))
-        proc = subprocess.Popen(["openssl", "dgst", "-sha256", "-sign", self.config.account_key],
-                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = proc.communicate("{0}.{1}".format(protected64, payload64).encode('utf8'))
-        if proc.returncode != 0:
-            raise IOError("OpenSSL Error: {0}".format(err))
-        data = json.dumps({
+        protected["nonce"] = nonce
+        protected64 = Client._b64(json.dumps(protected).encode('utf8'))
+        signature = self.signer.sign("{0}.{1}".format(protected64, payload64).encode('utf8'))
+        return json.dumps({
             "header": self.header, "protected": protected64,
-            "payload": payload64, "signature": Client.__b64(out),
+            "payload": payload64, "signature": Client._b64(signature),
         })
+
+    # helper function make signed requests
+    def _send_signed_request(self, url, payload):
+        # the transport sends a POST once, retry here with a new JWS and a fresh nonce
+        bad_nonces = 0
+        attempt = 0
+        while True:
+            data = self._jws(url, payload, self.nonces.get())
+            try:
+                response = self.transport.post(url, data.encode('utf8'), {"Content-Type": "application/jose+json"})
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self.config.retries:
+                    raise
+                log.debug("POST %s failed: %s, retrying", url, e)
+            else:
+                self.nonces.add_from(response)
+                if bad_nonces < Client.BAD_NONCE_RETRY and is_bad_nonce(response.code, response.body):
+                    bad_nonces += 1
+                    metrics.count('bad_nonces')
+                    log.debug("Bad nonce, retrying request %s", url)
+                    continue
+                if response.code < 500 or attempt >= self.config.retries:
+                    Client._check_rate_limited(response)
+                    return response
+                log.debug("POST %s returned %s, retrying", url, response.code)
+            metrics.count('http_retries', method='POST')
+            time.sleep(Client.RETRY_BACKOFF * 2 ** attempt)
+            attempt += 1
+
+    @staticmethod
+    def _check_rate_limited(response):
+        if response.code < 400:
+            return
         try:
-            resp = urlopen(url, data.encode('utf8'))
-            return resp.getcode(), resp.read()
-        except IOError as e:
-            return getattr(e, "code", None), getattr(e, "read", e.__str__)()
+            problem = json.loads(response.body.decode('utf8'))
+        except ValueError:
+            problem = {}
+        if response.code == 429 or str(problem.get('type', '')).endswith(':rateLimited'):
+            raise RateLimitError("Rate limited: {0} {1}".format(response.code, response.body),
+                                 problem.get('detail'), retry_after(response))
 
     def reg_account(self):
         log.debug("Registering account...")
-        code, result = self.__send_signed_request(self.config.acme_url + "/acme/new-reg", {
+        response = self._send_signed_request(self.nonces.directory()['new-reg'], {
             "resource": "new-reg",
             "contact": ["mailto:"+self.config.contact_email],
             "agreement": "https://letsencrypt.org/documents/LE-SA-v1.0.1-July-27-2015.pdf",
         })
-        if code == 201:
+        if response.code == 201:
             log.info("Account registered!")
-        elif code == 409:
+        elif response.code == 409:
             log.debug("Already registered!")
         else:
-            raise ValueError("Error registering: {0} {1}".format(code, result))
+            raise ValueError("Error registering: {0} {1}".format(response.code, response.body))
+
+    def wait_challenges_deployed(self, challenges):
+        with metrics.timer('phase', phase='propagation'):
+            not_deployed = self.propagation.wait(
+                [(c['zone'], c['subdomain'] + "." + c['zone'], c['dnstoken']) for c in challenges])
+        if not_deployed:
+            log.error("TXT not deployed: %s", ", ".join(not_deployed))
+        return not not_deployed
+
+    def _challenge_record(self, domain):
+        # write challenge in the delegated zone when _acme-challenge is a CNAME to it
+        if self.delegation is not None:
+            delegation = self.delegation.resolve(domain)
+            if delegation is not None:
+                return delegation
+        return self.zones.split(domain)
+
+    def __is_authorized(self, domain):
+        # reuse a cached authorization if ACME still considers it valid
+        uri = self.authorizations.get(domain)
+        if uri is None:
+            return False
+        response = self.transport.get(uri)
+        self.nonces.add_from(response)
+        if response.code == 404:
+            self.authorizations.evict(domain)
+            return False
+        if response.code != 200:
+            log.warning("Error checking authorization of %s: %s %s", domain, response.code, response.body)
+            return False
+        return self.authorizations.check(domain, uri, json.loads(response.body.decode('utf8')))
+
+    def __request_challenge(self, domain):
+        log.info("Verifying %s", domain)
+
+        # get new challenge
+        response = self._send_signed_request(self.nonces.directory()['new-authz'], {
+            "resource": "new-authz",
+            "identifier": {"type": "dns", "value": domain},
+        })
+        log.debug("Requesting challenges: {0} {1}".format(response.code, response.body))
+        if response.code != 201:
+            raise ValueError("Error requesting challenges: {0} {1}".format(response.code, response.body))
+
+        authorization = json.loads(response.body.decode('utf8'))
+        if response.header('Location') and authorization.get('expires'):
+            self.authorizations.add(domain, response.header('Location'), authorization['expires'])
+        challenge = [c for c in authorization['challenges'] if c['type'] == "dns-01"][0]
+        return self._challenge(domain, challenge['token'], challenge['uri'])
+
+    def _challenge(self, domain, token, uri):
+        token = re.sub(r"[^A-Za-z0-9_\-]", "_", token)
+        keyauthorization = "{0}.{1}".format(token, self.thumbprint)
+        basedomain, subdomain = self._challenge_record(domain)
+        return {
+            "domain": domain,
+            "zone": basedomain,
+            "subdomain": subdomain,
+            "uri": uri,
+            "keyauthorization": keyauthorization,
+            "dnstoken": self._b64(hashlib.sha256(keyauthorization.encode('utf8')).digest()),
+        }
 
-    @staticmethod
-    def wait_challenge_deployed(domain):
-        count = 0
-        is_deployed = Client.check_domain(domain)
-        while count < 240 and not is_deployed:
-            time.sleep(10)
-            count += 1
-            is_deployed = Client.check_domain(domain)
-        return is_deployed
+    def _trigger_challenge(self, challenge):
+        # notify challenge are met
+        response = self._send_signed_request(challenge['uri'], {
+            "resource": "challenge",
+            "keyAuthorization": challenge['keyauthorization'],
+        })
+        if response.code != 202:
+            raise ValueError("Error triggering challenge: {0} {1}".format(response.code, response.body))
+
+    def _wait_challenges_verified(self, challenges):
+        for challenge, challenge_status in self.poller.poll(challenges):
+            if challenge_status['status'] == "valid":
+                log.debug("{0} verified!".format(challenge['domain']))
+            else:
+                raise ValidationError("{0} challenge did not pass: {1}".format(challenge['domain'], challenge_status),
+                                      challenge['domain'])
 
     @staticmethod
-    def check_domain(domain):
-        try:
-            answers = dns.resolver.query('_acme-challenge.{0}'.format(domain), 'TXT')
-            if len(answers) > 0:
-                return True
-        except dns.exception.DNSException as e:
-            log.debug("TXT not found: %s", e)
-        except:
-            log.error("Unexpected error: %s", sys.exc_info()[0])
-            raise
-        return False
-
-    def sign(self, csr_file):
-        sign_cert_file_name = csr_file.rsplit(".", 1)[0]
-        sign_cert_file_name += '.crt'
-        sign_cert_file_name = os.path.abspath(sign_cert_file_name)
+    def cert_file_names(csr_file):
+        """
+        Return the signed and chained certificate file names of ``csr_file``.
+        """
+        base_name = os.path.abspath(csr_file.rsplit(".", 1)[0])
+        return base_name + '.crt', base_name + '.chained.pem'
+
+    def sign(self, csr_file, force=False):
+        """
+        Sign ``csr_file`` unless its certificate is valid, always with ``force``. Return the certificate file
+        name, None when not signed.
+        """
+        csr = self._load_csr(csr_file, force)
+        if csr is None:
+            return
+
+        with metrics.timer('issue'):
+            cert, chain = self._issue(csr, csr_file)
+
+        # the certificate is written before its chain is downloaded, a chain error must not lose it
+        cert_file = self._write_certificate(csr_file, cert)
+        self._write_chain(csr_file, cert, self._fetch_chain(chain))
+        return cert_file
+
+    def _load_csr(self, csr_file, force=False):
+        """
+        Return the CSR of ``csr_file``, or None when its certificate is valid for the next ``checkend`` seconds
+        and ``force`` is not set.
+        """
+        sign_cert_file_name, full_cert_file_name = Client.cert_file_names(csr_file)
         log.debug("Sign cert file name: %s", sign_cert_file_name)
-
-        full_cert_file_name = csr_file.rsplit(".", 1)[0]
-        full_cert_file_name += '.chained.pem'
-        full_cert_file_name = os.path.abspath(full_cert_file_name)
         log.debug("Sign chain cert file name: %s", full_cert_file_name)
 
-        if os.path.isfile(sign_cert_file_name):
+        if not force and os.path.isfile(sign_cert_file_name):
             # check if certificate is valid
-            proc = subprocess.Popen(["openssl", "x509", "-checkend", self.config.checkend, "-in",
-                                     sign_cert_file_name, "-noout"],
-                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            out, err = proc.communicate()
-            if proc.returncode == 0:
-                log.info("Certificate is valid for next {0}s : {1}".format(self.config.checkend, sign_cert_file_name))
-                return
+            try:
+                certificate = Certificate.from_file(sign_cert_file_name)
+            except (IOError, ValueError, IndexError) as e:
+                log.warning("Error loading certificate %s: %s", sign_cert_file_name, e)
+            else:
+                if not certificate.expires_within(int(self.config.checkend)):
+                    log.info("Certificate is valid for next {0}s : {1}".format(self.config.checkend,
+                                                                              sign_cert_file_name))
+                    return None
 
         # find domains
         log.info("Parsing CSR %s", csr_file)
-        proc = subprocess.Popen(["openssl", "req", "-in", csr_file, "-noout", "-text"],
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = proc.communicate()
-        if proc.returncode != 0:
-            raise IOError("Error loading {0}: {1}".format(csr_file, err))
-        domains = set([])
-        common_name = re.search(r"Subject:.*? CN=([^\s,;/]+)", out.decode('utf8'))
-        if common_name is not None:
-            domains.add(common_name.group(1))
-        subject_alt_names = re.search(r"X509v3 Subject Alternative Name: \n +([^\n]+)\n", out.decode('utf8'), re.MULTILINE|re.DOTALL)
-        if subject_alt_names is not None:
-            for san in subject_alt_names.group(1).split(", "):
-                if san.startswith("DNS:"):
-                    domains.add(san[4:])
-
-        # verify each domain
-        for domain in domains:
-            log.info("Verifying %s", domain)
-
-            # get new challenge
-            code, result = self.__send_signed_request(self.config.acme_url + "/acme/new-authz", {
-                "resource": "new-authz",
-                "identifier": {"type": "dns", "value": domain},
-            })
-            log.debug("Requesting challenges: {0} {1}".format(code, result))
-            if code != 201:
-                raise ValueError("Error requesting challenges: {0} {1}".format(code, result))
-
-            challenge = [c for c in json.loads(result.decode('utf8'))['challenges'] if c['type'] == "dns-01"][0]
-            token = re.sub(r"[^A-Za-z0-9_\-]", "_", challenge['token'])
-            keyauthorization = "{0}.{1}".format(token, self.thumbprint)
-            dnstoken = self.__b64(hashlib.sha256(keyauthorization).digest())
-
-            ndd = domain.split(".")
-            if len(ndd) == 2:
-                subdomain = "_acme-challenge"
-                basedomain = ndd[0] + "." + ndd[1]
-            else:
-                subdomain = "_acme-challenge." + ndd[0]
-                basedomain = ndd[1] + "." + ndd[2]
-
-            record = self.adapter.deploy_challenge(basedomain, subdomain, dnstoken)
-            try:
-                is_deployed = Client.wait_challenge_deployed(domain)
-
-                if is_deployed:
-
-                    # notify challenge are met
-                    code, result = self.__send_signed_request(challenge['uri'], {
-                        "resource": "challenge",
-                        "keyAuthorization": keyauthorization,
-                    })
-                    if code != 202:
-                        raise ValueError("Error triggering challenge: {0} {1}".format(code, result))
-
-                    # wait for challenge to be verified
-                    while True:
-                        try:
-                            resp = urlopen(challenge['uri'])
-                            challenge_status = json.loads(resp.read().decode('utf8'))
-                            log.debug(challenge_status)
-                        except IOError as e:
-                            raise ValueError("Error checking challenge: {0} {1}".format(
-                                e.code, json.loads(e.read().decode('utf8'))))
-                        if challenge_status['status'] == "pending":
-                            log.debug("Pending")
-                            time.sleep(1)
-                        elif challenge_status['status'] == "valid":
-                            log.debug("{0} verified!".format(domain))
-                            break
-                        else:
-                            raise ValueError("{0} challenge did not pass: {1}".format(
-                                domain, challenge_status))
-            finally:
-                self.adapter.delete_challenge(record)
+        try:
+            return CertificateRequest.from_file(csr_file)
+        except (ValueError, IndexError) as e:
+            raise IOError("Error loading {0}: {1}".format(csr_file, e))
 
-        # get the new certificate
-        log.info("Signing certificate...")
-        proc = subprocess.Popen(["openssl", "req", "-in", csr_file, "-outform", "DER"],
-                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        csr_der, err = proc.communicate()
-        code, result = self.__send_signed_request(self.config.acme_url + "/acme/new-cert", {
-            "resource": "new-cert",
-            "csr": self.__b64(csr_der),
-        })
-        if code != 201:
-            raise ValueError("Error signing certificate: {0} {1}".format(code, result))
+    @staticmethod
+    def _write_certificate(csr_file, cert):
+        """
+        Write the PEM certificate of ``csr_file``, return the certificate file name.
+        """
+        sign_cert_file_name = Client.cert_file_names(csr_file)[0]
+        write_file(sign_cert_file_name, cert)
+        log.info("Certificate signed %s", sign_cert_file_name)
+        return sign_cert_file_name
 
-        sign_cert = """-----BEGIN CERTIFICATE-----\n{0}\n-----END CERTIFICATE-----\n""".format(
-            "\n".join(textwrap.wrap(base64.b64encode(result).decode('utf8'), 64)))
+    @staticmethod
+    def _write_chain(csr_file, cert, chain):
+        """
+        Write the PEM certificate of ``csr_file`` followed by its PEM chain.
+        """
+        full_cert_file_name = Client.cert_file_names(csr_file)[1]
+        write_file(full_cert_file_name, cert + chain)
+        log.info("Certificate chain signed %s", full_cert_file_name)
 
-        sign_cert_file = open(sign_cert_file_name, 'w')
-        sign_cert_file.write(sign_cert)
-        sign_cert_file.close()
-        log.info("Certificate signed %s", sign_cert_file_name)
+    def _fetch_chain(self, chain_url):
+        """
+        Return the PEM chain at ``chain_url``, as returned by :meth:`_issue`.
+        """
+        return self.chains.get(chain_url)
 
-        shutil.copy(sign_cert_file_name, full_cert_file_name)
+    def _validate(self, challenges, csr_file):
+        # deploy every TXT record, wait for them to propagate together, then validate
+        records = []
+        try:
+            with metrics.timer('adapter_call', adapter=type(self.adapter).__name__, call='deploy_challenges'):
+                records = self.adapter.deploy_challenges(
+                    [(challenge['zone'], challenge['subdomain'], challenge['dnstoken']) for challenge in challenges])
+
+            if not self.wait_challenges_deployed(challenges):
+                raise ValueError("Challenges not deployed for {0}".format(csr_file))
+
+            with metrics.timer('phase', phase='validation'):
+                for challenge in challenges:
+                    self._trigger_challenge(challenge)
+                self._wait_challenges_verified(challenges)
+        finally:
+            # records are deleted in the background, grouped by zone
+            for challenge, record in zip(challenges, records):
+                self.cleanup.put(challenge['zone'], [record])
+
+    def _issue(self, csr, csr_file):
+        """
+        Validate the CSR domains and return the PEM certificate and the url of its chain, see :meth:`_fetch_chain`.
+        """
+        # get every authorization first, skipping domains with a valid authorization
+        challenges = []
+        with metrics.timer('phase', phase='authorization'):
+            for domain in csr.names:
+                if self.__is_authorized(domain):
+                    log.info("%s already authorized", domain)
+                else:
+                    challenges.append(self.__request_challenge(domain))
+
+        self._validate(challenges, csr_file)
 
-        # Download intermediate cert
-        chain_cert = urlopen("https://letsencrypt.org/certs/lets-encrypt-x3-cross-signed.pem")
-        with open(full_cert_file_name, 'ab') as output:
-            output.write(chain_cert.read())
+        # get the new certificate
+        log.info("Signing certificate...")
+        with metrics.timer('phase', phase='issuance'):
+            response = self._send_signed_request(self.nonces.directory()['new-cert'], {
+                "resource": "new-cert",
+                "csr": self._b64(csr.der),
+            })
+            if response.code != 201:
+                raise ValueError("Error signing certificate: {0} {1}".format(response.code, response.body))
 
-        log.info("Certificate chain signed %s", full_cert_file_name)
+            # intermediate cert from the issuer link when given, downloaded once the certificate is written
+            chain_url = link_up(response, self.nonces.directory()['new-cert']) or DEFAULT_CHAIN_URL
+            return der_to_pem(response.body).encode('ascii'), chain_url
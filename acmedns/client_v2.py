@@ -0,0 +1,223 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import json
+import logging
+from acmedns import asn1, metrics
+from acmedns.client import Client
+from acmedns.poller import StatusPoller
+
+log = logging.getLogger(__name__)
+
+
+def jws(signer, jwk, kid, url, payload, nonce):
+    """
+    Return the JWS of ``payload`` for ``url`` signed by the account ``kid``, or by its ``jwk`` when
+    not registered yet. A None payload makes a POST-as-GET request.
+    """
+    protected = {"alg": "RS256", "nonce": nonce, "url": url}
+    if kid is None:
+        protected["jwk"] = jwk
+    else:
+        protected["kid"] = kid
+    payload64 = "" if payload is None else Client._b64(json.dumps(payload).encode('utf8'))
+    protected64 = Client._b64(json.dumps(protected).encode('utf8'))
+    signature = signer.sign("{0}.{1}".format(protected64, payload64).encode('utf8'))
+    return json.dumps({"protected": protected64, "payload": payload64, "signature": Client._b64(signature)})
+
+
+def split_chain(pem, url):
+    """
+    Split the PEM document downloaded from ``url`` into the PEM certificate and its PEM chain.
+    """
+    blocks = [match.group(0) for match in asn1.PEM_RE.finditer(pem.decode('ascii'))]
+    if not blocks:
+        raise ValueError("No certificate in {0}".format(url))
+    return (blocks[0] + "\n").encode('ascii'), "".join(block + "\n" for block in blocks[1:]).encode('ascii')
+
+
+def new_account(contact_email):
+    """
+    Return the payload registering the account of ``contact_email``.
+    """
+    return {"termsOfServiceAgreed": True, "contact": ["mailto:" + contact_email]}
+
+
+def account_kid(response):
+    """
+    Return the account URL, the ``kid`` of later requests, from the new account ``response``.
+    """
+    if response.code == 201:
+        log.info("Account registered!")
+    elif response.code == 200:
+        log.debug("Already registered!")
+    else:
+        raise ValueError("Error registering: {0} {1}".format(response.code, response.body))
+    return response.header('Location')
+
+
+def new_order(csr):
+    """
+    Return the payload ordering a certificate for every name of ``csr``.
+    """
+    log.info("Ordering certificate for %s", ", ".join(csr.names))
+    return {"identifiers": [{"type": "dns", "value": name} for name in csr.names]}
+
+
+def created_order(response):
+    """
+    Return the order URL and the order of the new order ``response``.
+    """
+    if response.code != 201:
+        raise ValueError("Error creating order: {0} {1}".format(response.code, response.body))
+    return response.header('Location'), json.loads(response.body.decode('utf8'))
+
+
+def json_document(response, url):
+    """
+    Return the JSON document of the POST-as-GET ``response`` of ``url``.
+    """
+    if response.code != 200:
+        raise ValueError("Error loading {0}: {1} {2}".format(url, response.code, response.body))
+    return json.loads(response.body.decode('utf8'))
+
+
+def dns_challenge(authorization):
+    """
+    Return the domain, token and URL of the dns-01 challenge of ``authorization``, None when already valid.
+    """
+    domain = authorization['identifier']['value']
+    if authorization['status'] == "valid":
+        log.info("%s already authorized", domain)
+        return None
+    log.info("Verifying %s", domain)
+    challenge = [c for c in authorization['challenges'] if c['type'] == "dns-01"][0]
+    return domain, challenge['token'], challenge['url']
+
+
+def check_triggered(response):
+    if response.code != 200:
+        raise ValueError("Error triggering challenge: {0} {1}".format(response.code, response.body))
+
+
+def finalize(csr):
+    """
+    Return the payload finalizing an order with ``csr``.
+    """
+    return {"csr": Client._b64(csr.der)}
+
+
+def finalized_order(response):
+    """
+    Return the order of the finalize ``response``.
+    """
+    if response.code != 200:
+        raise ValueError("Error finalizing order: {0} {1}".format(response.code, response.body))
+    return json.loads(response.body.decode('utf8'))
+
+
+def check_valid(order_url, order):
+    if order['status'] != "valid":
+        raise ValueError("Order {0} failed: {1}".format(order_url, order))
+
+
+def certificate_chain(response, url):
+    """
+    Return the PEM certificate and its PEM chain of the certificate download ``response`` of ``url``.
+    """
+    # certificate and chain come in one PEM document
+    if response.code != 200:
+        raise ValueError("Error downloading certificate: {0} {1}".format(response.code, response.body))
+    return split_chain(response.body, url)
+
+
+class PostAsGetTransport(object):
+    '''
+    Read only transport for the status poller, ACME v2 resources are fetched with POST-as-GET.
+    '''
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, url, headers=None):
+        return self.client.post_as_get(url)
+
+
+class ClientV2(Client):
+    '''
+    ACME v2 client: one order for all CSR names, POST-as-GET polling, finalize and a single
+    download of the certificate with its chain.
+    '''
+
+    def __init__(self, config, adapter, transport=None):
+        Client.__init__(self, config, adapter, transport)
+        self.kid = None
+        self.poller = StatusPoller(PostAsGetTransport(self))
+
+    def _jws(self, url, payload, nonce):
+        return jws(self.signer, self.header['jwk'], self.kid, url, payload, nonce)
+
+    def post_as_get(self, url):
+        return self._send_signed_request(url, None)
+
+    def reg_account(self):
+        log.debug("Registering account...")
+        self.kid = account_kid(self._send_signed_request(self.nonces.directory()['newAccount'],
+                                                         new_account(self.config.contact_email)))
+
+    def _trigger_challenge(self, challenge):
+        # notify challenge are met
+        check_triggered(self._send_signed_request(challenge['uri'], {}))
+
+    def _fetch_chain(self, chain):
+        # downloaded with the certificate
+        return chain
+
+    def _issue(self, csr, csr_file):
+        with metrics.timer('phase', phase='authorization'):
+            order_url, order, challenges = self.__order(csr)
+
+        self._validate(challenges, csr_file)
+
+        log.info("Signing certificate...")
+        with metrics.timer('phase', phase='issuance'):
+            return self.__finalize(csr, order_url, order)
+
+    def __order(self, csr):
+        # one order for every name of the CSR
+        order_url, order = created_order(self._send_signed_request(self.nonces.directory()['newOrder'],
+                                                                   new_order(csr)))
+        challenges = []
+        for authorization_url in order['authorizations']:
+            challenge = dns_challenge(json_document(self.post_as_get(authorization_url), authorization_url))
+            if challenge is not None:
+                challenges.append(self._challenge(*challenge))
+        return order_url, order, challenges
+
+    def __finalize(self, csr, order_url, order):
+        order = finalized_order(self._send_signed_request(order['finalize'], finalize(csr)))
+        if order['status'] != "valid":
+            for resource, order in self.poller.poll([{'uri': order_url}]):
+                check_valid(order_url, order)
+        return certificate_chain(self.post_as_get(order['certificate']), order['certificate'])
@@ -20,7 +20,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+from __future__ import absolute_import
+
+import fnmatch
+import logging
 import os
+import re
 
 try:
     from ConfigParser import RawConfigParser, NoSectionError, NoOptionError
@@ -29,6 +34,9 @@ except ImportError:  # pragma: no cover
     from configparser import RawConfigParser, NoSectionError, NoOptionError
 
 import acmedns
+from acmedns.store import JsonStore
+
+log = logging.getLogger(__name__)
 
 """
 
@@ -37,6 +45,56 @@ import acmedns
     [default]
     ; general configuration: default endpoint
     url=https://acme-v01.api.letsencrypt.org
+    ; number of CSR signed concurrently
+    workers=4
+    ; directory of authorization and other caches kept across runs
+    cache_dir=~/.acmedns
+
+    ; directories of *.conf files read after this one, comma separated
+    include=conf.d
+
+    [client]
+    acme_url=https://acme-v01.api.letsencrypt.org
+    ; ACME protocol version of acme_url: 1, or 2 for RFC 8555 servers (https://acme-v02.api.letsencrypt.org)
+    acme_version=1
+    account_key=account.key
+    contact_email=admin@example.com
+    ; renew certificates expiring within this many seconds
+    checkend=86400
+    ; HTTP timeout in seconds, and attempts again on a connection error or a 5xx status
+    timeout=30
+    retries=3
+    ; seconds to wait for the challenge records to be served by every nameserver
+    propagation_timeout=2400
+    ; seconds the intermediate certificate is cached (ACME v1)
+    chain_ttl=86400
+    ; write challenges in a dedicated zone, _acme-challenge.<domain> being a CNAME to it
+    challenge_zone=acme.example.net
+
+    [domain]
+    ; a CSR file or a glob pattern of CSR files
+    example.com=example.com/example.com.csr
+    fleet=fleet/*/*.csr
+
+    [hostnames]
+    ; names of a certificate, comma separated, acmedns generates <entry>.key and <entry>.csr in certs_path
+    www=example.org,www.example.org
+
+    [domain:fleet]
+    ; client configuration of the CSR of a [domain] entry
+    checkend=604800
+    ; hooks deploying these certificates, comma separated, every hook by default
+    deploy_hooks=haproxy
+
+    [domain:www]
+    ; size of the keys generated for a [hostnames] entry, a new key is generated on each renewal
+    key_size=4096
+    rotate_key=true
+
+    [hooks]
+    ; commands run once after a batch signing certificates, ACMEDNS_CERT_FILES lists them
+    nginx=service nginx reload
+    haproxy=service haproxy reload
 
     [adapter-ovh]
     endpoint=ovh-eu
@@ -46,6 +104,14 @@ import acmedns
 
 """
 
+#: Section of the client configuration overrides of a [domain] entry
+DOMAIN_SECTION = 'domain:{0}'
+
+#: Version of the resolved domains cache format
+DOMAINS_CACHE_VERSION = 2
+
+MAGIC_RE = re.compile(r'[*?[]')
+
 #: Locations where to look for configuration file by *increasing* priority
 CONFIG_PATH = [
     '/etc/acmedns.conf',
@@ -64,9 +130,23 @@ class ConfigurationManager(object):
         '''
         # create config parser
         self.config = RawConfigParser()
-        config_files = self.config.read(config)
-        self.config_dir = os.path.dirname(os.path.abspath(config_files[0]))
+        self.config_files = self.config.read(config)
+        self.config_dir = os.path.dirname(os.path.abspath(self.config_files[0]))
+        self.includes = self.__read_includes()
         self.certs_path = self.__get('default', 'certs_path')
+        self.workers = int(self.__get('default', 'workers', '1'))
+        self.cache_dir = os.path.expanduser(self.__get('default', 'cache_dir', '~/.acmedns'))
+        self.__watched = None
+
+    def __read_includes(self):
+        includes = []
+        for include in (self.__get('default', 'include') or '').split(','):
+            if include.strip():
+                include = os.path.join(self.config_dir, os.path.expanduser(include.strip()))
+                includes.append(include)
+                files = sorted(os.path.join(include, name) for name in os.listdir(include) if name.endswith('.conf'))
+                self.config_files.extend(self.config.read(files))
+        return includes
 
     @classmethod
     def from_filename(cls, name):
@@ -80,14 +160,60 @@ class ConfigurationManager(object):
         klass = getattr(mod, class_name)
         return klass
 
-    def get_config(self):
-        acme_url = self.__get('client', 'acme_url')
-        account_key = self.__get_file(self.__get('client', 'account_key'))
-        contact_email = self.__get('client', 'contact_email')
-        checkend = self.__get('client', 'checkend', '86400')
-        config = acmedns.ClientConfig(acme_url, account_key, contact_email, checkend)
+    def get_config(self, domain=None):
+        """
+        Return the client configuration, with the overrides of the ``domain`` entry when given.
+        """
+        def get(name, default=None):
+            if domain is not None and self.config.has_option(DOMAIN_SECTION.format(domain), name):
+                return self.config.get(DOMAIN_SECTION.format(domain), name)
+            return self.__get('client', name, default)
+
+        acme_url = get('acme_url')
+        account_key = self.__get_file(get('account_key'))
+        contact_email = get('contact_email')
+        checkend = get('checkend', '86400')
+        timeout = float(get('timeout', '30'))
+        retries = int(get('retries', '3'))
+        propagation_timeout = float(get('propagation_timeout', '2400'))
+        chain_ttl = float(get('chain_ttl', '86400'))
+        acme_version = int(get('acme_version', '1'))
+        challenge_zone = get('challenge_zone')
+        deploy_hooks = get('deploy_hooks')
+        if deploy_hooks is not None:
+            deploy_hooks = ConfigurationManager.__split(deploy_hooks)
+        key_size = int(get('key_size', '2048'))
+        rotate_key = get('rotate_key', 'true').lower() in ('1', 'yes', 'true', 'on')
+        config = acmedns.ClientConfig(acme_url, account_key, contact_email, checkend, timeout, retries,
+                                      propagation_timeout, self.cache_dir, chain_ttl, acme_version,
+                                      challenge_zone, deploy_hooks, key_size, rotate_key)
         return config
 
+    @staticmethod
+    def __split(value):
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def __items(self, section):
+        if not self.config.has_section(section):
+            return []
+        return self.config.items(section)
+
+    def get_hooks(self):
+        """
+        Return the deploy hook commands by name.
+        """
+        return dict(self.__items('hooks'))
+
+    def get_hostnames(self):
+        """
+        Return the names by CSR file of the [hostnames] entries, their key and CSR are generated.
+        """
+        return dict((self.__hostname_csr_file(name), ConfigurationManager.__split(value))
+                    for name, value in self.__items('hostnames'))
+
+    def __hostname_csr_file(self, name):
+        return os.path.join(self.certs_path or self.config_dir, name + '.csr')
+
     def get_adapter(self):
         adapter_class_name = self.__get('adapter', 'class_name')
         adapter_config = dict(self.config.items('adapter'))
@@ -96,11 +222,126 @@ class ConfigurationManager(object):
         return adapter
 
     def get_domains(self):
-        domain_items = self.config.items('domain')
-        domains = []
-        for k, v in domain_items:
-            domains.append(self.__get_file(v))
-        return domains
+        return [csr_file for csr_file, entry in self.__domain_entries()]
+
+    def get_domain_configs(self):
+        """
+        Return the client configuration by CSR file of the CSR with overrides.
+        """
+        configs = {}
+        domain_configs = {}
+        for csr_file, entry in self.__domain_entries():
+            if self.config.has_section(DOMAIN_SECTION.format(entry)):
+                if entry not in configs:
+                    configs[entry] = self.get_config(entry)
+                domain_configs[csr_file] = configs[entry]
+        return domain_configs
+
+    def watched(self):
+        """
+        Return the modification time by path of the config files, of the include directories and of
+        the directories searched for CSR, the configuration changes only when one of them changes.
+        """
+        if self.__watched is None:
+            self.__watched = self.__mtimes(self.__watched_paths(self.__domain_directories()))
+        return self.__watched
+
+    def __watched_paths(self, directories):
+        # a new file in an include directory changes its modification time
+        return list(self.config_files) + list(self.includes) + sorted(directories)
+
+    def __domain_directories(self):
+        directories = set()
+        for name, value in self.__items('domain'):
+            if MAGIC_RE.search(value):
+                self.__glob_files(value, directories)
+            else:
+                directories.add(os.path.dirname(os.path.abspath(self.__get_file(value))))
+        return directories
+
+    def __domain_entries(self):
+        # (csr file, [domain] or [hostnames] entry) list, cached when resolving patterns or includes
+        patterns = any(MAGIC_RE.search(value) for name, value in self.__items('domain'))
+        cache = None
+        if patterns or self.includes:
+            # one list by configuration sharing the cache directory
+            cache = JsonStore(os.path.join(self.cache_dir, 'domains.json'))
+            cache_key = os.path.abspath(self.config_files[0])
+            config_files = [os.path.abspath(config_file) for config_file in self.config_files]
+            cached = cache.get(cache_key)
+            if cached is not None and cached['version'] == DOMAINS_CACHE_VERSION \
+                    and cached['certs_path'] == self.certs_path \
+                    and cached['config_files'] == config_files \
+                    and cached['watched'] == self.__mtimes(cached['watched']):
+                log.debug("Using cached domain list")
+                self.__watched = cached['watched']
+                return [tuple(entry) for entry in cached['entries']]
+
+        directories = set()
+        entries = []
+        for name, value in self.__items('domain'):
+            if MAGIC_RE.search(value):
+                csr_files = self.__glob_files(value, directories)
+                if not csr_files:
+                    log.warning("No CSR matching %s", value)
+                entries.extend((csr_file, name) for csr_file in csr_files)
+            else:
+                csr_file = self.__get_file(value)
+                directories.add(os.path.dirname(os.path.abspath(csr_file)))
+                entries.append((csr_file, name))
+        # generated files are not watched, writing them must not reload the configuration
+        entries.extend((self.__hostname_csr_file(name), name) for name, value in self.__items('hostnames'))
+
+        if cache is not None:
+            self.__watched = self.__mtimes(self.__watched_paths(directories))
+            cache.set(cache_key, {'version': DOMAINS_CACHE_VERSION, 'certs_path': self.certs_path,
+                                  'config_files': config_files, 'watched': self.__watched, 'entries': entries})
+        return entries
+
+    @staticmethod
+    def __mtimes(paths):
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = os.stat(path).st_mtime
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def __glob_files(self, pattern, directories):
+        # glob from the first location with matches, like __get_file, recording the directories listed
+        bases = [''] if os.path.isabs(pattern) else [os.getcwd(), self.certs_path, self.config_dir]
+        for base in bases:
+            if base is None:
+                continue
+            listed = set()
+            matches = ConfigurationManager.__glob(os.path.join(base, pattern), listed)
+            directories.update(listed)
+            if matches:
+                return sorted(path for path in matches if os.path.isfile(path))
+        return []
+
+    @staticmethod
+    def __glob(pattern, listed):
+        parts = pattern.split(os.sep)
+        paths = [os.sep if pattern.startswith(os.sep) else '']
+        for part in parts:
+            if not part:
+                continue
+            if not MAGIC_RE.search(part):
+                paths = [os.path.join(path, part) for path in paths if os.path.exists(os.path.join(path, part))]
+                continue
+            matched = []
+            for path in paths:
+                if not os.path.isdir(path):
+                    continue
+                listed.add(os.path.abspath(path))
+                names = fnmatch.filter(os.listdir(path), part)
+                if not part.startswith('.'):
+                    names = [name for name in names if not name.startswith('.')]
+                matched.extend(os.path.join(path, name) for name in sorted(names))
+            paths = matched
+        return paths
 
     def __get_file(self, filename):
         if os.path.isfile(filename):
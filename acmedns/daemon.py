@@ -0,0 +1,135 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+from acmedns import metrics
+from acmedns.config import ConfigurationManager
+from acmedns.domain import DomainManager, SignResult
+
+log = logging.getLogger(__name__)
+
+
+class RenewalDaemon(object):
+    '''
+    Keep certificates renewed from a long running process.
+
+    Certificates are kept in a priority queue ordered by renewal deadline, their expiry minus
+    ``checkend`` plus a random ``jitter``. The daemon sleeps until the next deadline and reloads
+    the configuration when the config file changes.
+    '''
+
+    def __init__(self, config_file, workers=None, jitter=3600, retry_delay=3600, reload_interval=60):
+        self.config_file = config_file
+        self.workers = workers
+        self.jitter = jitter
+        self.retry_delay = retry_delay
+        self.reload_interval = reload_interval
+        self.domain_mngt = None
+        self.queue = []
+        self.__watched = None
+        self.__stop = threading.Event()
+
+    def stop(self):
+        self.__stop.set()
+
+    def run(self):
+        log.info("Renewal daemon started with %s", self.config_file)
+        while not self.__stop.is_set():
+            self.reload()
+            due = []
+            while self.queue and self.queue[0][0] <= time.time():
+                due.append(heapq.heappop(self.queue)[1])
+            if due:
+                try:
+                    results = self.domain_mngt.sign(due)
+                except Exception:
+                    log.exception("Error renewing certificates")
+                    results = [SignResult(csr_file, SignResult.FAILED) for csr_file in due]
+                for result in results:
+                    if result.status == SignResult.DEFERRED:
+                        heapq.heappush(self.queue, (time.time() + result.retry_after, result.csr_file))
+                    else:
+                        self.__schedule(result.csr_file, result.status == SignResult.FAILED)
+                metrics.export()
+            delay = self.reload_interval
+            if self.queue:
+                delay = max(0, min(delay, self.queue[0][0] - time.time()))
+                log.debug("Next renewal %s in %ds", self.queue[0][1], self.queue[0][0] - time.time())
+            self.__stop.wait(delay)
+        log.info("Renewal daemon stopped")
+
+    def reload(self):
+        """
+        Load the configuration again if a config file or a CSR directory changed and rebuild the queue.
+        """
+        if not self.__changed():
+            return
+        log.info("Loading configuration %s", self.config_file)
+        self.__watched = {self.config_file: os.stat(self.config_file).st_mtime}
+        try:
+            config_mngt = ConfigurationManager.from_filename(self.config_file)
+            domain_mngt = DomainManager.from_config(config_mngt, self.workers)
+        except Exception:
+            if self.domain_mngt is None:
+                raise
+            log.exception("Error loading configuration, keeping the previous one")
+            return
+        if self.domain_mngt is not None:
+            self.domain_mngt.inventory.close()
+        self.domain_mngt = domain_mngt
+        self.__watched = config_mngt.watched()
+        self.domain_mngt.inventory.refresh(self.domain_mngt.domains)
+        self.queue = []
+        for csr_file in self.domain_mngt.domains:
+            self.__schedule(csr_file)
+
+    def __changed(self):
+        if self.__watched is None:
+            return True
+        for path, mtime in self.__watched.items():
+            try:
+                current = os.stat(path).st_mtime
+            except OSError:
+                current = None
+            if current != mtime:
+                return True
+        return False
+
+    def __schedule(self, csr_file, failed=False):
+        checkend = int(self.domain_mngt.config_for(csr_file).checkend)
+        # jitter must stay below checkend, certificates are renewed only once within checkend
+        jitter = random.uniform(0, min(self.jitter, checkend / 2.0))
+        entry = self.domain_mngt.inventory.get(csr_file)
+        if failed:
+            deadline = time.time() + self.retry_delay + jitter
+        elif entry is None or entry['not_after'] is None:
+            deadline = time.time()
+        else:
+            deadline = entry['not_after'] - checkend + jitter
+        heapq.heappush(self.queue, (deadline, csr_file))
@@ -0,0 +1,72 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+from acmedns.lazy import LazyModule
+
+dns = LazyModule('dns', 'dns.exception', 'dns.resolver')
+log = logging.getLogger(__name__)
+
+
+class DelegationResolver(object):
+    '''
+    Resolve ``_acme-challenge.<domain>`` CNAME delegations to a dedicated challenge zone.
+
+    Challenge records are then written in ``challenge_zone`` instead of the domain zone, lookups are
+    cached ``ttl`` seconds.
+    '''
+
+    def __init__(self, challenge_zone, ttl=3600):
+        self.challenge_zone = challenge_zone.strip(".")
+        self.ttl = ttl
+        self.__cache = {}
+        self.__lock = threading.Lock()
+
+    def resolve(self, domain):
+        """
+        Return ``(zone, subdomain)`` of the delegated challenge record of ``domain``, None when not delegated.
+        """
+        with self.__lock:
+            cached = self.__cache.get(domain)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+
+        name = "_acme-challenge." + domain
+        delegation = None
+        try:
+            target = dns.resolver.query(name, 'CNAME')[0].target.to_text(omit_final_dot=True)
+        except dns.exception.DNSException as e:
+            log.debug("No delegation for %s: %s", name, e)
+        else:
+            if target.endswith("." + self.challenge_zone):
+                delegation = (self.challenge_zone, target[:-len(self.challenge_zone) - 1])
+                log.debug("%s delegated to %s", name, target)
+            else:
+                log.warning("%s delegated to %s outside of %s", name, target, self.challenge_zone)
+
+        with self.__lock:
+            self.__cache[domain] = (time.time() + self.ttl, delegation)
+        return delegation
@@ -20,22 +20,247 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from client import Client
+from __future__ import absolute_import
+
+import logging
+import os
+import time
+from multiprocessing.pool import ThreadPool
+from acmedns.client import Client
+from acmedns.client_v2 import ClientV2
+from acmedns.hooks import DeployHooks
+from acmedns.inventory import Inventory
+from acmedns.keys import KeyManager
+from acmedns.ratelimit import IssuanceScheduler, RateLimiter
+from acmedns.store import JsonStore
+from acmedns.x509 import CertificateRequest
+
+log = logging.getLogger(__name__)
+
+#: CSR signed concurrently by the asyncio client, unless given
+ASYNC_WORKERS = 100
+
+
+class SignResult(object):
+
+    SIGNED = 'signed'
+    VALID = 'valid'
+    FAILED = 'failed'
+    DEFERRED = 'deferred'
+
+    def __init__(self, csr_file, status, cert_file=None, error=None, retry_after=None, duration=None):
+        self.csr_file = csr_file
+        self.status = status
+        self.cert_file = cert_file
+        self.error = error
+        self.retry_after = retry_after
+        # seconds spent signing, None when the CSR was not sent to the CA
+        self.duration = duration
+
+    def __repr__(self):
+        return "SignResult({0}, {1})".format(self.csr_file, self.status)
 
 
 class DomainManager:
+    '''
+    Sign the CSR due for renewal, within rate limits, then run the deploy hooks.
+
+    With ``use_async``, each group of CSR sharing a configuration is signed by an AsyncClient on an
+    event loop, ``workers`` at once (Python 3 and ACME v2 only).
+    '''
 
-    def __init__(self, config, adapter, domains):
+    def __init__(self, config, adapter, domains, workers=1, inventory=None, scheduler=None, domain_configs=None,
+                 hooks=None, keys=None, use_async=False):
         self.config = config
         self.adapter = adapter
         self.domains = domains
+        self.workers = workers
+        self.inventory = inventory
+        self.scheduler = scheduler
+        self.domain_configs = domain_configs or {}
+        self.hooks = hooks
+        self.keys = keys
+        self.use_async = use_async
+        if use_async:
+            for csr_file, domain_config in [(None, config)] + list(self.domain_configs.items()):
+                if domain_config.acme_version != 2:
+                    raise ValueError("The asyncio client requires acme_version = 2{0}".format(
+                        "" if csr_file is None else " for " + csr_file))
 
     @classmethod
-    def from_config(cls, config_mngt):
-        return cls(config_mngt.get_config(), config_mngt.get_adapter(), config_mngt.get_domains())
+    def from_config(cls, config_mngt, workers=None, use_async=False):
+        if workers is None:
+            workers = ASYNC_WORKERS if use_async else config_mngt.workers
+        config = config_mngt.get_config()
+        inventory = Inventory(config.cache_file('inventory.sqlite'))
+        limiter = RateLimiter(JsonStore(config.cache_file('ratelimits.json')), os.path.abspath(config.account_key))
+        return cls(config, config_mngt.get_adapter(), config_mngt.get_domains(), workers, inventory,
+                   IssuanceScheduler(limiter, inventory), config_mngt.get_domain_configs(),
+                   DeployHooks(config_mngt.get_hooks()), KeyManager(config_mngt.get_hostnames()), use_async)
+
+    def config_for(self, csr_file):
+        """
+        Return the client configuration of ``csr_file``, with its domain overrides.
+        """
+        return self.domain_configs.get(csr_file, self.config)
+
+    def __group(self, csr_files, key):
+        # CSR files by key of their configuration, in order
+        groups = []
+        indexes = {}
+        for csr_file in csr_files:
+            value = key(self.config_for(csr_file))
+            if value not in indexes:
+                indexes[value] = len(groups)
+                groups.append((value, []))
+            groups[indexes[value]][1].append(csr_file)
+        return groups
+
+    def __sign(self, client, csr_file, force):
+        self._acquire(csr_file)
+        result = self._deferred(csr_file)
+        if result is not None:
+            return result
+        # isolate failures so that one bad CSR does not abort the whole batch
+        start = time.time()
+        try:
+            cert_file = client.sign(csr_file, force=force)
+        except Exception as e:
+            log.exception("Error signing %s", csr_file)
+            return self._signed(csr_file, None, e, start)
+        return self._signed(csr_file, cert_file, None, start)
+
+    def _acquire(self, csr_file, blocking=True):
+        """
+        Acquire the pending authorizations of ``csr_file`` before it is sent, see IssuanceScheduler.acquire.
+        """
+        return self.scheduler is None or self.scheduler.acquire(csr_file, blocking)
+
+    def _deferred(self, csr_file):
+        """
+        Return a deferred SignResult when a rate limit hit by another CSR of the batch defers ``csr_file``,
+        None when it can be sent.
+        """
+        if self.scheduler is not None:
+            wait = self.scheduler.blocked(csr_file)
+            if wait > 0:
+                log.info("Deferring %s for %ds, rate limited", csr_file, wait)
+                self.scheduler.cancel(csr_file)
+                return SignResult(csr_file, SignResult.DEFERRED, retry_after=wait)
+        return None
+
+    def _signed(self, csr_file, cert_file, error, start):
+        """
+        Return the SignResult of ``csr_file`` sent at ``start``, promote its key and record it for the rate limits.
+        """
+        if error is not None:
+            result = SignResult(csr_file, SignResult.FAILED, error=error)
+        elif cert_file is None:
+            result = SignResult(csr_file, SignResult.VALID)
+        else:
+            result = SignResult(csr_file, SignResult.SIGNED, cert_file=cert_file)
+        result.duration = time.time() - start
+        if self.keys is not None and result.status == SignResult.SIGNED:
+            # the certificate is written, its key replaces the previous one now
+            self.keys.promote([csr_file])
+        if self.scheduler is not None:
+            self.scheduler.record(csr_file, result.status == SignResult.SIGNED, result.error)
+        return result
+
+    def __csr_names(self, csr_file):
+        # names of the CSR as last read, None when unknown
+        if self.inventory is not None:
+            entry = self.inventory.get(csr_file)
+            return entry['names'] if entry is not None and entry['names'] else None
+        try:
+            return CertificateRequest.from_file(csr_file).names
+        except (IOError, ValueError, IndexError):
+            return None
+
+    def __sign_domains(self, domains, forced):
+        results = []
+        # one client by distinct configuration
+        for config_id, group in self.__group(domains, id):
+            results.extend(self.__sign_group(self.config_for(group[0]), group, forced))
+        return results
+
+    def __sign_group(self, config, domains, forced):
+        if self.use_async:
+            # Python 3 only
+            from acmedns.async_client import sign_domains
+            return sign_domains(self, config, domains, forced)
+        client_class = ClientV2 if config.acme_version == 2 else Client
+        client = client_class(config, self.adapter)
+        try:
+            client.reg_account()
+
+            workers = min(self.workers, len(domains))
+            if workers > 1:
+                log.info("Signing %d CSR with %d workers", len(domains), workers)
+                pool = ThreadPool(workers)
+                try:
+                    return pool.map(lambda csr_file: self.__sign(client, csr_file, csr_file in forced), domains)
+                finally:
+                    pool.close()
+                    pool.join()
+            return [self.__sign(client, csr_file, csr_file in forced) for csr_file in domains]
+        finally:
+            # challenge records are deleted in the background, flush them at the end of the batch
+            client.close()
 
     def sign_all(self):
-        client = Client(self.config, self.adapter)
-        client.reg_account()
-        for domain in self.domains:
-            client.sign(domain)
+        return self.sign(self.domains)
+
+    def sign(self, csr_files):
+        domains = csr_files
+        if self.keys is not None:
+            self.keys.recover(csr_files)
+        if self.inventory is not None:
+            self.inventory.refresh(csr_files)
+        changed = set()
+        if self.keys is not None:
+            # hostname entries whose names changed are signed again, whatever the expiry of their certificate
+            changed.update(self.keys.changed(csr_files, self.__csr_names))
+        if self.inventory is not None:
+            # only sign CSR without certificate or with an expiring one
+            expiring = set(changed)
+            for checkend, group in self.__group(csr_files, lambda config: int(config.checkend)):
+                expiring.update(self.inventory.expiring(group, checkend))
+            domains = [csr_file for csr_file in csr_files if csr_file in expiring]
+            log.info("%d of %d certificates to renew", len(domains), len(csr_files))
+
+        if domains and self.keys is not None:
+            # keys and CSR of the hostname entries to sign, generated before planning as the plan reads names
+            generated = self.keys.prepare(domains, self.config_for)
+            if generated and self.inventory is not None:
+                self.inventory.refresh(generated)
+
+        results = dict((csr_file, SignResult(csr_file, SignResult.VALID)) for csr_file in csr_files)
+        if domains and self.scheduler is not None:
+            # most urgent first, defer CSR that would exceed a rate limit
+            domains, deferred = self.scheduler.plan(domains)
+            for csr_file, wait in deferred.items():
+                results[csr_file] = SignResult(csr_file, SignResult.DEFERRED, retry_after=wait)
+        if domains:
+            for result in self.__sign_domains(domains, changed):
+                results[result.csr_file] = result
+            if self.inventory is not None:
+                self.inventory.refresh(domains)
+        results = [results[csr_file] for csr_file in csr_files]
+
+        if self.hooks is not None:
+            # once per batch, however many certificates a hook deploys
+            self.hooks.run([(self.config_for(result.csr_file).deploy_hooks, result.cert_file)
+                            for result in results if result.status == SignResult.SIGNED])
+
+        for result in results:
+            if result.status == SignResult.FAILED:
+                log.error("%s: %s (%s)", result.csr_file, result.status, result.error)
+            else:
+                log.debug("%s: %s", result.csr_file, result.status)
+        log.info("Signed: %d, valid: %d, deferred: %d, failed: %d",
+                 len([r for r in results if r.status == SignResult.SIGNED]),
+                 len([r for r in results if r.status == SignResult.VALID]),
+                 len([r for r in results if r.status == SignResult.DEFERRED]),
+                 len([r for r in results if r.status == SignResult.FAILED]))
+        return results
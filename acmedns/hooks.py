@@ -0,0 +1,70 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import os
+import subprocess
+from acmedns import metrics
+
+log = logging.getLogger(__name__)
+
+
+class DeployHooks(object):
+    '''
+    Shell commands by name, run after a batch for the certificates it signed.
+
+    A hook deploying several certificates of the batch still runs once, with their files in the
+    space separated ``ACMEDNS_CERT_FILES`` environment variable.
+    '''
+
+    def __init__(self, commands):
+        self.commands = commands
+
+    def run(self, signed):
+        """
+        Run the hooks of ``signed``, a list of (hook names, certificate file), and return the exit
+        status by hook name. None hook names select every hook.
+        """
+        cert_files = {}
+        for names, cert_file in signed:
+            for name in self.commands if names is None else names:
+                if name not in self.commands:
+                    log.warning("Unknown deploy hook %s for %s", name, cert_file)
+                    continue
+                cert_files.setdefault(name, []).append(cert_file)
+
+        statuses = {}
+        for name in sorted(cert_files):
+            log.info("Running deploy hook %s for %d certificates", name, len(cert_files[name]))
+            env = dict(os.environ, ACMEDNS_CERT_FILES=" ".join(cert_files[name]))
+            with metrics.timer('deploy_hook', hook=name):
+                try:
+                    statuses[name] = subprocess.call(self.commands[name], shell=True, env=env)
+                except OSError as e:
+                    log.error("Error running deploy hook %s: %s", name, e)
+                    statuses[name] = None
+                    continue
+            if statuses[name] != 0:
+                log.error("Deploy hook %s exited with status %s", name, statuses[name])
+        return statuses
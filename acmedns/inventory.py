@@ -0,0 +1,138 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import calendar
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from acmedns.client import Client
+from acmedns.x509 import Certificate, CertificateRequest
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS certificate (
+    csr_file TEXT PRIMARY KEY,
+    csr_mtime REAL,
+    names TEXT,
+    cert_file TEXT,
+    cert_mtime REAL,
+    cert_hash TEXT,
+    not_after REAL
+)
+"""
+
+
+class Inventory(object):
+    '''
+    SQLite index of CSR files and their certificates.
+
+    Entries are refreshed only when the CSR or certificate file mtime changed, renewal decisions are then
+    a query on ``not_after``. When ``path`` is None the index lives in memory only.
+    '''
+
+    def __init__(self, path):
+        if path is not None and not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            os.makedirs(os.path.dirname(os.path.abspath(path)))
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self.__db.execute(SCHEMA)
+        self.__db.commit()
+
+    def refresh(self, csr_files):
+        """
+        Update entries of ``csr_files`` whose CSR or certificate changed since the last refresh.
+        """
+        with self.__lock:
+            rows = dict((row[0], row[1:]) for row in self.__db.execute(
+                "SELECT csr_file, csr_mtime, names, cert_file, cert_mtime, cert_hash, not_after FROM certificate"))
+            updated = 0
+            for csr_file in csr_files:
+                row = rows.get(csr_file)
+                entry = self.__entry(csr_file, row)
+                if entry != row:
+                    self.__db.execute("INSERT OR REPLACE INTO certificate VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      (csr_file,) + entry)
+                    updated += 1
+            self.__db.commit()
+        log.debug("Inventory refreshed, %d of %d entries updated", updated, len(csr_files))
+
+    def expiring(self, csr_files, checkend):
+        """
+        Return the ``csr_files`` without certificate or with a certificate expiring within ``checkend`` seconds.
+        """
+        with self.__lock:
+            valid = set(row[0] for row in self.__db.execute(
+                "SELECT csr_file FROM certificate WHERE not_after > ?", (time.time() + checkend,)))
+        return [csr_file for csr_file in csr_files if csr_file not in valid]
+
+    def get(self, csr_file):
+        with self.__lock:
+            row = self.__db.execute("SELECT names, cert_file, not_after FROM certificate WHERE csr_file = ?",
+                                    (csr_file,)).fetchone()
+        if row is None:
+            return None
+        return {'names': row[0].split(",") if row[0] else [], 'cert_file': row[1], 'not_after': row[2]}
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
+
+    @staticmethod
+    def __mtime(filename):
+        try:
+            return os.stat(filename).st_mtime
+        except OSError:
+            return None
+
+    @staticmethod
+    def __entry(csr_file, row):
+        csr_mtime, names, cert_file, cert_mtime, cert_hash, not_after = row or (None,) * 6
+
+        current_csr_mtime = Inventory.__mtime(csr_file)
+        if current_csr_mtime != csr_mtime:
+            csr_mtime = current_csr_mtime
+            try:
+                names = ",".join(CertificateRequest.from_file(csr_file).names)
+            except (IOError, ValueError, IndexError) as e:
+                log.warning("Error loading CSR %s: %s", csr_file, e)
+                names = None
+
+        cert_file = Client.cert_file_names(csr_file)[0]
+        current_cert_mtime = Inventory.__mtime(cert_file)
+        if current_cert_mtime != cert_mtime:
+            cert_mtime, cert_hash, not_after = current_cert_mtime, None, None
+            if cert_mtime is not None:
+                try:
+                    with open(cert_file, 'rb') as cert:
+                        data = cert.read()
+                    cert_hash = hashlib.sha256(data).hexdigest()
+                    not_after = calendar.timegm(Certificate(data).not_after.timetuple())
+                except (IOError, ValueError, IndexError) as e:
+                    log.warning("Error loading certificate %s: %s", cert_file, e)
+        return csr_mtime, names, cert_file, cert_mtime, cert_hash, not_after
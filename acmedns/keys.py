@@ -0,0 +1,222 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from multiprocessing import Pool
+from acmedns import metrics
+from acmedns.client import Client
+from acmedns.store import write_file
+
+log = logging.getLogger(__name__)
+
+OPENSSL_REQ_CONFIG = """[req]
+distinguished_name = dn
+req_extensions = san
+prompt = no
+[dn]
+CN = {0}
+[san]
+subjectAltName = {1}
+"""
+
+
+def _text(value):
+    return value.decode('ascii') if isinstance(value, bytes) else value
+
+
+def _openssl(args, data=None):
+    proc = subprocess.Popen(["openssl"] + args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    out, err = proc.communicate(data)
+    if proc.returncode != 0:
+        raise IOError("OpenSSL Error: {0}".format(err))
+    return out
+
+
+def generate_key(key_size):
+    """
+    Return a new PEM RSA private key of ``key_size`` bits.
+    """
+    try:
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+    except ImportError:  # pragma: no cover
+        # cryptography not installed, fallback to openssl command
+        return _openssl(["genrsa", str(key_size)])
+    key = rsa.generate_private_key(65537, key_size, default_backend())
+    return key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.TraditionalOpenSSL,
+                             serialization.NoEncryption())
+
+
+def generate_csr(key_file, names):
+    """
+    Return a PEM CSR of the key ``key_file`` for ``names``, the first one being the common name.
+    """
+    try:
+        from cryptography import x509
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.x509.oid import NameOID
+    except ImportError:  # pragma: no cover
+        return _openssl_csr(key_file, names)
+    with open(key_file, 'rb') as key:
+        key = serialization.load_pem_private_key(key.read(), password=None, backend=default_backend())
+    csr = x509.CertificateSigningRequestBuilder().subject_name(
+        x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, _text(names[0]))])
+    ).add_extension(
+        x509.SubjectAlternativeName([x509.DNSName(_text(name)) for name in names]), critical=False
+    ).sign(key, hashes.SHA256(), default_backend())
+    return csr.public_bytes(serialization.Encoding.PEM)
+
+
+def _openssl_csr(key_file, names):
+    directory = tempfile.mkdtemp()
+    try:
+        config_file = os.path.join(directory, 'openssl.cnf')
+        with open(config_file, 'w') as config:
+            config.write(OPENSSL_REQ_CONFIG.format(names[0], ",".join("DNS:" + name for name in names)))
+        return _openssl(["req", "-new", "-sha256", "-key", key_file, "-config", config_file])
+    finally:
+        shutil.rmtree(directory)
+
+
+def key_file_names(csr_file):
+    """
+    Return the private key file name of ``csr_file`` and the one of the key waiting for its certificate.
+    """
+    base_name = os.path.abspath(csr_file.rsplit(".", 1)[0])
+    return base_name + '.key', base_name + '.key.next'
+
+
+def _generate(job):
+    # run in a pool process: generate the key when missing, then the CSR, failures are isolated
+    key_file, csr_file, names, key_size = job
+    try:
+        if not os.path.isfile(key_file):
+            log.info("Generating %d bits key %s", key_size, key_file)
+            write_file(key_file, generate_key(key_size), 0o600)
+        write_file(csr_file, generate_csr(key_file, names))
+    except Exception:
+        log.exception("Error generating the key and CSR of %s", csr_file)
+        return None
+    return csr_file
+
+
+class KeyManager(object):
+    '''
+    Private keys and CSR of hostname entries, generated in a pool of ``processes``.
+
+    The CSR is generated again before each signature, an entry whose names changed is signed again at
+    once. On renewal with ``rotate_key``, a new key is generated in ``<name>.key.next`` and replaces
+    ``<name>.key`` once its certificate is written.
+    '''
+
+    def __init__(self, hostnames, processes=None):
+        self.hostnames = hostnames
+        self.processes = processes
+        # CSR files generated with their next key
+        self.__rotated = set()
+
+    def prepare(self, csr_files, config_for):
+        """
+        Generate the missing keys and the CSR of the hostname entries among ``csr_files`` about to be
+        signed, ``config_for`` returns their client configuration. Return the CSR files generated.
+        """
+        jobs = []
+        for csr_file in csr_files:
+            if csr_file not in self.hostnames:
+                continue
+            config = config_for(csr_file)
+            key_file, next_key_file = key_file_names(csr_file)
+            cert_file = Client.cert_file_names(csr_file)[0]
+            if config.rotate_key and os.path.isfile(key_file) and os.path.isfile(cert_file):
+                key_file = next_key_file
+            jobs.append((key_file, csr_file, self.hostnames[csr_file], config.key_size))
+        if not jobs:
+            return []
+
+        with metrics.timer('keygen'):
+            if len(jobs) == 1:
+                generated = [_generate(jobs[0])]
+            else:
+                # RSA key generation is CPU bound, use processes
+                pool = Pool(self.processes)
+                try:
+                    generated = pool.map(_generate, jobs)
+                finally:
+                    pool.close()
+                    pool.join()
+        for job, csr_file in zip(jobs, generated):
+            if csr_file is not None and job[0].endswith('.next'):
+                self.__rotated.add(csr_file)
+        return [csr_file for csr_file in generated if csr_file is not None]
+
+    def changed(self, csr_files, csr_names):
+        """
+        Return the hostname entries among ``csr_files`` whose CSR names differ from their hostnames,
+        ``csr_names`` returns the names of a CSR file or None when it is unknown.
+        """
+        changed = []
+        for csr_file in csr_files:
+            if csr_file in self.hostnames:
+                names = csr_names(csr_file)
+                if names is not None and names != self.hostnames[csr_file]:
+                    log.info("Names of %s changed to %s", csr_file, ", ".join(self.hostnames[csr_file]))
+                    changed.append(csr_file)
+        return changed
+
+    def recover(self, csr_files):
+        """
+        Replace the keys of the hostname entries among ``csr_files`` signed by a run stopped before
+        replacing them: their certificate is newer than their next key and their CSR.
+        """
+        for csr_file in csr_files:
+            key_file, next_key_file = key_file_names(csr_file)
+            if csr_file not in self.hostnames or not os.path.isfile(next_key_file):
+                continue
+            try:
+                next_key_mtime = os.stat(next_key_file).st_mtime
+                csr_mtime = os.stat(csr_file).st_mtime
+                cert_mtime = os.stat(Client.cert_file_names(csr_file)[0]).st_mtime
+            except OSError:
+                continue
+            if cert_mtime > csr_mtime >= next_key_mtime:
+                log.warning("Replacing key %s, its certificate was signed with %s", key_file, next_key_file)
+                os.rename(next_key_file, key_file)
+
+    def promote(self, csr_files):
+        """
+        Replace the keys of the signed ``csr_files`` by the next keys their CSR were generated with.
+        """
+        for csr_file in csr_files:
+            if csr_file in self.__rotated:
+                self.__rotated.discard(csr_file)
+                key_file, next_key_file = key_file_names(csr_file)
+                log.info("Replacing key %s", key_file)
+                os.rename(next_key_file, key_file)
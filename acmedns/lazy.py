@@ -0,0 +1,55 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule(object):
+    '''
+    Module imported with its ``submodules`` on first attribute access, keeping slow imports such as
+    dnspython off the startup path of runs with nothing to sign.
+    '''
+
+    def __init__(self, name, *submodules):
+        self.__name = name
+        self.__submodules = submodules
+        self.__module = None
+
+    def __load(self):
+        if self.__module is None:
+            with _lock:
+                if self.__module is None:
+                    for submodule in self.__submodules:
+                        importlib.import_module(submodule)
+                    self.__module = importlib.import_module(self.__name)
+        return self.__module
+
+    def __getattr__(self, name):
+        return getattr(self.__load(), name)
+
+    def __repr__(self):
+        return "<lazy module '{0}'>".format(self.__name)
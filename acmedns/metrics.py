@@ -0,0 +1,229 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Process wide timing histograms and counters, exported as a Prometheus textfile or a JSON summary.
+
+Metrics are disabled until :func:`enable` is called, :func:`timer` and :func:`count` are then no-ops.
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import threading
+import time
+from acmedns.store import write_file
+
+log = logging.getLogger(__name__)
+
+#: Upper bounds in seconds of the histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, float('inf'))
+
+PREFIX = 'acmedns_'
+
+_registry = None
+
+
+class Histogram(object):
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Return the upper bound of the bucket holding the ``q`` quantile, capped by the maximum observed.
+        """
+        rank = q * self.count
+        seen = 0
+        for index, bound in enumerate(BUCKETS):
+            seen += self.buckets[index]
+            if seen >= rank and seen > 0:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry(object):
+    '''
+    Thread safe counters and histograms by name and labels.
+    '''
+
+    def __init__(self, textfile=None, json_file=None):
+        self.textfile = textfile
+        self.json_file = json_file
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.__lock = threading.Lock()
+
+    def count(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def prometheus(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self.__lock:
+            previous = None
+            for name, labels in sorted(self.counters):
+                metric = PREFIX + name + '_total'
+                if name != previous:
+                    lines.append('# TYPE {0} counter'.format(metric))
+                    previous = name
+                lines.append('{0}{1} {2}'.format(metric, _labels(labels), self.counters[(name, labels)]))
+            previous = None
+            for name, labels in sorted(self.histograms):
+                metric = PREFIX + name + '_seconds'
+                if name != previous:
+                    lines.append('# TYPE {0} histogram'.format(metric))
+                    previous = name
+                histogram = self.histograms[(name, labels)]
+                cumulative = 0
+                for bound, value in zip(BUCKETS, histogram.buckets):
+                    cumulative += value
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append('{0}_bucket{1} {2}'.format(metric, _labels(labels + (('le', le),)), cumulative))
+                lines.append('{0}_sum{1} {2!r}'.format(metric, _labels(labels), histogram.sum))
+                lines.append('{0}_count{1} {2}'.format(metric, _labels(labels), histogram.count))
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Return the metrics as a JSON serializable run summary.
+        """
+        with self.__lock:
+            return {
+                'started': self.started,
+                'duration': time.time() - self.started,
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'timers': [{'name': name, 'labels': dict(labels), 'count': histogram.count,
+                            'sum': histogram.sum, 'max': histogram.max,
+                            'p50': histogram.quantile(0.5), 'p99': histogram.quantile(0.99)}
+                           for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def export(self):
+        """
+        Write the Prometheus textfile and the JSON summary when their paths are set.
+        """
+        if self.textfile is not None:
+            write_file(self.textfile, self.prometheus())
+        if self.json_file is not None:
+            write_file(self.json_file, json.dumps(self.summary(), indent=2, sort_keys=True) + "\n")
+
+
+class _Timer(object):
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.registry.observe(self.name, time.time() - self.start, self.labels)
+        return False
+
+
+class _NoopTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in labels) + '}'
+
+
+def enable(textfile=None, json_file=None):
+    """
+    Start recording metrics, exported to ``textfile`` and ``json_file`` by :func:`export`.
+    """
+    global _registry
+    _registry = Registry(textfile, json_file)
+    return _registry
+
+
+def disable():
+    global _registry
+    _registry = None
+
+
+def registry():
+    return _registry
+
+
+def timer(name, **labels):
+    """
+    Return a context manager recording its duration in the ``name`` histogram.
+    """
+    if _registry is None:
+        return _NOOP_TIMER
+    return _Timer(_registry, name, labels)
+
+
+def count(name, value=1, **labels):
+    if _registry is not None:
+        _registry.count(name, value, labels)
+
+
+def export():
+    if _registry is not None:
+        try:
+            _registry.export()
+        except (IOError, OSError) as e:
+            log.warning("Error exporting metrics: %s", e)
@@ -0,0 +1,114 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import json
+import logging
+import threading
+from collections import deque
+from acmedns import metrics
+
+log = logging.getLogger(__name__)
+
+# directory documents by ACME url, fetched once per process
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+def is_bad_nonce(code, result):
+    """
+    Return True if the response is an ACME badNonce error, the request can be sent again with a fresh nonce.
+    """
+    if code != 400:
+        return False
+    try:
+        problem = json.loads(result.decode('utf8'))
+    except (ValueError, AttributeError):
+        return False
+    return isinstance(problem, dict) and str(problem.get('type', '')).endswith(':badNonce')
+
+
+class NoncePool(object):
+    '''
+    Thread safe pool of ACME replay nonces.
+
+    Nonces are collected from the ``Replay-Nonce`` header of every ACME response, the server is
+    only asked for a new one when the pool is empty.
+    '''
+
+    def __init__(self, acme_url, transport):
+        self.acme_url = acme_url
+        self.transport = transport
+        self.__nonces = deque()
+        self.__lock = threading.Lock()
+
+    def get(self):
+        nonce = self.pop()
+        if nonce is not None:
+            return nonce
+        log.debug("Nonce pool empty, fetching a new nonce")
+        with metrics.timer('nonce_fetch'):
+            directory = self.directory()
+            if 'newNonce' in directory:
+                # ACME v2 has a dedicated endpoint
+                response = self.transport.request("HEAD", directory['newNonce'])
+            else:
+                response = self.transport.get(self.acme_url + "/directory")
+        nonce = response.header('Replay-Nonce')
+        if nonce is None:
+            raise IOError("No nonce returned by {0}: {1}".format(self.acme_url, response.code))
+        return nonce
+
+    def pop(self):
+        """
+        Return a pooled nonce, or None when the pool is empty.
+        """
+        with self.__lock:
+            if self.__nonces:
+                return self.__nonces.popleft()
+        return None
+
+    def add(self, nonce):
+        if nonce:
+            with self.__lock:
+                self.__nonces.append(nonce)
+
+    def add_from(self, response):
+        self.add(response.header('Replay-Nonce'))
+
+    def directory(self):
+        with _directories_lock:
+            directory = _directories.get(self.acme_url)
+        if directory is None:
+            directory = self.__fetch_directory()
+        return directory
+
+    def __fetch_directory(self):
+        response = self.transport.get(self.acme_url + "/directory")
+        if response.code != 200:
+            raise IOError("Error loading directory: {0} {1}".format(response.code, response.body))
+        directory = json.loads(response.body.decode('utf8'))
+        with _directories_lock:
+            _directories.setdefault(self.acme_url, directory)
+        self.add_from(response)
+        return directory
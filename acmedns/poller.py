@@ -0,0 +1,112 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import email.utils
+import heapq
+import json
+import logging
+import time
+from acmedns import metrics
+
+log = logging.getLogger(__name__)
+
+PENDING_STATUS = ("pending", "processing")
+
+
+def retry_after(response):
+    """
+    Return the delay in seconds asked by the ``Retry-After`` header of ``response``, or None.
+    """
+    value = response.header('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0, int(value))
+    except ValueError:
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - time.time())
+
+
+class StatusPoller(object):
+    '''
+    Poll the status of many ACME challenges or authorizations at once.
+
+    Each resource is polled on its own schedule, following the server ``Retry-After`` header or else
+    an exponential backoff from ``initial_delay`` up to ``max_delay`` seconds.
+    '''
+
+    def __init__(self, transport, nonces=None, initial_delay=1, max_delay=30, timeout=600):
+        self.transport = transport
+        self.nonces = nonces
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+
+    def poll(self, resources):
+        """
+        Yield ``(resource, status)`` for each resource, given as a dict with an ``uri``, as soon as it
+        is no longer pending.
+        """
+        deadline = time.time() + self.timeout
+        queue = [(time.time(), index, 0, resource) for index, resource in enumerate(resources)]
+        heapq.heapify(queue)
+        while queue:
+            due, index, attempt, resource = heapq.heappop(queue)
+            now = time.time()
+            if due > deadline:
+                raise ValueError("Timeout waiting for {0}".format(resource['uri']))
+            if due > now:
+                time.sleep(due - now)
+
+            metrics.count('status_polls')
+            response = self.transport.get(resource['uri'])
+            if self.nonces is not None:
+                self.nonces.add_from(response)
+            status = self.status(response)
+            if status['status'] in PENDING_STATUS:
+                heapq.heappush(queue, (time.time() + self.delay(response, attempt), index, attempt + 1, resource))
+            else:
+                yield resource, status
+
+    @staticmethod
+    def status(response):
+        """
+        Return the status document of a polled resource ``response``.
+        """
+        if response.code >= 400:
+            raise ValueError("Error checking status: {0} {1}".format(response.code, response.body))
+        status = json.loads(response.body.decode('utf8'))
+        log.debug(status)
+        return status
+
+    def delay(self, response, attempt):
+        """
+        Return the seconds to wait before polling again a resource still pending after ``attempt`` polls.
+        """
+        delay = retry_after(response)
+        if delay is None:
+            delay = min(self.max_delay, self.initial_delay * 2 ** attempt)
+        return delay
@@ -0,0 +1,169 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import random
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+from acmedns import metrics
+from acmedns.lazy import LazyModule
+
+dns = LazyModule('dns', 'dns.exception', 'dns.flags', 'dns.message', 'dns.query', 'dns.resolver')
+log = logging.getLogger(__name__)
+
+
+def resolve_txt(name):
+    """
+    Return the TXT values of ``name`` given by the system resolver, when no authoritative nameserver is known.
+    """
+    return [b"".join(rdata.strings) for rdata in dns.resolver.query(name, 'TXT')]
+
+
+def txt_values(response):
+    """
+    Return the TXT values of the DNS ``response`` answer.
+    """
+    return [b"".join(rdata.strings) for rrset in response.answer for rdata in rrset if hasattr(rdata, 'strings')]
+
+
+class PropagationChecker(object):
+    '''
+    Check that challenge TXT records are served by every authoritative nameserver of their zone.
+
+    Nameservers are looked up once per zone and queried directly in parallel, a record is deployed
+    only when all of them answer the expected token. Checks are retried with exponential backoff
+    and jitter until ``timeout`` seconds are elapsed.
+    '''
+
+    def __init__(self, timeout=2400, query_timeout=5, initial_delay=2, max_delay=60, workers=8,
+                 nameservers_ttl=3600):
+        self.timeout = timeout
+        self.query_timeout = query_timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.workers = workers
+        self.nameservers_ttl = nameservers_ttl
+        self.__nameservers = {}
+        self.__lock = threading.Lock()
+        self.__pool = None
+
+    def nameservers(self, zone):
+        with self.__lock:
+            cached = self.__nameservers.get(zone)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        addresses = []
+        try:
+            for ns in dns.resolver.query(zone, 'NS'):
+                for address in dns.resolver.query(ns.target, 'A'):
+                    addresses.append(address.address)
+        except dns.exception.DNSException as e:
+            log.warning("Nameservers of %s not found: %s", zone, e)
+        log.debug("Nameservers of %s: %s", zone, addresses)
+        with self.__lock:
+            self.__nameservers[zone] = (time.time() + self.nameservers_ttl, addresses)
+        return addresses
+
+    def wait(self, records):
+        """
+        Wait for ``(zone, name, token)`` records to be deployed and return the names still not deployed.
+        """
+        start = time.time()
+        attempt = 0
+        pending = self.__check(records)
+        while pending and time.time() - start < self.timeout:
+            time.sleep(self.delay(attempt))
+            attempt += 1
+            pending = self.__check(pending)
+        return [name for zone, name, token in pending]
+
+    def delay(self, attempt):
+        """
+        Return the seconds to wait before checking again after ``attempt`` checks, with jitter.
+        """
+        delay = min(self.max_delay, self.initial_delay * 2 ** attempt)
+        return random.uniform(delay / 2.0, delay)
+
+    def queries(self, records):
+        """
+        Return the ``(record, nameserver)`` queries checking ``records``, the nameserver is None when the
+        system resolver is asked.
+        """
+        queries = []
+        for record in records:
+            zone, name, token = record
+            for nameserver in self.nameservers(zone) or [None]:
+                queries.append((record, nameserver))
+        metrics.count('propagation_checks')
+        metrics.count('dns_queries', len(queries))
+        return queries
+
+    @staticmethod
+    def pending(records, results):
+        """
+        Return the ``records`` not found on every nameserver, ``results`` are ``(record, found)`` by query.
+        """
+        deployed = {}
+        for record, found in results:
+            deployed[record] = deployed.get(record, True) and found
+        pending = [record for record in records if not deployed[record]]
+        log.debug("TXT not deployed yet: %s", [name for zone, name, token in pending])
+        return pending
+
+    def __check(self, records):
+        return self.pending(records, self.__get_pool().map(self.__query, self.queries(records)))
+
+    def __query(self, query):
+        record, nameserver = query
+        zone, name, token = record
+        try:
+            if nameserver is None:
+                values = resolve_txt(name)
+            else:
+                request = dns.message.make_query(name, 'TXT')
+                response = dns.query.udp(request, nameserver, timeout=self.query_timeout)
+                if response.flags & dns.flags.TC:
+                    response = dns.query.tcp(request, nameserver, timeout=self.query_timeout)
+                values = txt_values(response)
+        except dns.exception.DNSException as e:
+            log.debug("TXT %s not found on %s: %s", name, nameserver, e)
+            return record, False
+        return record, token.encode('ascii') in values
+
+    def close(self):
+        """
+        Stop the query threads, a later check starts new ones.
+        """
+        with self.__lock:
+            pool, self.__pool = self.__pool, None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    def __get_pool(self):
+        with self.__lock:
+            if self.__pool is None:
+                self.__pool = ThreadPool(self.workers)
+            return self.__pool
@@ -0,0 +1,262 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import re
+import threading
+import time
+from acmedns.client import RateLimitError, ValidationError
+from acmedns.x509 import CertificateRequest
+from acmedns.zones import registered_domain
+
+log = logging.getLogger(__name__)
+
+CERTIFICATES = 'certificates'
+DUPLICATES = 'duplicates'
+FAILED_VALIDATIONS = 'failed_validations'
+ACCOUNT = 'account'
+
+#: Let's Encrypt limits as (capacity, period in seconds) by limit class
+LIMITS = {
+    CERTIFICATES: (50, 7 * 86400),              # certificates per registered domain
+    DUPLICATES: (5, 7 * 86400),                 # certificates per exact set of names
+    FAILED_VALIDATIONS: (5, 3600),              # failed validations per hostname
+    ACCOUNT: (300, 3 * 3600),                   # new orders per account
+}
+
+#: Limits whose tokens are reserved when a CSR is planned
+RESERVED_LIMITS = (ACCOUNT, CERTIFICATES, DUPLICATES)
+
+#: Authorizations pending at once per account, not a rate: they are freed as soon as an order completes
+MAX_PENDING_AUTHORIZATIONS = 300
+
+#: Delay (seconds) when a rateLimited problem does not tell when to retry
+DEFAULT_RETRY_AFTER = 3600
+
+PROBLEM_LIMITS = [
+    (re.compile(r"exact set of domains", re.I), DUPLICATES),
+    (re.compile(r"certificates already issued for", re.I), CERTIFICATES),
+    (re.compile(r"failed (authorizations|validations)", re.I), FAILED_VALIDATIONS),
+    (re.compile(r"pending authorizations", re.I), ACCOUNT),
+    (re.compile(r"new orders", re.I), ACCOUNT),
+]
+
+
+class RateLimiter(object):
+    '''
+    Token buckets by limit class and key for one account, persisted in ``store``.
+    '''
+
+    def __init__(self, store, account, limits=LIMITS):
+        self.store = store
+        self.account = account
+        self.limits = limits
+        self.__lock = threading.Lock()
+
+    def __key(self, limit, key):
+        return "{0}:{1}:{2}".format(self.account, limit, key)
+
+    def __bucket(self, limit, key, now):
+        capacity, period = self.limits[limit]
+        bucket = self.store.get(self.__key(limit, key)) or {'tokens': capacity, 'updated': now, 'blocked': 0}
+        bucket['tokens'] = min(capacity, bucket['tokens'] + (now - bucket['updated']) * capacity / float(period))
+        bucket['updated'] = now
+        return bucket, capacity / float(period)
+
+    def wait_time(self, limit, key, tokens=1):
+        """
+        Return the delay in seconds before ``tokens`` of ``limit`` are available for ``key``.
+        """
+        with self.__lock:
+            now = time.time()
+            bucket, rate = self.__bucket(limit, key, now)
+            wait = max(0, bucket['blocked'] - now)
+            # never wait for more than a full bucket
+            tokens = min(tokens, self.limits[limit][0])
+            if bucket['tokens'] < tokens:
+                wait = max(wait, (tokens - bucket['tokens']) / rate)
+            return wait
+
+    def blocked_time(self, limit, key):
+        """
+        Return the delay in seconds before ``limit`` is no longer blocked for ``key`` by the server.
+        """
+        bucket = self.store.get(self.__key(limit, key))
+        return max(0, bucket['blocked'] - time.time()) if bucket else 0
+
+    def acquire(self, limit, key, tokens=1):
+        with self.__lock:
+            bucket, rate = self.__bucket(limit, key, time.time())
+            bucket['tokens'] -= tokens
+            self.store.set(self.__key(limit, key), bucket)
+
+    def release(self, limit, key, tokens=1):
+        self.acquire(limit, key, -tokens)
+
+    def block(self, limit, key, seconds):
+        log.warning("Rate limit %s reached for %s, blocked for %ds", limit, key, seconds)
+        with self.__lock:
+            now = time.time()
+            bucket, rate = self.__bucket(limit, key, now)
+            # the server knows best, allow one more request once the block is over
+            bucket['tokens'] = min(bucket['tokens'], 1)
+            bucket['blocked'] = now + seconds
+            self.store.set(self.__key(limit, key), bucket)
+
+
+class IssuanceScheduler(object):
+    '''
+    Order CSRs by urgency and defer those that would exceed a rate limit.
+
+    Tokens are reserved when a CSR is planned and given back when no certificate was issued, failed
+    validations and ``rateLimited`` problems returned by the server update the buckets. A CSR planned
+    before a ``rateLimited`` problem blocked one of its limits is deferred by :meth:`blocked`.
+
+    At most ``max_pending`` authorizations are pending at once: a CSR acquires one per name with
+    :meth:`acquire` before it is sent, they are released when it is recorded.
+    '''
+
+    def __init__(self, limiter, inventory=None, max_pending=MAX_PENDING_AUTHORIZATIONS):
+        self.limiter = limiter
+        self.inventory = inventory
+        self.max_pending = max_pending
+        self.__reserved = {}
+        self.__pending = 0
+        self.__acquired = {}
+        self.__condition = threading.Condition()
+
+    def __names(self, csr_file):
+        entry = self.inventory.get(csr_file) if self.inventory is not None else None
+        if entry is not None and entry['names']:
+            return entry['names']
+        return CertificateRequest.from_file(csr_file).names
+
+    def __urgency(self, csr_file):
+        entry = self.inventory.get(csr_file) if self.inventory is not None else None
+        if entry is None or entry['not_after'] is None:
+            return 0
+        return entry['not_after']
+
+    def __buckets(self, names):
+        # (limit, key, tokens) of a certificate for names
+        buckets = [(ACCOUNT, ACCOUNT, 1), (DUPLICATES, ",".join(sorted(names)), 1)]
+        for domain in sorted(set(registered_domain(name) for name in names)):
+            buckets.append((CERTIFICATES, domain, 1))
+        for name in names:
+            buckets.append((FAILED_VALIDATIONS, name, 1))
+        return buckets
+
+    def plan(self, csr_files):
+        """
+        Return ``(ready, deferred)``: CSRs to sign now, most urgent first, and a dict of deferred CSRs
+        with the delay in seconds before they can be signed.
+        """
+        ready = []
+        deferred = {}
+        for csr_file in sorted(csr_files, key=self.__urgency):
+            try:
+                names = self.__names(csr_file)
+            except (IOError, ValueError, IndexError):
+                # let the client report the broken CSR
+                ready.append(csr_file)
+                continue
+            buckets = self.__buckets(names)
+            wait = max(self.limiter.wait_time(limit, key, tokens) for limit, key, tokens in buckets)
+            if wait > 0:
+                log.info("Deferring %s for %ds to respect rate limits", csr_file, wait)
+                deferred[csr_file] = wait
+                continue
+            reserved = [bucket for bucket in buckets if bucket[0] in RESERVED_LIMITS]
+            for limit, key, tokens in reserved:
+                self.limiter.acquire(limit, key, tokens)
+            self.__reserved[csr_file] = (names, reserved)
+            ready.append(csr_file)
+        return ready, deferred
+
+    def acquire(self, csr_file, blocking=True):
+        """
+        Acquire the pending authorizations of the planned ``csr_file``, waiting for other CSRs to be
+        recorded when there are not enough. Return False without ``blocking`` when they are not available.
+        """
+        names, reserved = self.__reserved.get(csr_file, ([], []))
+        # a CSR with more names than the maximum is sent alone
+        tokens = min(len(names), self.max_pending)
+        with self.__condition:
+            while self.__pending + tokens > self.max_pending:
+                if not blocking:
+                    return False
+                self.__condition.wait()
+            self.__pending += tokens
+            self.__acquired[csr_file] = tokens
+        return True
+
+    def __release_pending(self, csr_file):
+        with self.__condition:
+            self.__pending -= self.__acquired.pop(csr_file, 0)
+            self.__condition.notify_all()
+
+    def blocked(self, csr_file):
+        """
+        Return the delay in seconds before the planned ``csr_file`` can be signed, when a ``rateLimited``
+        problem blocked one of its limits since it was planned, 0 otherwise.
+        """
+        names, reserved = self.__reserved.get(csr_file, ([], []))
+        if not names:
+            return 0
+        return max(self.limiter.blocked_time(limit, key) for limit, key, tokens in self.__buckets(names))
+
+    def cancel(self, csr_file):
+        """
+        Give back the tokens reserved for the planned ``csr_file``, it was not sent to the server.
+        """
+        self.__release_pending(csr_file)
+        names, reserved = self.__reserved.pop(csr_file, ([], []))
+        for limit, key, tokens in reserved:
+            self.limiter.release(limit, key, tokens)
+
+    def record(self, csr_file, issued, error=None):
+        """
+        Update the buckets with the outcome of signing ``csr_file``.
+        """
+        # authorizations are no longer pending once signed or failed
+        self.__release_pending(csr_file)
+        names, reserved = self.__reserved.pop(csr_file, ([], []))
+        for limit, key, tokens in reserved:
+            # the order was created anyway
+            if not issued and limit != ACCOUNT:
+                self.limiter.release(limit, key, tokens)
+        if issued:
+            return
+        if isinstance(error, ValidationError):
+            self.limiter.acquire(FAILED_VALIDATIONS, error.domain)
+        elif isinstance(error, RateLimitError):
+            seconds = error.retry_after or DEFAULT_RETRY_AFTER
+            limit = ACCOUNT
+            for pattern, problem_limit in PROBLEM_LIMITS:
+                if pattern.search(error.detail or ''):
+                    limit = problem_limit
+                    break
+            for bucket_limit, key, tokens in self.__buckets(names):
+                if bucket_limit == limit:
+                    self.limiter.block(limit, key, seconds)
@@ -0,0 +1,132 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import abc
+import logging
+import subprocess
+import threading
+from acmedns import asn1, metrics
+
+log = logging.getLogger(__name__)
+
+RSA_ENCRYPTION = "1.2.840.113549.1.1.1"
+
+
+def load_rsa_public_numbers(key_data):
+    """
+    Return the ``(modulus, exponent)`` of a PEM or DER RSA private key (PKCS#1 or PKCS#8).
+    """
+    label, der = asn1.pem_to_der(key_data)
+    key = asn1.decode(der)[0].children()
+    if label == "PRIVATE KEY" or (len(key) == 3 and key[1].tag == asn1.SEQUENCE):
+        # PKCS#8 PrivateKeyInfo wrapping a PKCS#1 RSAPrivateKey
+        if key[1].children()[0].oid() != RSA_ENCRYPTION:
+            raise ValueError("Account key is not a RSA key")
+        key = asn1.decode(key[2].content)[0].children()
+    return key[1].integer(), key[2].integer()
+
+
+class Signer(object):
+    '''
+    Sign JWS payloads with the account key, RS256 only.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, key_file):
+        self.key_file = key_file
+        with open(key_file, 'rb') as key:
+            key_data = key.read()
+        self.modulus, self.exponent = load_rsa_public_numbers(key_data)
+        self.setup(key_data)
+
+    def setup(self, key_data):
+        pass
+
+    @abc.abstractmethod
+    def sign(self, data):
+        raise NotImplementedError('users must define sign to use this base class')
+
+
+class CryptographySigner(Signer):
+    '''
+    Sign in process with the key loaded once in memory.
+    '''
+
+    def setup(self, key_data):
+        from cryptography.hazmat.backends import default_backend
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding
+        self.key = serialization.load_pem_private_key(key_data, password=None, backend=default_backend())
+        self.padding = padding.PKCS1v15()
+        self.hash = hashes.SHA256()
+
+    def sign(self, data):
+        with metrics.timer('signature', signer='cryptography'):
+            return self.key.sign(data, self.padding, self.hash)
+
+
+class OpenSSLSigner(Signer):
+    '''
+    Sign with an openssl process per payload, used when cryptography is not installed.
+    '''
+
+    def sign(self, data):
+        with metrics.timer('signature', signer='openssl'):
+            proc = subprocess.Popen(["openssl", "dgst", "-sha256", "-sign", self.key_file],
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            out, err = proc.communicate(data)
+        if proc.returncode != 0:
+            raise IOError("OpenSSL Error: {0}".format(err))
+        return out
+
+
+class LazySigner(object):
+    '''
+    Signer of ``key_file`` loaded on first use, the key is not parsed while nothing is signed.
+    '''
+
+    def __init__(self, key_file):
+        self.key_file = key_file
+        self.__signer = None
+        self.__lock = threading.Lock()
+
+    def load(self):
+        with self.__lock:
+            if self.__signer is None:
+                self.__signer = load_signer(self.key_file)
+        return self.__signer
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+def load_signer(key_file):
+    try:
+        # imported here, cryptography takes a while to load
+        import cryptography.hazmat.backends
+    except ImportError:  # pragma: no cover
+        # cryptography not installed, fallback to openssl command
+        log.debug("cryptography not available, signing with openssl")
+        return OpenSSLSigner(key_file)
+    return CryptographySigner(key_file)
@@ -0,0 +1,104 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import tempfile
+import threading
+
+log = logging.getLogger(__name__)
+
+
+def write_file(path, content, mode=None):
+    """
+    Write ``content`` to a temporary file renamed to ``path``, readers never see a partial file.
+
+    The file gets ``mode``, by default the mode of the file it replaces or 0644.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    if mode is None:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except OSError:
+            mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(content, bytes) else 'w') as output:
+            output.write(content)
+            output.flush()
+            os.fsync(output.fileno())
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+class JsonStore(object):
+    '''
+    Thread safe dict persisted in a JSON file, saved on every change.
+
+    When ``path`` is None the store lives in memory only.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.__lock = threading.RLock()
+        self.__data = self.__load()
+
+    def get(self, key, default=None):
+        with self.__lock:
+            return self.__data.get(key, default)
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__data[key] = value
+            self.__save()
+
+    def delete(self, key):
+        with self.__lock:
+            if self.__data.pop(key, None) is not None:
+                self.__save()
+
+    def items(self):
+        with self.__lock:
+            return list(self.__data.items())
+
+    def __load(self):
+        if self.path is None or not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path) as store_file:
+                return json.load(store_file)
+        except (IOError, ValueError) as e:
+            log.warning("Ignoring corrupted store %s: %s", self.path, e)
+            return {}
+
+    def __save(self):
+        if self.path is None:
+            return
+        write_file(self.path, json.dumps(self.__data), 0o600)
@@ -0,0 +1,147 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import socket
+import threading
+import time
+from acmedns import metrics
+try:
+    import http.client as httplib  # Python 3
+    from urllib.parse import urlsplit
+except ImportError:
+    import httplib  # Python 2
+    from urlparse import urlsplit
+
+log = logging.getLogger(__name__)
+
+#: Methods sent again on failure, a signed POST is signed again with a fresh nonce by the client instead
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+#: Errors of a request that may succeed when sent again
+TRANSIENT_ERRORS = (socket.error, httplib.HTTPException)
+
+
+class Response(object):
+
+    def __init__(self, code, headers, body):
+        self.code = code
+        self.headers = {}
+        for name, value in headers:
+            # join repeated headers like Link into one value
+            name = name.lower()
+            self.headers[name] = self.headers[name] + ", " + value if name in self.headers else value
+        self.body = body
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+
+class HttpTransport(object):
+    '''
+    HTTP transport keeping connections alive per host.
+
+    GET and HEAD requests failing with a connection error or a 5xx status are sent again up to
+    ``retries`` times, waiting ``backoff`` seconds doubled on each attempt. Other requests are sent
+    once: the JWS of a POST carries a nonce the server may already have used.
+    '''
+
+    def __init__(self, timeout=30, retries=3, backoff=0.5, pool_size=8):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.__pools = {}
+        self.__lock = threading.Lock()
+
+    def get(self, url, headers=None):
+        return self.request("GET", url, headers=headers)
+
+    def post(self, url, body, headers=None):
+        return self.request("POST", url, body, headers)
+
+    def request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        with metrics.timer('http_request', method=method):
+            response = self.__request(method, url, parts.scheme, parts.netloc, path, body, headers)
+        metrics.count('http_requests', method=method, code=response.code)
+        metrics.count('http_bytes', len(body or b''), direction='sent')
+        metrics.count('http_bytes', len(response.body), direction='received')
+        return response
+
+    def __request(self, method, url, scheme, netloc, path, body, headers):
+        retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            conn, reused = self.__acquire(scheme, netloc)
+            try:
+                conn.request(method, path, body, headers or {})
+                resp = conn.getresponse()
+                response = Response(resp.status, resp.getheaders(), resp.read())
+            except TRANSIENT_ERRORS as e:
+                conn.close()
+                if reused and retries:
+                    # the server closed an idle connection, try again at once on a new one
+                    continue
+                if attempt >= retries:
+                    raise
+                log.debug("%s %s failed: %s, retrying", method, url, e)
+            else:
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self.__release(scheme, netloc, conn)
+                if response.code < 500 or attempt >= retries:
+                    return response
+                log.debug("%s %s returned %s, retrying", method, url, response.code)
+            metrics.count('http_retries', method=method)
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def close(self):
+        with self.__lock:
+            pools, self.__pools = self.__pools, {}
+        for connections in pools.values():
+            for conn in connections:
+                conn.close()
+
+    def __acquire(self, scheme, netloc):
+        with self.__lock:
+            connections = self.__pools.get((scheme, netloc))
+            if connections:
+                return connections.pop(), True
+        if scheme == "https":
+            return httplib.HTTPSConnection(netloc, timeout=self.timeout), False
+        return httplib.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def __release(self, scheme, netloc, conn):
+        with self.__lock:
+            connections = self.__pools.setdefault((scheme, netloc), [])
+            if len(connections) < self.pool_size:
+                connections.append(conn)
+                return
+        conn.close()
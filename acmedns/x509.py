@@ -0,0 +1,131 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+In process parsing of PEM or DER certificate signing requests and certificates.
+"""
+
+from __future__ import absolute_import
+
+import datetime
+from acmedns import asn1
+
+COMMON_NAME = "2.5.4.3"
+EXTENSION_REQUEST = "1.2.840.113549.1.9.14"
+SUBJECT_ALT_NAME = "2.5.29.17"
+
+CONTEXT_0 = 0xa0
+CONTEXT_3 = 0xa3
+DNS_NAME = 0x82
+
+
+def _read_file(filename):
+    with open(filename, 'rb') as data_file:
+        return data_file.read()
+
+
+def _common_name(name):
+    for rdn in name.children():
+        for attribute in rdn.children():
+            oid, value = attribute.children()[:2]
+            if oid.oid() == COMMON_NAME:
+                return value.string()
+    return None
+
+
+def _alt_names(extensions):
+    names = []
+    for extension in extensions.children():
+        fields = extension.children()
+        if fields[0].oid() == SUBJECT_ALT_NAME:
+            general_names = asn1.decode(fields[-1].content)[0]
+            names.extend(name.content.decode('ascii') for name in general_names.children() if name.tag == DNS_NAME)
+    return names
+
+
+def _names(common_name, alt_names):
+    names = []
+    for name in [common_name] + alt_names:
+        if name is not None and name not in names:
+            names.append(name)
+    return names
+
+
+def _time(element):
+    value = element.content.decode('ascii').rstrip('Z')
+    if element.tag == asn1.UTC_TIME:
+        year = int(value[:2])
+        value = ("19" if year >= 50 else "20") + value
+    return datetime.datetime.strptime(value[:14], "%Y%m%d%H%M%S")
+
+
+class CertificateRequest(object):
+    '''
+    Certificate signing request with its DER bytes and requested domain names, common name first.
+    '''
+
+    def __init__(self, data):
+        label, self.der = asn1.pem_to_der(data)
+        info = asn1.decode(self.der)[0].children()[0].children()
+        self.common_name = _common_name(info[1])
+        alt_names = []
+        for attributes in info[3:]:
+            if attributes.tag != CONTEXT_0:
+                continue
+            for attribute in attributes.children():
+                oid, values = attribute.children()
+                if oid.oid() == EXTENSION_REQUEST:
+                    for extensions in values.children():
+                        alt_names.extend(_alt_names(extensions))
+        self.names = _names(self.common_name, alt_names)
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(_read_file(filename))
+
+
+class Certificate(object):
+    '''
+    Certificate with its DER bytes, domain names and expiry date (``not_after``, naive UTC).
+    '''
+
+    def __init__(self, data):
+        label, self.der = asn1.pem_to_der(data, 'CERTIFICATE')
+        tbs = asn1.decode(self.der)[0].children()[0].children()
+        if tbs[0].tag == CONTEXT_0:
+            tbs = tbs[1:]
+        validity = tbs[3].children()
+        self.not_before = _time(validity[0])
+        self.not_after = _time(validity[1])
+        self.common_name = _common_name(tbs[4])
+        alt_names = []
+        for element in tbs[6:]:
+            if element.tag == CONTEXT_3:
+                alt_names.extend(_alt_names(element.children()[0]))
+        self.names = _names(self.common_name, alt_names)
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(_read_file(filename))
+
+    def expires_within(self, seconds):
+        return self.not_after <= datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)
@@ -0,0 +1,209 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from __future__ import absolute_import
+
+import logging
+import os
+import threading
+import time
+from acmedns.lazy import LazyModule
+
+dns = LazyModule('dns', 'dns.exception', 'dns.rdatatype', 'dns.resolver')
+log = logging.getLogger(__name__)
+
+#: Public suffix list files shipped by distributions, the first one found is used
+PUBLIC_SUFFIX_LIST_PATHS = [
+    '/usr/share/publicsuffix/public_suffix_list.dat',
+    '/etc/ssl/public_suffix_list.dat',
+]
+
+#: Common multi-label suffixes used when no public suffix list file is installed
+DEFAULT_PUBLIC_SUFFIXES = """
+co.uk org.uk me.uk ltd.uk plc.uk net.uk ac.uk gov.uk
+com.au net.au org.au edu.au gov.au asn.au id.au
+co.nz net.nz org.nz co.jp ne.jp or.jp ac.jp go.jp
+com.br net.br org.br com.cn net.cn org.cn com.mx com.ar com.tr com.tw com.hk com.sg
+co.za co.in net.in org.in co.il co.kr or.kr
+"""
+
+_public_suffixes = None
+_public_suffixes_lock = threading.Lock()
+
+
+class PublicSuffixList(object):
+    '''
+    Public suffix rules in the format of https://publicsuffix.org/list/, including wildcard and
+    exception rules. Names without matching rule have their last label as public suffix.
+    '''
+
+    def __init__(self, rules):
+        self.rules = set()
+        self.exceptions = set()
+        for line in rules:
+            rule = line.strip().split(None, 1)[0].lower() if line.strip() else ''
+            if not rule or rule.startswith('//'):
+                continue
+            if rule.startswith('!'):
+                self.exceptions.add(rule[1:])
+            else:
+                self.rules.add(rule)
+
+    @classmethod
+    def from_file(cls, filename):
+        with open(filename, 'rb') as psl_file:
+            return cls(psl_file.read().decode('utf8').splitlines())
+
+    def public_suffix(self, name):
+        labels = name.lower().strip('.').split('.')
+        # the longest matching rule wins, exception rules first
+        for index in range(len(labels)):
+            candidate = '.'.join(labels[index:])
+            if candidate in self.exceptions:
+                return '.'.join(labels[index + 1:])
+            if candidate in self.rules or '*.' + '.'.join(labels[index + 1:]) in self.rules:
+                return candidate
+        return labels[-1]
+
+    def registered_domain(self, name):
+        """
+        Return the public suffix of ``name`` with one more label, or None when ``name`` is a public suffix.
+        """
+        name = name.lower().strip('.')
+        suffix = self.public_suffix(name)
+        if name == suffix:
+            return None
+        return '.'.join(name[:-len(suffix) - 1].split('.')[-1:] + [suffix])
+
+
+def public_suffixes():
+    """
+    Return the PublicSuffixList of the system, loaded once.
+    """
+    global _public_suffixes
+    with _public_suffixes_lock:
+        if _public_suffixes is None:
+            for path in PUBLIC_SUFFIX_LIST_PATHS:
+                if os.path.isfile(path):
+                    log.debug("Loading public suffix list %s", path)
+                    _public_suffixes = PublicSuffixList.from_file(path)
+                    break
+            else:
+                _public_suffixes = PublicSuffixList(DEFAULT_PUBLIC_SUFFIXES.split())
+        return _public_suffixes
+
+
+def registered_domain(name):
+    """
+    Return the domain registered under a public suffix of ``name``, ``name`` itself when it is a public suffix.
+    """
+    return public_suffixes().registered_domain(name) or name.lower().strip('.')
+
+
+class ZoneResolver(object):
+    '''
+    Find the DNS zone hosting a name.
+
+    Zones listed by the adapter are used first, otherwise the zone is found from the SOA record
+    served for the name. Results are cached ``ttl`` seconds and shared by every lookup of the
+    resolver. When DNS gives no answer, the registered domain of the name is assumed.
+    '''
+
+    def __init__(self, adapter=None, ttl=3600):
+        self.adapter = adapter
+        self.ttl = ttl
+        self.__zones = {}
+        self.__adapter_zones = None
+        self.__lock = threading.Lock()
+
+    def zone(self, name):
+        name = name.lower().strip('.')
+        with self.__lock:
+            cached = self.__zones.get(name)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+
+        zone = self.__adapter_zone(name)
+        if zone is None:
+            zone = self.__soa_zone(name)
+        if zone is None:
+            zone = registered_domain(name)
+            log.warning("Zone of %s not found, assuming %s", name, zone)
+        log.debug("Zone of %s: %s", name, zone)
+        with self.__lock:
+            self.__zones[name] = (time.time() + self.ttl, zone)
+        return zone
+
+    def split(self, domain):
+        """
+        Return the zone and the subdomain in this zone of the ``_acme-challenge`` record of ``domain``.
+        """
+        zone = self.zone(domain)
+        domain = domain.lower().strip('.')
+        if domain == zone:
+            return zone, "_acme-challenge"
+        return zone, "_acme-challenge." + domain[:-len(zone) - 1]
+
+    def __adapter_zone(self, name):
+        zones = self.__list_adapter_zones()
+        matches = [zone for zone in zones or [] if name == zone or name.endswith('.' + zone)]
+        if not matches:
+            return None
+        return max(matches, key=len)
+
+    def __list_adapter_zones(self):
+        if self.adapter is None:
+            return None
+        with self.__lock:
+            cached = self.__adapter_zones
+            if cached is not None and cached[0] > time.time():
+                return cached[1]
+            try:
+                zones = self.adapter.list_zones()
+            except Exception as e:
+                log.warning("Error listing zones of %s: %s", type(self.adapter).__name__, e)
+                zones = None
+            if zones is not None:
+                zones = [zone.lower().strip('.') for zone in zones]
+            self.__adapter_zones = (time.time() + self.ttl, zones)
+            return zones
+
+    def __soa_zone(self, name):
+        # the SOA of the zone is in the answer for its apex, in the authority section below it
+        while '.' in name:
+            try:
+                answer = dns.resolver.query(name, 'SOA', raise_on_no_answer=False)
+            except dns.resolver.NXDOMAIN:
+                name = name.split('.', 1)[1]
+                continue
+            except dns.exception.DNSException as e:
+                log.debug("SOA of %s not found: %s", name, e)
+                return None
+            zones = [answer.rrset.name] if answer.rrset is not None else \
+                [rrset.name for rrset in answer.response.authority if rrset.rdtype == dns.rdatatype.SOA]
+            for zone in zones:
+                zone = zone.to_text(omit_final_dot=True).lower()
+                # a CNAME is followed to the SOA of its target zone, which does not host the name
+                if name == zone or name.endswith('.' + zone):
+                    return zone
+            name = name.split('.', 1)[1]
+        return None
@@ -0,0 +1,148 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+End to end throughput benchmark of the client against the in process fake ACME server and DNS.
+
+Run with ``make bench``, or ``PYTHONPATH=. python tests/bench.py --help`` for the options. The run exits
+with an error when a CSR is not signed or when a figure is worse than the baseline given in the options.
+"""
+
+from __future__ import print_function
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from acmedns.client import ClientConfig
+from acmedns.domain import DomainManager, SignResult
+from fakes import FIXTURES, FakeAcmeServer, FakeDns, MemoryAdapter, make_csrs
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))]
+
+
+def regressions(result, args):
+    """
+    Return the errors of ``result`` against the baseline of ``args``.
+    """
+    errors = []
+    if result['signed'] != result['csr']:
+        errors.append("{0} of {1} CSR signed".format(result['signed'], result['csr']))
+    if args.min_certs_per_minute is not None and result['certs_per_minute'] < args.min_certs_per_minute:
+        errors.append("{0:.1f} certs/min, baseline {1:.1f}".format(result['certs_per_minute'],
+                                                                   args.min_certs_per_minute))
+    if args.max_requests_per_cert is not None and result['requests_per_cert'] > args.max_requests_per_cert:
+        errors.append("{0:.1f} requests/cert, baseline {1:.1f}".format(result['requests_per_cert'],
+                                                                      args.max_requests_per_cert))
+    if args.max_p99 is not None and result['p99'] > args.max_p99:
+        errors.append("p99 {0:.3f}s, baseline {1:.3f}s".format(result['p99'], args.max_p99))
+    return errors
+
+
+def run(csr_files, args):
+    """
+    Sign ``csr_files`` against a new fake server and return the benchmark figures.
+    """
+    adapter = MemoryAdapter(args.propagation_delay)
+    server = FakeAcmeServer(adapter, version=args.acme_version, latency=args.latency, error_rate=args.error_rate,
+                            bad_nonce_rate=args.bad_nonce_rate, validation_delay=args.validation_delay).start()
+    patchers = FakeDns(adapter).patch()
+
+    for patcher in patchers:
+        patcher.start()
+    try:
+        config = ClientConfig(server.url, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              acme_version=args.acme_version)
+        start = time.time()
+        results = DomainManager(config, adapter, csr_files, workers=args.workers).sign_all()
+        elapsed = time.time() - start
+    finally:
+        for patcher in patchers:
+            patcher.stop()
+        server.stop()
+
+    # time to cert of each CSR
+    durations = [result.duration for result in results if result.duration is not None]
+    signed = len([result for result in results if result.status == SignResult.SIGNED])
+    return {
+        'csr': len(csr_files),
+        'signed': signed,
+        'seconds': elapsed,
+        'certs_per_minute': signed * 60.0 / elapsed,
+        'requests_per_cert': server.requests / float(max(signed, 1)),
+        'p50': percentile(durations, 50),
+        'p99': percentile(durations, 99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark certificate issuance against a fake ACME server")
+    parser.add_argument("--sizes", default="1,100,1000", help="comma separated numbers of CSR to sign")
+    parser.add_argument("--workers", type=int, default=8, help="number of CSR signed concurrently")
+    parser.add_argument("--acme-version", type=int, default=1, choices=(1, 2), help="ACME protocol version")
+    parser.add_argument("--latency", type=float, default=0, help="delay of every ACME response in seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="rate of ACME 500 errors")
+    parser.add_argument("--bad-nonce-rate", type=float, default=0, help="rate of ACME badNonce errors")
+    parser.add_argument("--validation-delay", type=float, default=0, help="challenge validation delay in seconds")
+    parser.add_argument("--propagation-delay", type=float, default=0, help="DNS propagation delay in seconds")
+    parser.add_argument("--min-certs-per-minute", type=float, help="fail below this throughput")
+    parser.add_argument("--max-requests-per-cert", type=float, help="fail above this number of ACME requests")
+    parser.add_argument("--max-p99", type=float, help="fail above this 99th percentile time to cert in seconds")
+    parser.add_argument("--log", default='warning', help="log level")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, args.log.upper()))
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    directory = tempfile.mkdtemp()
+    failed = False
+    try:
+        print("{0:>6} {1:>6} {2:>9} {3:>12} {4:>13} {5:>9} {6:>9}".format(
+            "csr", "signed", "seconds", "certs/min", "requests/cert", "p50", "p99"))
+        all_csr_files = make_csrs(directory, max(sizes))
+        for size in sizes:
+            # fresh copies, without the certificates of the previous run
+            run_directory = os.path.join(directory, str(size))
+            os.mkdir(run_directory)
+            csr_files = []
+            for csr_file in all_csr_files[:size]:
+                shutil.copy(csr_file, run_directory)
+                csr_files.append(os.path.join(run_directory, os.path.basename(csr_file)))
+            result = run(csr_files, args)
+            print("{csr:>6} {signed:>6} {seconds:>9.2f} {certs_per_minute:>12.1f} {requests_per_cert:>13.1f}"
+                  " {p50:>9.3f} {p99:>9.3f}".format(**result))
+            for error in regressions(result, args):
+                print("  {0}".format(error), file=sys.stderr)
+                failed = True
+    finally:
+        shutil.rmtree(directory)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,486 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+In process stand-ins for an ACME server, a DNS provider and the DNS, to run the client end to end offline.
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+import dns.message
+import dns.rrset
+import dns.resolver
+from acmedns import asn1
+from acmedns.adapter.adapter import Adapter
+from acmedns.x509 import CertificateRequest
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2
+    from SocketServer import ThreadingMixIn
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+NAMESERVER = '192.0.2.53'
+
+
+def make_csrs(directory, count, domain='example.com'):
+    """
+    Write ``count`` CSR for ``host<N>.<domain>`` in ``directory`` and return their file names.
+    """
+    csr_files = []
+    for index in range(count):
+        csr_file = os.path.join(directory, 'host{0}.csr'.format(index))
+        subprocess.check_call(['openssl', 'req', '-new', '-key', os.path.join(FIXTURES, 'domain.key'),
+                               '-subj', '/CN=host{0}.{1}'.format(index, domain), '-out', csr_file])
+        csr_files.append(csr_file)
+    return csr_files
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(str(value) + '=' * (-len(value) % 4))
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode('utf8').replace('=', '')
+
+
+def _thumbprint(jwk):
+    return _b64(hashlib.sha256(json.dumps(jwk, sort_keys=True, separators=(',', ':')).encode('utf8')).digest())
+
+
+class MemoryAdapter(Adapter):
+    '''
+    DNS provider keeping TXT records in memory, a record is only served ``propagation_delay`` seconds
+    after its deployment.
+    '''
+
+    def __init__(self, propagation_delay=0):
+        self.propagation_delay = propagation_delay
+        self.records = {}
+        self.calls = {'deploy_challenge': 0, 'delete_challenge': 0}
+        self.__lock = threading.Lock()
+
+    def setup(self, params):
+        self.propagation_delay = float(params.get('propagation_delay', self.propagation_delay))
+
+    def deploy_challenge(self, basedomain, subdomain, token):
+        name = subdomain + "." + basedomain
+        with self.__lock:
+            self.calls['deploy_challenge'] += 1
+            self.records.setdefault(name, {})[token] = time.time() + self.propagation_delay
+        return basedomain, subdomain, token
+
+    def delete_challenge(self, record):
+        basedomain, subdomain, token = record
+        with self.__lock:
+            self.calls['delete_challenge'] += 1
+            self.records.get(subdomain + "." + basedomain, {}).pop(token, None)
+
+    def txt(self, name):
+        """
+        Return the TXT values of ``name`` already propagated.
+        """
+        now = time.time()
+        with self.__lock:
+            return [token for token, visible in self.records.get(name, {}).items() if visible <= now]
+
+
+class FakeDns(object):
+    '''
+    Stub of the dnspython functions used by the client, answering from a MemoryAdapter. Every zone
+    has a single nameserver, SOA queries follow the ``cnames`` given as a dict of name to target.
+    '''
+
+    def __init__(self, adapter, nameserver=NAMESERVER, zones=('example.com',), cnames=None):
+        self.adapter = adapter
+        self.nameserver = nameserver
+        self.zones = zones
+        self.cnames = cnames or {}
+
+    def query(self, name, rdtype, raise_on_no_answer=True):
+        name = str(name).rstrip('.')
+        if rdtype == 'SOA':
+            return self.soa(name)
+        if rdtype == 'NS':
+            return [_Rdata(target='ns.' + name)]
+        if rdtype == 'A':
+            return [_Rdata(address=self.nameserver)]
+        if rdtype == 'TXT':
+            values = self.adapter.txt(name)
+            if values:
+                return [_Rdata(strings=[value.encode('ascii')]) for value in values]
+        raise dns.resolver.NXDOMAIN()
+
+    def soa(self, name):
+        name = self.cnames.get(name, name)
+        for zone in sorted(self.zones, key=len, reverse=True):
+            if name == zone or name.endswith('.' + zone):
+                soa = dns.rrset.from_text(zone + '.', 3600, 'IN', 'SOA',
+                                          'ns.{0}. admin.{0}. 1 3600 600 86400 60'.format(zone))
+                if name == zone:
+                    return _Rdata(rrset=soa, response=_Rdata(authority=[]))
+                return _Rdata(rrset=None, response=_Rdata(authority=[soa]))
+        raise dns.resolver.NXDOMAIN()
+
+    def udp(self, request, nameserver, timeout=None, **kwargs):
+        response = dns.message.make_response(request)
+        name = request.question[0].name.to_text(omit_final_dot=True)
+        values = self.adapter.txt(name)
+        if values:
+            response.answer.append(dns.rrset.from_text(name + '.', 60, 'IN', 'TXT',
+                                                       *['"{0}"'.format(value) for value in values]))
+        return response
+
+    def patch(self):
+        """
+        Return mock patchers routing the client DNS queries to this stub.
+        """
+        import mock
+        return [mock.patch('dns.resolver.query', self.query), mock.patch('dns.query.udp', self.udp)]
+
+
+class DnsServerProtocol(object):
+    '''
+    asyncio datagram protocol answering DNS queries with a FakeDns.
+    '''
+
+    def __init__(self, dns):
+        self.dns = dns
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        response = self.dns.udp(dns.message.from_wire(data), None)
+        self.transport.sendto(response.to_wire(), addr)
+
+    def error_received(self, exc):
+        pass
+
+    def connection_lost(self, exc):
+        pass
+
+
+class _Rdata(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.server.acme.handle(self, 'HEAD')
+
+    def do_GET(self):
+        self.server.acme.handle(self, 'GET')
+
+    def do_POST(self):
+        self.server.acme.handle(self, 'POST')
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def process_request(self, request, client_address):
+        # keep-alive connections are closed on shutdown
+        self.connections.add(request)
+        ThreadingMixIn.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+        self.connections.discard(request)
+        HTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        for connection in list(self.connections):
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class FakeAcmeServer(object):
+    '''
+    Minimal ACME server speaking the legacy (``version=1``) or the RFC 8555 (``version=2``) protocol.
+
+    Signatures are not checked but nonces and dns-01 challenges are: challenges are validated against
+    the records of ``dns``, a MemoryAdapter. Every response is delayed by ``latency`` seconds, a
+    request fails with a 500 error at ``error_rate`` and with a badNonce error at ``bad_nonce_rate``.
+    Every certificate issued is the fixture certificate.
+    '''
+
+    def __init__(self, dns, version=1, latency=0, error_rate=0, bad_nonce_rate=0, validation_delay=0, seed=None):
+        self.dns = dns
+        self.version = version
+        self.latency = latency
+        self.error_rate = error_rate
+        self.bad_nonce_rate = bad_nonce_rate
+        self.validation_delay = validation_delay
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.issued = 0
+        with open(os.path.join(FIXTURES, 'domain.crt'), 'rb') as cert_file:
+            self.certificate = asn1.pem_to_der(cert_file.read().decode('ascii'))[1]
+        self.__lock = threading.RLock()
+        self.__ids = itertools.count(1)
+        self.__nonces = set()
+        self.__accounts = {}
+        self.__authorizations = {}
+        self.__challenges = {}
+        self.__orders = {}
+        self.__server = _Server(('127.0.0.1', 0), _Handler)
+        self.__server.acme = self
+        self.__server.connections = set()
+        self.url = 'http://127.0.0.1:{0}'.format(self.__server.server_address[1])
+
+    def start(self):
+        thread = threading.Thread(target=self.__server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.close_connections()
+        self.__server.server_close()
+
+    def handle(self, handler, method):
+        with self.__lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        body = None
+        if method == 'POST':
+            body = handler.rfile.read(int(handler.headers.get('Content-Length', 0)))
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.__send(handler, 500, {'type': 'urn:acme:error:serverInternal'})
+        try:
+            # the routes lock the server state they read or change, not the whole request
+            code, document, headers = self.__route(method, handler.path, body)
+        except KeyError:
+            code, document, headers = 404, {'type': 'urn:acme:error:malformed', 'detail': 'Not found'}, {}
+        self.__send(handler, code, document, headers)
+
+    def __send(self, handler, code, document, headers=None):
+        body = document if isinstance(document, bytes) else json.dumps(document).encode('utf8')
+        with self.__lock:
+            nonce = _b64(os.urandom(16))
+            self.__nonces.add(nonce)
+        handler.send_response(code)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.send_header('Replay-Nonce', nonce)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+    def __url(self, kind, identifier=None):
+        return "{0}/acme/{1}".format(self.url, kind) + ("" if identifier is None else "/{0}".format(identifier))
+
+    def __route(self, method, path, body):
+        parts = path.strip('/').split('/')
+        if path == '/directory':
+            return 200, self.directory(), {}
+        if method == 'HEAD':
+            return 200, b'', {}
+        if method == 'GET' and parts[1] == 'issuer-cert':
+            return 200, self.certificate, {}
+
+        request = None
+        if method == 'POST':
+            request = self.__decode(body)
+            if request is None:
+                return 400, {'type': 'urn:acme:error:badNonce', 'detail': 'Invalid nonce'}, {}
+            if self.version == 1 and parts[1] == 'new-reg':
+                return self.__new_account(request)
+            if self.version == 2 and parts[1] == 'new-account':
+                return self.__new_account(request)
+        if parts[1] == 'new-authz':
+            return self.__new_authorization(request['account'], request['payload']['identifier']['value'])
+        if parts[1] == 'new-order':
+            return self.__new_order(request)
+        if parts[1] == 'new-cert':
+            return self.__new_cert(request, _b64decode(request['payload']['csr']))
+        resource = getattr(self, '_FakeAcmeServer__' + parts[1].replace('-', '_'))
+        return resource(parts[2], request)
+
+    def __decode(self, body):
+        jws = json.loads(body.decode('utf8'))
+        protected = json.loads(_b64decode(jws['protected']).decode('utf8'))
+        with self.__lock:
+            if protected.get('nonce') not in self.__nonces:
+                return None
+            self.__nonces.discard(protected['nonce'])
+        if self.bad_nonce_rate and self.random.random() < self.bad_nonce_rate:
+            return None
+        jwk = protected.get('jwk')
+        if jwk is None:
+            with self.__lock:
+                jwk = self.__accounts[protected['kid']]
+        payload = _b64decode(jws['payload']).decode('utf8') if jws['payload'] else None
+        return {'account': _thumbprint(jwk), 'jwk': jwk, 'payload': json.loads(payload) if payload else None}
+
+    def directory(self):
+        if self.version == 1:
+            return {'new-reg': self.__url('new-reg'), 'new-authz': self.__url('new-authz'),
+                    'new-cert': self.__url('new-cert')}
+        return {'newNonce': self.__url('new-nonce'), 'newAccount': self.__url('new-account'),
+                'newOrder': self.__url('new-order')}
+
+    def __new_account(self, request):
+        kid = self.__url('account', request['account'])
+        with self.__lock:
+            known = kid in self.__accounts
+            self.__accounts[kid] = request['jwk']
+        if self.version == 1:
+            return (409 if known else 201), {}, {'Location': kid}
+        return (200 if known else 201), {'status': 'valid'}, {'Location': kid}
+
+    def __new_authorization(self, account, domain):
+        with self.__lock:
+            for authorization in self.__authorizations.values():
+                if authorization['_account'] == account and authorization['identifier']['value'] == domain \
+                        and authorization['status'] in ('pending', 'valid'):
+                    return 201, self.__public(authorization), {'Location': authorization['_uri']}
+            authorization_id = next(self.__ids)
+            challenge = {
+                'type': 'dns-01', 'status': 'pending', 'token': _b64(os.urandom(16)),
+                '_authorization': authorization_id, '_validated': None,
+            }
+            challenge['uri' if self.version == 1 else 'url'] = self.__url('challenge', authorization_id)
+            authorization = {
+                'identifier': {'type': 'dns', 'value': domain}, 'status': 'pending', '_account': account,
+                'expires': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 7 * 86400)),
+                'challenges': [challenge], '_uri': self.__url('authz', authorization_id),
+            }
+            self.__authorizations[authorization_id] = authorization
+            self.__challenges[authorization_id] = challenge
+            return 201, self.__public(authorization), {'Location': authorization['_uri']}
+
+    @staticmethod
+    def __public(resource):
+        # resources without their private fields
+        if isinstance(resource, list):
+            return [FakeAcmeServer.__public(item) for item in resource]
+        if not isinstance(resource, dict):
+            return resource
+        return dict((key, FakeAcmeServer.__public(value)) for key, value in resource.items()
+                    if not key.startswith('_'))
+
+    def __authz(self, authorization_id, request):
+        with self.__lock:
+            authorization = self.__authorizations[int(authorization_id)]
+            self.__refresh(authorization)
+            return 200, self.__public(authorization), {}
+
+    def __challenge(self, challenge_id, request):
+        with self.__lock:
+            challenge = self.__challenges[int(challenge_id)]
+            authorization = self.__authorizations[challenge['_authorization']]
+            if request is not None and request['payload'] is not None:
+                # challenge response, check the TXT record once validation_delay is elapsed
+                if challenge['_validated'] is None:
+                    key_authorization = "{0}.{1}".format(challenge['token'], authorization['_account'])
+                    expected = _b64(hashlib.sha256(key_authorization.encode('utf8')).digest())
+                    valid = expected in self.dns.txt('_acme-challenge.' + authorization['identifier']['value'])
+                    challenge['_validated'] = (time.time() + self.validation_delay, valid)
+                self.__refresh(authorization)
+                return (202 if self.version == 1 else 200), self.__public(challenge), {}
+            self.__refresh(authorization)
+            return 200, self.__public(challenge), {}
+
+    def __refresh(self, authorization):
+        # called with the lock held
+        challenge = authorization['challenges'][0]
+        if challenge['status'] == 'pending' and challenge['_validated'] is not None \
+                and challenge['_validated'][0] <= time.time():
+            challenge['status'] = 'valid' if challenge['_validated'][1] else 'invalid'
+            authorization['status'] = challenge['status']
+
+    def __authorized(self, account, der):
+        names = CertificateRequest(der).names
+        with self.__lock:
+            for name in names:
+                authorized = [a for a in self.__authorizations.values()
+                              if a['_account'] == account and a['identifier']['value'] == name]
+                for authorization in authorized:
+                    self.__refresh(authorization)
+                if not [a for a in authorized if a['status'] == 'valid']:
+                    return False
+        return True
+
+    def __new_cert(self, request, der):
+        if not self.__authorized(request['account'], der):
+            return 403, {'type': 'urn:acme:error:unauthorized', 'detail': 'Unauthorized names'}, {}
+        with self.__lock:
+            self.issued += 1
+        return 201, self.certificate, {'Link': '<{0}>;rel="up"'.format(self.__url('issuer-cert'))}
+
+    def __new_order(self, request):
+        identifiers = request['payload']['identifiers']
+        authorizations = []
+        for identifier in identifiers:
+            code, authorization, headers = self.__new_authorization(request['account'], identifier['value'])
+            authorizations.append(headers['Location'])
+        with self.__lock:
+            order_id = next(self.__ids)
+            order = {
+                'status': 'pending', 'identifiers': identifiers, 'authorizations': authorizations,
+                'finalize': self.__url('finalize', order_id), '_account': request['account'],
+            }
+            self.__orders[order_id] = order
+            return 201, self.__public(order), {'Location': self.__url('order', order_id)}
+
+    def __order(self, order_id, request):
+        with self.__lock:
+            return 200, self.__public(self.__orders[int(order_id)]), {}
+
+    def __finalize(self, order_id, request):
+        with self.__lock:
+            order = self.__orders[int(order_id)]
+        if not self.__authorized(request['account'], _b64decode(request['payload']['csr'])):
+            return 403, {'type': 'urn:ietf:params:acme:error:unauthorized', 'detail': 'Unauthorized names'}, {}
+        with self.__lock:
+            self.issued += 1
+            order['status'] = 'valid'
+            order['certificate'] = self.__url('cert', order_id)
+            return 200, self.__public(order), {}
+
+    def __cert(self, order_id, request):
+        pem = asn1.der_to_pem(self.certificate)
+        return 200, (pem + pem).encode('ascii'), {}
@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import unittest
+from ovh.exceptions import ResourceNotFoundError
+from acmedns.adapter.ovh_adapter import OvhAdapter
+
+
+class OvhAdapterTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.adapter = OvhAdapter()
+        self.adapter.client = mock.Mock()
+        self.ids = iter(range(100))
+        self.adapter.client.post.side_effect = lambda path, **kwargs: \
+            {'zone': path.split('/')[3], 'id': next(self.ids)} if path.endswith('/record') else None
+
+    def refreshed_zones(self):
+        return [c[0][0] for c in self.adapter.client.post.call_args_list if c[0][0].endswith('/refresh')]
+
+    def test_deploy_challenges_refresh_each_zone_once(self):
+        records = self.adapter.deploy_challenges([
+            ('example.com', '_acme-challenge', 'token1'),
+            ('example.com', '_acme-challenge.www', 'token2'),
+            ('example.org', '_acme-challenge', 'token3'),
+        ])
+
+        self.assertListEqual([r['id'] for r in records], [0, 1, 2])
+        self.assertListEqual(self.refreshed_zones(),
+                             ['/domain/zone/example.com/refresh', '/domain/zone/example.org/refresh'])
+
+    def test_delete_challenges_refresh_each_zone_once(self):
+        self.adapter.delete_challenges([
+            {'zone': 'example.com', 'id': 1},
+            {'zone': 'example.com', 'id': 2},
+        ])
+
+        self.assertEqual(self.adapter.client.delete.call_count, 2)
+        self.assertListEqual(self.refreshed_zones(), ['/domain/zone/example.com/refresh'])
+
+    def test_delete_challenges_continues_after_error(self):
+        self.adapter.client.delete.side_effect = [IOError("timeout"), ResourceNotFoundError(), None]
+
+        with self.assertRaises(IOError):
+            self.adapter.delete_challenges([
+                {'zone': 'example.com', 'id': 1},
+                {'zone': 'example.com', 'id': 2},
+                {'zone': 'example.org', 'id': 3},
+            ])
+
+        self.assertEqual(self.adapter.client.delete.call_count, 3)
+        self.assertListEqual(self.refreshed_zones(),
+                             ['/domain/zone/example.com/refresh', '/domain/zone/example.org/refresh'])
+
+if __name__ == '__main__':
+    unittest.main()
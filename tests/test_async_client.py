@@ -0,0 +1,128 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+import mock
+from acmedns.client import ClientConfig
+from acmedns.domain import DomainManager, SignResult
+from acmedns.keys import KeyManager
+from acmedns.ratelimit import IssuanceScheduler, RateLimiter
+from acmedns.store import JsonStore
+from fakes import FIXTURES, DnsServerProtocol, FakeAcmeServer, FakeDns, MemoryAdapter, make_csrs
+try:
+    import asyncio
+    from acmedns.adapter.async_adapter import SyncAdapter, async_adapter
+    from acmedns.async_client import AsyncClient, AsyncPropagationChecker
+except (ImportError, SyntaxError):
+    # Python 2
+    asyncio = None
+
+
+@unittest.skipIf(asyncio is None, "asyncio requires Python 3")
+class AsyncClientTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.adapter = MemoryAdapter()
+        self.dns = FakeDns(self.adapter, '127.0.0.1')
+        self.patchers = self.dns.patch()
+        for patcher in self.patchers:
+            patcher.start()
+        self.server = FakeAcmeServer(self.adapter, version=2, seed=1).start()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self.server.stop()
+        for patcher in self.patchers:
+            patcher.stop()
+        shutil.rmtree(self.directory)
+
+    def test_sync_adapter(self):
+        adapter = async_adapter(self.adapter)
+        self.assertIsInstance(adapter, SyncAdapter)
+        self.assertIs(async_adapter(adapter), adapter)
+        records = self.loop.run_until_complete(adapter.deploy_challenges([('example.com', '_acme-challenge', 'a')]))
+        self.assertEqual(self.adapter.txt('_acme-challenge.example.com'), ['a'])
+        self.loop.run_until_complete(adapter.delete_challenges(records))
+        self.assertEqual(self.adapter.txt('_acme-challenge.example.com'), [])
+
+    def test_sign_all(self):
+        # nameservers of every zone answer on a local UDP port
+        transport, protocol = self.loop.run_until_complete(self.loop.create_datagram_endpoint(
+            lambda: DnsServerProtocol(self.dns), local_addr=('127.0.0.1', 0)))
+        port = transport.get_extra_info('sockname')[1]
+        csr_files = make_csrs(self.directory, 5)
+        config = ClientConfig(self.server.url, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              acme_version=2)
+        client = AsyncClient(config, self.adapter, propagation=AsyncPropagationChecker(port=port), concurrency=3)
+        try:
+            results = self.loop.run_until_complete(client.sign_all(csr_files))
+        finally:
+            client.close()
+            transport.close()
+
+        self.assertListEqual([result.status for result in results], [SignResult.SIGNED] * 5)
+        self.assertEqual(self.server.issued, 5)
+        self.assertTrue(os.path.isfile(results[0].cert_file.replace('.crt', '.chained.pem')))
+        self.assertFalse([name for name, tokens in self.adapter.records.items() if tokens])
+
+        # valid certificates are not signed again
+        client = AsyncClient(config, self.adapter)
+        try:
+            results = self.loop.run_until_complete(client.sign_all(csr_files))
+        finally:
+            client.close()
+        self.assertListEqual([result.status for result in results], [SignResult.VALID] * 5)
+
+    @mock.patch('acmedns.async_client.AsyncPropagationChecker.nameservers', return_value=[])
+    def test_domain_manager(self, mock_nameservers):
+        # TXT records are looked up with the system resolver of FakeDns, the event loop is the manager's
+        csr_files = make_csrs(self.directory, 3)
+        hostname = os.path.join(self.directory, 'www.example.org.csr')
+        config = ClientConfig(self.server.url, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              acme_version=2, deploy_hooks=['reload'])
+        override = ClientConfig(self.server.url, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                                acme_version=2, deploy_hooks=['restart'])
+        hooks = mock.Mock()
+        scheduler = IssuanceScheduler(RateLimiter(JsonStore(None), 'account'))
+        manager = DomainManager(config, self.adapter, csr_files + [hostname], 2, scheduler=scheduler,
+                                domain_configs={hostname: override}, hooks=hooks,
+                                keys=KeyManager({hostname: ['www.example.org']}), use_async=True)
+        results = manager.sign_all()
+
+        self.assertListEqual([result.status for result in results], [SignResult.SIGNED] * 4)
+        self.assertEqual(self.server.issued, 4)
+        self.assertTrue(os.path.isfile(hostname.replace('.csr', '.key')))
+        self.assertTrue(all(result.duration is not None for result in results))
+        hooks.run.assert_called_once_with([(['reload'], result.cert_file) for result in results[:3]] +
+                                          [(['restart'], results[3].cert_file)])
+        self.assertFalse([name for name, tokens in self.adapter.records.items() if tokens])
+
+        config.acme_version = 1
+        self.assertRaises(ValueError, DomainManager, config, self.adapter, csr_files, use_async=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import tempfile
+import unittest
+from acmedns.authz import AuthorizationCache
+from acmedns.store import JsonStore
+
+
+class AuthorizationCacheTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, 'authorizations.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_persisted_by_account(self):
+        cache = AuthorizationCache(JsonStore(self.path), 'thumbprint')
+        cache.add('example.com', 'http://acme/authz/1', '2099-01-20T14:09:07.99Z')
+
+        self.assertEqual(AuthorizationCache(JsonStore(self.path), 'thumbprint').get('example.com'),
+                         'http://acme/authz/1')
+        self.assertIsNone(AuthorizationCache(JsonStore(self.path), 'other').get('example.com'))
+
+    def test_evict_expired_and_invalid(self):
+        cache = AuthorizationCache(JsonStore(self.path), 'thumbprint')
+        cache.add('expired.example.com', 'http://acme/authz/1', '2016-01-20T14:09:07Z')
+        cache.add('example.com', 'http://acme/authz/2', '2099-01-20T14:09:07Z')
+
+        self.assertIsNone(cache.get('expired.example.com'))
+        self.assertTrue(cache.check('example.com', 'http://acme/authz/2',
+                                    {'status': 'valid', 'expires': '2099-02-20T14:09:07Z'}))
+        self.assertFalse(cache.check('example.com', 'http://acme/authz/2', {'status': 'invalid'}))
+        self.assertIsNone(cache.get('example.com'))
+        self.assertListEqual(JsonStore(self.path).items(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import os
+import unittest
+from acmedns import asn1
+from acmedns.chain import ChainCache, link_up
+from acmedns.store import JsonStore
+from acmedns.transport import Response
+try:
+    from http.client import BadStatusLine  # Python 3
+except ImportError:
+    from httplib import BadStatusLine  # Python 2
+
+CERT_FILE = os.path.join(os.path.dirname(__file__), 'fixtures', 'domain.crt')
+URL = 'https://acme/acme/issuer-cert'
+
+
+class ChainCacheTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        with open(CERT_FILE, 'rb') as cert_file:
+            self.pem = cert_file.read()
+        self.der = asn1.pem_to_der(self.pem)[1]
+        self.transport = mock.Mock()
+        self.store = JsonStore(None)
+
+    def test_link_up(self):
+        response = Response(201, [('Link', '</acme/issuer-cert>;rel="up"'),
+                                  ('Link', '<https://acme/terms>;rel="terms-of-service"')], b'')
+        self.assertEqual(link_up(response, 'https://acme/acme/new-cert'), URL)
+        self.assertIsNone(link_up(Response(201, [], b''), URL))
+
+    def test_get_cached_and_revalidated(self):
+        self.transport.get.return_value = Response(200, [('ETag', '"v1"')], self.der)
+        cache = ChainCache(self.transport, self.store, ttl=3600)
+
+        self.assertEqual(cache.get(URL), asn1.der_to_pem(self.der).encode('ascii'))
+        self.assertEqual(cache.get(URL), asn1.der_to_pem(self.der).encode('ascii'))
+        self.assertEqual(self.transport.get.call_count, 1)
+
+        cache.ttl = 0
+        self.transport.get.return_value = Response(304, [], b'')
+        self.assertEqual(cache.get(URL), asn1.der_to_pem(self.der).encode('ascii'))
+        self.transport.get.assert_called_with(URL, {'If-None-Match': '"v1"'})
+
+        self.transport.get.side_effect = IOError("connection reset")
+        self.assertEqual(cache.get(URL), asn1.der_to_pem(self.der).encode('ascii'))
+        self.transport.get.side_effect = BadStatusLine("")
+        self.assertEqual(cache.get(URL), asn1.der_to_pem(self.der).encode('ascii'))
+
+    def test_get_pem(self):
+        self.transport.get.return_value = Response(200, [], self.pem)
+        self.assertEqual(ChainCache(self.transport, self.store).get(URL), self.pem)
+
+if __name__ == '__main__':
+    unittest.main()
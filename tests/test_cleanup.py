@@ -0,0 +1,79 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import unittest
+from acmedns.cleanup import CleanupQueue
+
+
+class CleanupQueueTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.adapter = mock.Mock()
+        self.queue = CleanupQueue(self.adapter, delay=60, retries=1, retry_delay=0.01)
+
+    def test_flush_deletes_per_zone(self):
+        self.queue.put('example.com', ['a'])
+        self.queue.put('example.org', ['b'])
+        self.queue.put('example.com', ['c'])
+        # nothing deleted before the end of the collection delay
+        self.assertEqual(self.adapter.delete_challenges.call_count, 0)
+        self.assertEqual(self.queue.pending(), 3)
+
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertListEqual(sorted(c[0][0] for c in self.adapter.delete_challenges.call_args_list),
+                             [['a', 'c'], ['b']])
+        self.assertEqual(self.queue.pending(), 0)
+        self.queue.close()
+
+    def test_retry_failed_deletes(self):
+        self.adapter.delete_challenges.side_effect = [IOError("API down"), None]
+        self.queue.put('example.com', ['a'])
+        # the retry runs before flush returns
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertEqual(self.adapter.delete_challenges.call_count, 2)
+        self.assertEqual(self.queue.pending(), 0)
+        self.queue.close()
+
+        self.assertRaises(ValueError, self.queue.put, 'example.com', ['b'])
+
+    def test_give_up(self):
+        self.adapter.delete_challenges.side_effect = IOError("API down")
+        self.queue.put('example.com', ['a'])
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertEqual(self.adapter.delete_challenges.call_count, 2)
+        self.queue.close()
+
+    def test_flush_timeout(self):
+        self.adapter.delete_challenges.side_effect = [IOError("API down"), None]
+        queue = CleanupQueue(self.adapter, delay=60, retries=1, retry_delay=60)
+        queue.put('example.com', ['a'])
+        # the retry is not due before the timeout
+        self.assertEqual(queue.flush(timeout=0.2), 1)
+        self.assertEqual(self.adapter.delete_challenges.call_count, 1)
+        # retried at once on close
+        queue.close(timeout=0.2)
+        self.assertEqual(self.adapter.delete_challenges.call_count, 2)
+        self.assertEqual(queue.pending(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import base64
+import json
+import mock
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from acmedns import nonce
+from acmedns.client import Client, ClientConfig
+from acmedns.client_v2 import ClientV2
+from acmedns.transport import Response
+from acmedns.x509 import CertificateRequest
+from fakes import FIXTURES
+
+ACME_V2 = 'http://acme-v2'
+
+
+def b64decode(value):
+    return base64.urlsafe_b64decode(str(value) + '=' * (-len(value) % 4))
+
+
+def problem(code, error):
+    return Response(code, [('Replay-Nonce', 'nonce-' + error)],
+                    json.dumps({'type': 'urn:ietf:params:acme:error:' + error}).encode('utf8'))
+
+
+class ClientTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = mock.Mock()
+        config = ClientConfig('http://acme', os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              retries=2)
+        self.client = Client(config, mock.Mock(), self.transport)
+        for i in range(5):
+            self.client.nonces.add('nonce-{0}'.format(i + 1))
+        self.patcher = mock.patch('acmedns.client.time.sleep')
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.client.close()
+
+    def nonces(self):
+        # nonces of the JWS posted
+        return [json.loads(b64decode(json.loads(c[0][1].decode('utf8'))['protected']).decode('utf8'))['nonce']
+                for c in self.transport.post.call_args_list]
+
+    def test_post_signed_again_on_error(self):
+        self.transport.post.side_effect = [socket.error("reset"), problem(503, 'serverInternal'),
+                                           Response(201, [], b'{}')]
+
+        self.assertEqual(self.client._send_signed_request('http://acme/new-reg', {}).code, 201)
+        self.assertListEqual(self.nonces(), ['nonce-1', 'nonce-2', 'nonce-3'])
+
+    def test_post_gives_up(self):
+        self.transport.post.side_effect = socket.error("reset")
+        self.assertRaises(socket.error, self.client._send_signed_request, 'http://acme/new-reg', {})
+        self.assertEqual(self.transport.post.call_count, 3)
+
+    def test_bad_nonce_does_not_count_as_retry(self):
+        self.transport.post.side_effect = [problem(400, 'badNonce'), problem(503, 'serverInternal'),
+                                           problem(400, 'badNonce'), problem(503, 'serverInternal'),
+                                           Response(201, [], b'{}')]
+        self.assertEqual(self.client._send_signed_request('http://acme/new-reg', {}).code, 201)
+        self.assertListEqual(self.nonces(), ['nonce-1', 'nonce-2', 'nonce-3', 'nonce-4', 'nonce-5'])
+
+class ClientV2TestSuite(unittest.TestCase):
+
+    def setUp(self):
+        nonce._directories.clear()
+        self.directory = tempfile.mkdtemp()
+        self.csr_file = os.path.join(self.directory, 'domain.csr')
+        shutil.copy(os.path.join(FIXTURES, 'domain.csr'), self.csr_file)
+        with open(os.path.join(FIXTURES, 'domain.crt'), 'rb') as cert:
+            self.cert = cert.read()
+        self.names = CertificateRequest.from_file(self.csr_file).names
+
+        self.requests = []
+        self.statuses = {ACME_V2 + '/challenge/1': ['pending', 'valid'], ACME_V2 + '/order/1': ['valid']}
+        self.transport = mock.Mock()
+        self.transport.get.side_effect = self.get
+        self.transport.post.side_effect = self.post
+        self.transport.request.return_value = Response(200, [('Replay-Nonce', 'new-nonce')], b'')
+
+        config = ClientConfig(ACME_V2, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              acme_version=2)
+        self.adapter = mock.Mock()
+        self.adapter.deploy_challenges.return_value = ['record']
+        self.client = ClientV2(config, self.adapter, self.transport)
+        self.client.zones = mock.Mock()
+        self.client.zones.split.side_effect = lambda domain: ('example.com', '_acme-challenge')
+        self.client.propagation = mock.Mock()
+        self.client.propagation.wait.return_value = []
+        self.patcher = mock.patch('acmedns.poller.time.sleep')
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.client.close()
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def response(code, body=None, headers=()):
+        return Response(code, [('Replay-Nonce', 'nonce')] + list(headers),
+                        body if isinstance(body, bytes) else json.dumps(body).encode('utf8'))
+
+    def get(self, url, headers=None):
+        self.assertEqual(url, ACME_V2 + '/directory')
+        return self.response(200, {'newNonce': ACME_V2 + '/new-nonce', 'newAccount': ACME_V2 + '/new-account',
+                                   'newOrder': ACME_V2 + '/new-order'})
+
+    def post(self, url, body, headers=None):
+        jws = json.loads(body.decode('utf8'))
+        protected = json.loads(b64decode(jws['protected']).decode('utf8'))
+        payload = json.loads(b64decode(jws['payload']).decode('utf8')) if jws['payload'] else None
+        self.assertEqual(protected['url'], url)
+        self.requests.append((url.replace(ACME_V2, ''), payload, 'kid' in protected))
+
+        if url.endswith('/new-account'):
+            return self.response(201, {}, [('Location', ACME_V2 + '/account/1')])
+        if url.endswith('/new-order'):
+            return self.response(201, {'status': 'pending', 'finalize': ACME_V2 + '/order/1/finalize',
+                                       'authorizations': [ACME_V2 + '/authz/{0}'.format(i)
+                                                          for i in range(len(payload['identifiers']))]},
+                                 [('Location', ACME_V2 + '/order/1')])
+        if url.endswith('/authz/0'):
+            return self.response(200, {'status': 'pending', 'identifier': {'type': 'dns', 'value': self.names[0]},
+                                       'challenges': [{'type': 'http-01', 'url': ACME_V2 + '/challenge/0',
+                                                       'token': 'http'},
+                                                      {'type': 'dns-01', 'url': ACME_V2 + '/challenge/1',
+                                                       'token': 'dns'}]})
+        if url.startswith(ACME_V2 + '/authz/'):
+            return self.response(200, {'status': 'valid', 'identifier': {'type': 'dns', 'value': 'valid'}})
+        if url.endswith('/challenge/1') and payload == {}:
+            return self.response(200, {'status': 'pending'})
+        if url.endswith('/finalize'):
+            return self.response(200, {'status': 'processing'})
+        if url.endswith('/cert/1'):
+            return self.response(200, self.cert + self.cert)
+        status = self.statuses[url].pop(0)
+        return self.response(200, {'status': status, 'certificate': ACME_V2 + '/cert/1'}, [('Retry-After', '0')])
+
+    def test_sign(self):
+        self.client.reg_account()
+        cert_file = self.client.sign(self.csr_file)
+
+        self.assertEqual(cert_file, os.path.join(self.directory, 'domain.crt'))
+        with open(cert_file, 'rb') as cert:
+            self.assertEqual(cert.read().strip(), self.cert.strip())
+        with open(os.path.join(self.directory, 'domain.chained.pem'), 'rb') as chained:
+            self.assertEqual(chained.read().count(b'BEGIN CERTIFICATE'), 2)
+
+        authorizations = ['/authz/{0}'.format(i) for i in range(len(self.names))]
+        self.assertListEqual([(url, payload) for url, payload, kid in self.requests], [
+            ('/new-account', {'termsOfServiceAgreed': True, 'contact': ['mailto:admin@example.com']}),
+            ('/new-order', {'identifiers': [{'type': 'dns', 'value': name} for name in self.names]}),
+        ] + [(url, None) for url in authorizations] + [
+            ('/challenge/1', {}),
+            ('/challenge/1', None),
+            ('/challenge/1', None),
+            ('/order/1/finalize', {'csr': Client._b64(CertificateRequest.from_file(self.csr_file).der)}),
+            ('/order/1', None),
+            ('/cert/1', None),
+        ])
+        # the account is registered with its JWK, then every request is signed with its kid
+        self.assertListEqual([kid for url, payload, kid in self.requests], [False] + [True] * (len(self.requests) - 1))
+        self.adapter.deploy_challenges.assert_called_once_with(
+            [('example.com', '_acme-challenge', self.client._challenge(self.names[0], 'dns', '')['dnstoken'])])
+
+    def test_sign_invalid_challenge(self):
+        self.statuses[ACME_V2 + '/challenge/1'] = ['invalid']
+        self.client.reg_account()
+
+        self.assertRaises(ValueError, self.client.sign, self.csr_file)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'domain.crt')))
+        self.client.close()
+        self.adapter.delete_challenges.assert_called_once_with(['record'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,6 +23,8 @@
 import mock
 import unittest
 import os
+import shutil
+import tempfile
 from acmedns.config import ConfigurationManager
 from acmedns.adapter.ovh_adapter import OvhAdapter
 
@@ -38,6 +40,7 @@ class BasicTestSuite(unittest.TestCase):
 
         config_mng = ConfigurationManager.from_filename(TEST_CONFIG_FILENAME)
         self.assertEqual(config_mng.certs_path, '/etc/certs')
+        self.assertEqual(config_mng.workers, 4)
 
         config = config_mng.get_config()
         self.assertEqual(config.acme_url, 'https://acme-v01.api.letsencrypt.org')
@@ -49,5 +52,112 @@ class BasicTestSuite(unittest.TestCase):
         domains = config_mng.get_domains()
         self.assertListEqual(domains, ['example.com/example.com.csr', 'example2.com/example2.com.csr'], "")
 
+
+class DomainsTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for path in ['fleet/a/a.csr', 'fleet/b/b.csr', 'fleet/b/.hidden.csr', 'single/example.com.csr', 'account.key']:
+            self.touch(path)
+        os.mkdir(os.path.join(self.directory, 'conf.d'))
+        self.config_file = self.write('acmedns.conf', '''
+[default]
+include=conf.d
+cache_dir={0}/cache
+
+[client]
+account_key=account.key
+checkend=86400
+
+[domain]
+example.com=single/example.com.csr
+'''.format(self.directory))
+        self.write('conf.d/fleet.conf', '''
+[domain]
+fleet=fleet/*/*.csr
+
+[domain:fleet]
+checkend=604800
+''')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def touch(self, path):
+        path = os.path.join(self.directory, path)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        open(path, 'w').close()
+        return path
+
+    def write(self, path, content):
+        path = os.path.join(self.directory, path)
+        with open(path, 'w') as config_file:
+            config_file.write(content)
+        return path
+
+    def csr(self, path):
+        return os.path.join(self.directory, path)
+
+    def test_include_and_patterns(self):
+        config_mng = ConfigurationManager.from_filename(self.config_file)
+        self.assertListEqual(config_mng.get_domains(),
+                             [self.csr('single/example.com.csr'), self.csr('fleet/a/a.csr'), self.csr('fleet/b/b.csr')])
+
+        domain_configs = config_mng.get_domain_configs()
+        self.assertListEqual(sorted(domain_configs), [self.csr('fleet/a/a.csr'), self.csr('fleet/b/b.csr')])
+        self.assertEqual(domain_configs[self.csr('fleet/a/a.csr')].checkend, '604800')
+        self.assertEqual(config_mng.get_config().checkend, '86400')
+        self.assertIn(os.path.join(self.directory, 'fleet'), config_mng.watched())
+
+    def test_cache(self):
+        self.assertEqual(len(ConfigurationManager.from_filename(self.config_file).get_domains()), 3)
+
+        # the cached list is used while nothing changes
+        with mock.patch('acmedns.config.os.listdir') as mock_listdir:
+            mock_listdir.return_value = ['fleet.conf']
+            self.assertEqual(len(ConfigurationManager.from_filename(self.config_file).get_domains()), 3)
+            self.assertListEqual([c[0][0] for c in mock_listdir.call_args_list], [self.csr('conf.d')])
+
+        # a new CSR directory invalidates it
+        fleet = os.path.join(self.directory, 'fleet')
+        self.touch('fleet/c/c.csr')
+        os.utime(fleet, (os.stat(fleet).st_atime, os.stat(fleet).st_mtime + 1))
+        self.assertEqual(len(ConfigurationManager.from_filename(self.config_file).get_domains()), 4)
+
+    def test_cache_by_config(self):
+        self.assertEqual(len(ConfigurationManager.from_filename(self.config_file).get_domains()), 3)
+
+        # another configuration sharing the cache directory has its own list
+        with open(self.config_file) as config_file:
+            other_file = self.write('other.conf', config_file.read().replace('single/', 'fleet/a/'))
+        self.touch('fleet/a/example.com.csr')
+        self.assertIn(self.csr('fleet/a/example.com.csr'), ConfigurationManager.from_filename(other_file).get_domains())
+
+        # a new include file is read, and the include directory is watched for it
+        config_mng = ConfigurationManager.from_filename(self.config_file)
+        self.assertIn(self.csr('conf.d'), config_mng.watched())
+        self.touch('new/new.csr')
+        self.write('conf.d/new.conf', '[domain]\nnew=new/new.csr\n')
+        self.assertIn(self.csr('new/new.csr'), ConfigurationManager.from_filename(self.config_file).get_domains())
+
+    def test_hostnames(self):
+        self.write('conf.d/www.conf', '''
+[hostnames]
+www=example.org, www.example.org
+
+[domain:www]
+key_size=4096
+rotate_key=no
+''')
+        config_mng = ConfigurationManager.from_filename(self.config_file)
+        www = self.csr('www.csr')
+
+        self.assertEqual(config_mng.get_domains()[-1], www)
+        self.assertDictEqual(config_mng.get_hostnames(), {www: ['example.org', 'www.example.org']})
+        config = config_mng.get_domain_configs()[www]
+        self.assertEqual((config.key_size, config.rotate_key), (4096, False))
+        self.assertEqual((config_mng.get_config().key_size, config_mng.get_config().rotate_key), (2048, True))
+
 if __name__ == '__main__':
     unittest.main()
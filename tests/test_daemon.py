@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+from acmedns.daemon import RenewalDaemon
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+CONFIG = """
+[default]
+certs_path={0}
+cache_dir={0}/cache
+
+[client]
+acme_url=https://acme-v01.api.letsencrypt.org
+account_key={1}/account.key
+contact_email=staff@example.com
+checkend=86400
+
+[adapter]
+class_name=acmedns.adapter.ManualAdapter
+
+[domain]
+valid=valid.csr
+new=new.csr
+"""
+
+
+class RenewalDaemonTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.certs_dir = tempfile.mkdtemp()
+        for name in ('valid', 'new'):
+            shutil.copy(os.path.join(FIXTURES_DIR, 'domain.csr'), os.path.join(self.certs_dir, name + '.csr'))
+        shutil.copy(os.path.join(FIXTURES_DIR, 'domain.crt'), os.path.join(self.certs_dir, 'valid.crt'))
+        self.config_file = os.path.join(self.certs_dir, 'acmedns.conf')
+        with open(self.config_file, 'w') as config_file:
+            config_file.write(CONFIG.format(self.certs_dir, FIXTURES_DIR))
+
+    def tearDown(self):
+        shutil.rmtree(self.certs_dir)
+
+    @mock.patch('acmedns.domain.Client')
+    def test_run_renew_due_certificates(self, mock_client_class):
+        daemon = RenewalDaemon(self.config_file, jitter=0, retry_delay=60)
+
+        def sign(csr_file, force=False):
+            daemon.stop()
+            raise ValueError("rate limited")
+
+        mock_client_class.return_value.sign.side_effect = sign
+        daemon.run()
+
+        mock_client_class.return_value.sign.assert_called_once_with(os.path.join(self.certs_dir, 'new.csr'),
+                                                                     force=False)
+        # failed certificate retried after retry_delay, valid one renewed before expiry
+        self.assertListEqual([os.path.basename(csr_file) for deadline, csr_file in sorted(daemon.queue)],
+                             ['new.csr', 'valid.csr'])
+        self.assertGreater(sorted(daemon.queue)[1][0] - sorted(daemon.queue)[0][0], 365 * 86400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import unittest
+import dns.name
+import dns.resolver
+from acmedns.delegation import DelegationResolver
+
+
+class DelegationResolverTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = DelegationResolver('acme.example.net.')
+
+    @mock.patch('acmedns.delegation.dns.resolver.query')
+    def test_resolve_delegated(self, mock_query):
+        mock_query.return_value = [mock.Mock(target=dns.name.from_text('www.example.com.acme.example.net'))]
+        self.assertEqual(self.resolver.resolve('www.example.com'), ('acme.example.net', 'www.example.com'))
+        self.assertEqual(self.resolver.resolve('www.example.com'), ('acme.example.net', 'www.example.com'))
+        mock_query.assert_called_once_with('_acme-challenge.www.example.com', 'CNAME')
+
+    @mock.patch('acmedns.delegation.dns.resolver.query')
+    def test_resolve_not_delegated(self, mock_query):
+        self.resolver.ttl = 0
+        mock_query.side_effect = dns.resolver.NXDOMAIN()
+        self.assertIsNone(self.resolver.resolve('example.com'))
+        mock_query.side_effect = None
+        mock_query.return_value = [mock.Mock(target=dns.name.from_text('example.com.other.net'))]
+        self.assertIsNone(self.resolver.resolve('example.com'))
+        self.assertEqual(mock_query.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import shutil
+import tempfile
+import unittest
+from acmedns.client import RateLimitError
+from acmedns.domain import DomainManager, SignResult
+from acmedns.ratelimit import IssuanceScheduler, RateLimiter
+from acmedns.store import JsonStore
+from fakes import make_csrs
+
+
+class DomainManagerTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @mock.patch('acmedns.domain.Client')
+    def test_sign_all_isolates_failures(self, mock_client_class):
+
+        def sign(csr_file, force=False):
+            if csr_file == 'bad.csr':
+                raise ValueError("bad csr")
+            if csr_file == 'valid.csr':
+                return None
+            return csr_file.replace('.csr', '.crt')
+
+        mock_client_class.return_value.sign.side_effect = sign
+
+        domain_mngt = DomainManager(mock.Mock(acme_version=1), None, ['a.csr', 'bad.csr', 'valid.csr', 'b.csr'],
+                                    workers=3)
+        results = domain_mngt.sign_all()
+
+        mock_client_class.return_value.reg_account.assert_called_once_with()
+        self.assertListEqual([r.status for r in results],
+                             [SignResult.SIGNED, SignResult.FAILED, SignResult.VALID, SignResult.SIGNED])
+        self.assertEqual(results[0].cert_file, 'a.crt')
+        self.assertIsInstance(results[1].error, ValueError)
+        self.assertTrue(all(r.duration >= 0 for r in results))
+
+    @mock.patch('acmedns.domain.Client')
+    def test_sign_with_domain_configs(self, mock_client_class):
+        mock_client_class.return_value.sign.side_effect = lambda csr_file, force=False: csr_file.replace('.csr', '.crt')
+        config = mock.Mock(acme_version=1)
+        override = mock.Mock(acme_version=1)
+
+        domain_mngt = DomainManager(config, None, ['a.csr', 'b.csr', 'c.csr'], domain_configs={'b.csr': override})
+        results = domain_mngt.sign_all()
+
+        self.assertListEqual([c[0][0] for c in mock_client_class.call_args_list], [config, override])
+        self.assertListEqual(sorted(r.cert_file for r in results), ['a.crt', 'b.crt', 'c.crt'])
+        self.assertIs(domain_mngt.config_for('b.csr'), override)
+        self.assertIs(domain_mngt.config_for('a.csr'), config)
+
+    @mock.patch('acmedns.domain.Client')
+    def test_rate_limit_defers_rest_of_batch(self, mock_client_class):
+        limiter = RateLimiter(JsonStore(None), 'account')
+        mock_client_class.return_value.sign.side_effect = \
+            RateLimitError("rate limited", "too many new orders recently", 600)
+        csr_files = make_csrs(self.directory, 3)
+
+        domain_mngt = DomainManager(mock.Mock(acme_version=1), None, csr_files, scheduler=IssuanceScheduler(limiter))
+        results = domain_mngt.sign_all()
+
+        self.assertEqual(mock_client_class.return_value.sign.call_count, 1)
+        self.assertListEqual([r.status for r in results],
+                             [SignResult.FAILED, SignResult.DEFERRED, SignResult.DEFERRED])
+        self.assertAlmostEqual(results[1].retry_after, 600, delta=1)
+        self.assertIsNone(results[1].duration)
+
+    @mock.patch('acmedns.domain.Client')
+    def test_sign_runs_hooks_once_per_batch(self, mock_client_class):
+        mock_client_class.return_value.sign.side_effect = \
+            lambda csr_file, force=False: None if csr_file == 'valid.csr' else csr_file.replace('.csr', '.crt')
+        config = mock.Mock(acme_version=1, deploy_hooks=None)
+        override = mock.Mock(acme_version=1, deploy_hooks=['haproxy'])
+        hooks = mock.Mock()
+
+        domain_mngt = DomainManager(config, None, ['a.csr', 'b.csr', 'valid.csr'], domain_configs={'b.csr': override},
+                                    hooks=hooks)
+        domain_mngt.sign_all()
+
+        hooks.run.assert_called_once_with([(None, 'a.crt'), (['haproxy'], 'b.crt')])
+
+if __name__ == '__main__':
+    unittest.main()
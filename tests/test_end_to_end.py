@@ -0,0 +1,110 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+from acmedns.client import ClientConfig
+from acmedns.domain import DomainManager, SignResult
+from acmedns.keys import KeyManager, key_file_names
+from acmedns.x509 import CertificateRequest
+from fakes import FIXTURES, FakeAcmeServer, FakeDns, MemoryAdapter, make_csrs
+
+
+class EndToEndTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csr_files = make_csrs(self.directory, 3)
+        self.adapter = MemoryAdapter()
+        self.patchers = FakeDns(self.adapter).patch()
+        for patcher in self.patchers:
+            patcher.start()
+        self.server = None
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        if self.server is not None:
+            self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def sign(self, version, keys=None, hooks=None, **kwargs):
+        self.server = FakeAcmeServer(self.adapter, version=version, seed=1, **kwargs).start()
+        config = ClientConfig(self.server.url, os.path.join(FIXTURES, 'account.key'), 'admin@example.com', 86400,
+                              acme_version=version, key_size=1024)
+        return DomainManager(config, self.adapter, self.csr_files, workers=2, hooks=hooks, keys=keys).sign_all()
+
+    def assert_signed(self, results):
+        self.assertListEqual([result.status for result in results], [SignResult.SIGNED] * 3)
+        for result in results:
+            self.assertTrue(os.path.isfile(result.cert_file))
+            self.assertTrue(os.path.isfile(result.cert_file.replace('.crt', '.chained.pem')))
+        self.assertEqual(self.server.issued, 3)
+        # every challenge record is cleaned up
+        self.assertEqual(self.adapter.calls['deploy_challenge'], 3)
+        self.assertEqual(self.adapter.calls['delete_challenge'], 3)
+        self.assertFalse([name for name, tokens in self.adapter.records.items() if tokens])
+
+    def test_sign_acme_v1(self):
+        self.assert_signed(self.sign(1))
+
+    def test_sign_acme_v2(self):
+        self.assert_signed(self.sign(2))
+
+    def test_sign_with_bad_nonces(self):
+        self.assert_signed(self.sign(2, bad_nonce_rate=0.2))
+
+    def test_chain_error_keeps_certificate(self):
+        with mock.patch('acmedns.chain.ChainCache.get', side_effect=socket.error("connection reset")):
+            results = self.sign(1)
+        self.assertListEqual([result.status for result in results], [SignResult.FAILED] * 3)
+        for csr_file in self.csr_files:
+            self.assertTrue(os.path.isfile(csr_file.replace('.csr', '.crt')))
+            self.assertFalse(os.path.exists(csr_file.replace('.csr', '.chained.pem')))
+
+    def test_sign_hostnames(self):
+        self.csr_files = [os.path.join(self.directory, 'generated{0}.csr'.format(i)) for i in range(3)]
+        keys = KeyManager(dict((csr_file, ['www{0}.example.com'.format(i)])
+                               for i, csr_file in enumerate(self.csr_files)))
+        hooks = mock.Mock()
+
+        self.assert_signed(self.sign(2, keys, hooks))
+        for csr_file in self.csr_files:
+            self.assertTrue(os.path.isfile(key_file_names(csr_file)[0]))
+        hooks.run.assert_called_once_with([(None, csr_file.replace('.csr', '.crt')) for csr_file in self.csr_files])
+
+        # new names are signed at once, with a new key replacing the previous one
+        self.server.stop()
+        keys.hostnames[self.csr_files[1]] = ['www1.example.com', 'api1.example.com']
+        results = self.sign(2, keys)
+        self.assertListEqual([result.status for result in results],
+                             [SignResult.VALID, SignResult.SIGNED, SignResult.VALID])
+        self.assertListEqual(CertificateRequest.from_file(self.csr_files[1]).names,
+                             ['www1.example.com', 'api1.example.com'])
+        self.assertFalse(os.path.exists(key_file_names(self.csr_files[1])[1]))
+
+if __name__ == '__main__':
+    unittest.main()
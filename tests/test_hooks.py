@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from acmedns.hooks import DeployHooks
+from acmedns.store import write_file
+
+
+class DeployHooksTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def command(self, name):
+        # append the certificate files of the run to a log file per hook
+        return 'echo "$ACMEDNS_CERT_FILES" >> {0}'.format(os.path.join(self.directory, name + '.log'))
+
+    def runs(self, name):
+        with open(os.path.join(self.directory, name + '.log')) as log_file:
+            return log_file.read().splitlines()
+
+    def test_run_each_hook_once(self):
+        hooks = DeployHooks({'nginx': self.command('nginx'), 'haproxy': self.command('haproxy')})
+
+        statuses = hooks.run([(None, 'a.crt'), (['haproxy'], 'b.crt'), (['unknown'], 'c.crt'), (None, 'd.crt')])
+
+        self.assertDictEqual(statuses, {'nginx': 0, 'haproxy': 0})
+        self.assertListEqual(self.runs('nginx'), ['a.crt d.crt'])
+        self.assertListEqual(self.runs('haproxy'), ['a.crt b.crt d.crt'])
+
+    def test_run_nothing_signed(self):
+        hooks = DeployHooks({'nginx': self.command('nginx')})
+        self.assertDictEqual(hooks.run([]), {})
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'nginx.log')))
+
+    def test_failed_hook(self):
+        hooks = DeployHooks({'broken': 'exit 3', 'nginx': self.command('nginx')})
+        self.assertDictEqual(hooks.run([(None, 'a.crt')]), {'broken': 3, 'nginx': 0})
+
+
+class WriteFileTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_file(self):
+        path = os.path.join(self.directory, 'certs', 'example.com.crt')
+        write_file(path, b'cert')
+        with open(path, 'rb') as cert:
+            self.assertEqual(cert.read(), b'cert')
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+        # the mode of the replaced file is kept, no temporary file is left
+        os.chmod(path, 0o640)
+        write_file(path, b'renewed')
+        with open(path, 'rb') as cert:
+            self.assertEqual(cert.read(), b'renewed')
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+        self.assertListEqual(os.listdir(os.path.dirname(path)), ['example.com.crt'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+from acmedns.inventory import Inventory
+from acmedns.x509 import CertificateRequest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class InventoryTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.certs_dir = tempfile.mkdtemp()
+        self.csr_files = []
+        for name in ('a', 'b'):
+            csr_file = os.path.join(self.certs_dir, name + '.csr')
+            shutil.copy(os.path.join(FIXTURES_DIR, 'domain.csr'), csr_file)
+            self.csr_files.append(csr_file)
+        shutil.copy(os.path.join(FIXTURES_DIR, 'domain.crt'), os.path.join(self.certs_dir, 'a.crt'))
+        self.inventory = Inventory(os.path.join(self.certs_dir, 'cache', 'inventory.sqlite'))
+
+    def tearDown(self):
+        self.inventory.close()
+        shutil.rmtree(self.certs_dir)
+
+    def test_expiring(self):
+        self.inventory.refresh(self.csr_files)
+
+        self.assertListEqual(self.inventory.expiring(self.csr_files, 86400), [self.csr_files[1]])
+        self.assertListEqual(self.inventory.expiring(self.csr_files, 11 * 365 * 86400), self.csr_files)
+        self.assertListEqual(self.inventory.get(self.csr_files[0])['names'],
+                             ['example.com', 'www.example.com', 'a.b.example.com'])
+
+    @mock.patch('acmedns.inventory.CertificateRequest')
+    def test_refresh_by_mtime(self, mock_csr):
+        mock_csr.from_file.side_effect = CertificateRequest.from_file
+        self.inventory.refresh(self.csr_files)
+        self.inventory.refresh(self.csr_files)
+        self.assertEqual(mock_csr.from_file.call_count, 2)
+
+        os.utime(self.csr_files[0], (0, 0))
+        os.remove(os.path.join(self.certs_dir, 'a.crt'))
+        self.inventory.refresh(self.csr_files)
+        self.assertEqual(mock_csr.from_file.call_count, 3)
+        self.assertListEqual(self.inventory.expiring(self.csr_files, 86400), self.csr_files)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+from acmedns.keys import KeyManager, key_file_names
+from acmedns.signer import load_rsa_public_numbers
+from acmedns.x509 import CertificateRequest
+
+KEY_SIZE = 1024
+
+
+class KeyManagerTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.www = os.path.join(self.directory, 'www.csr')
+        self.api = os.path.join(self.directory, 'api.csr')
+        self.keys = KeyManager({self.www: ['example.org', 'www.example.org'], self.api: ['api.example.org']}, 2)
+        self.config = mock.Mock(key_size=KEY_SIZE, rotate_key=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def modulus(self, key_file):
+        with open(key_file, 'rb') as key:
+            return load_rsa_public_numbers(key.read())[0]
+
+    def sign(self, csr_file):
+        # write the certificate of csr_file, the CSR and its keys being a minute older
+        open(csr_file.replace('.csr', '.crt'), 'w').close()
+        for filename in (csr_file,) + key_file_names(csr_file):
+            if os.path.exists(filename):
+                mtime = os.stat(filename).st_mtime - 60
+                os.utime(filename, (mtime, mtime))
+
+    def test_generate_in_pool(self):
+        generated = self.keys.prepare([self.www, self.api, 'other.csr'], lambda csr_file: self.config)
+
+        self.assertListEqual(generated, [self.www, self.api])
+        self.assertListEqual(CertificateRequest.from_file(self.www).names, ['example.org', 'www.example.org'])
+        self.assertListEqual(CertificateRequest.from_file(self.api).names, ['api.example.org'])
+        key_file = key_file_names(self.www)[0]
+        self.assertEqual(self.modulus(key_file).bit_length(), KEY_SIZE)
+        self.assertEqual(os.stat(key_file).st_mode & 0o777, 0o600)
+
+    def test_rotate_on_renewal(self):
+        key_file, next_key_file = key_file_names(self.www)
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        modulus = self.modulus(key_file)
+        self.sign(self.www)
+
+        # the renewal CSR is the one of a new key, the key in use is kept until its certificate is written
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        self.assertEqual(self.modulus(key_file), modulus)
+        self.assertNotEqual(self.modulus(next_key_file), modulus)
+
+        next_modulus = self.modulus(next_key_file)
+        self.keys.promote([self.www])
+        self.assertEqual(self.modulus(key_file), next_modulus)
+        self.assertFalse(os.path.exists(next_key_file))
+
+    def test_no_rotation(self):
+        key_file, next_key_file = key_file_names(self.www)
+        self.config.rotate_key = False
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        modulus = self.modulus(key_file)
+        self.sign(self.www)
+
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        self.keys.promote([self.www])
+        self.assertEqual(self.modulus(key_file), modulus)
+        self.assertFalse(os.path.exists(next_key_file))
+
+    def test_changed(self):
+        names = {self.www: ['example.org'], self.api: ['api.example.org'], 'other.csr': ['other.example.org']}
+        self.assertListEqual(self.keys.changed([self.www, self.api, 'other.csr'], names.get), [self.www])
+        self.assertListEqual(self.keys.changed([self.www], lambda csr_file: None), [])
+
+    def test_recover(self):
+        key_file, next_key_file = key_file_names(self.www)
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        self.sign(self.www)
+        self.keys.prepare([self.www], lambda csr_file: self.config)
+        next_modulus = self.modulus(next_key_file)
+
+        # deferred renewal: the certificate is older than the CSR of the next key
+        self.keys.recover([self.www])
+        self.assertTrue(os.path.exists(next_key_file))
+
+        # run stopped after writing the certificate
+        self.sign(self.www)
+        KeyManager(self.keys.hostnames).recover([self.www, self.api])
+        self.assertEqual(self.modulus(key_file), next_modulus)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from acmedns import metrics
+
+
+class MetricsTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        metrics.disable()
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        with metrics.timer('phase', phase='propagation'):
+            metrics.count('http_requests', method='GET')
+        self.assertIsNone(metrics.registry())
+        metrics.export()
+
+    def test_export(self):
+        textfile = os.path.join(self.directory, 'acmedns.prom')
+        json_file = os.path.join(self.directory, 'acmedns.json')
+        registry = metrics.enable(textfile, json_file)
+        for i in range(3):
+            with metrics.timer('phase', phase='propagation'):
+                metrics.count('http_requests', method='GET', code=200)
+        metrics.count('http_bytes', 512, direction='received')
+        registry.observe('phase', 2.0, {'phase': 'validation'})
+        metrics.export()
+
+        with open(textfile) as prom:
+            lines = prom.read().splitlines()
+        self.assertIn('# TYPE acmedns_http_requests_total counter', lines)
+        self.assertIn('acmedns_http_requests_total{code="200",method="GET"} 3', lines)
+        self.assertIn('acmedns_http_bytes_total{direction="received"} 512', lines)
+        self.assertEqual(lines.count('# TYPE acmedns_phase_seconds histogram'), 1)
+        self.assertIn('acmedns_phase_seconds_bucket{phase="validation",le="1"} 0', lines)
+        self.assertIn('acmedns_phase_seconds_bucket{phase="validation",le="2.5"} 1', lines)
+        self.assertIn('acmedns_phase_seconds_bucket{phase="propagation",le="+Inf"} 3', lines)
+        self.assertIn('acmedns_phase_seconds_count{phase="propagation"} 3', lines)
+
+        with open(json_file) as summary_file:
+            summary = json.load(summary_file)
+        timers = dict((timer['labels']['phase'], timer) for timer in summary['timers'])
+        self.assertEqual(timers['propagation']['count'], 3)
+        self.assertEqual(timers['validation']['p99'], 2.0)
+        self.assertFalse([name for name in os.listdir(self.directory) if name.startswith('.tmp-')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import mock
+import unittest
+from acmedns import nonce
+from acmedns.nonce import NoncePool, is_bad_nonce
+from acmedns.transport import Response
+
+
+class NoncePoolTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        nonce._directories.clear()
+
+    def test_reuse_response_nonces(self):
+        transport = mock.Mock()
+        transport.get.return_value = Response(200, [('Replay-Nonce', 'directory-nonce')],
+                                              json.dumps({'new-reg': 'http://acme/new-reg'}).encode('utf8'))
+
+        pool = NoncePool('http://acme', transport)
+        self.assertEqual(pool.directory()['new-reg'], 'http://acme/new-reg')
+        self.assertEqual(pool.get(), 'directory-nonce')
+        pool.add_from(Response(201, [('replay-nonce', 'response-nonce')], b''))
+        self.assertEqual(pool.get(), 'response-nonce')
+        self.assertEqual(NoncePool('http://acme', transport).directory()['new-reg'], 'http://acme/new-reg')
+        self.assertEqual(transport.get.call_count, 1)
+
+        self.assertEqual(pool.get(), 'directory-nonce')
+        self.assertEqual(transport.get.call_count, 2)
+
+    def test_directory_without_nonce(self):
+        transport = mock.Mock()
+        transport.get.return_value = Response(200, [], json.dumps({'newNonce': 'http://acme/new-nonce'}).encode('utf8'))
+        transport.request.return_value = Response(200, [('Replay-Nonce', 'new-nonce')], b'')
+
+        pool = NoncePool('http://acme', transport)
+        pool.directory()
+        self.assertIsNone(pool.pop())
+        self.assertEqual(pool.get(), 'new-nonce')
+        transport.request.assert_called_once_with("HEAD", 'http://acme/new-nonce')
+
+    def test_is_bad_nonce(self):
+        self.assertTrue(is_bad_nonce(400, b'{"type": "urn:acme:error:badNonce"}'))
+        self.assertTrue(is_bad_nonce(400, b'{"type": "urn:ietf:params:acme:error:badNonce"}'))
+        self.assertFalse(is_bad_nonce(400, b'{"type": "urn:acme:error:malformed"}'))
+        self.assertFalse(is_bad_nonce(201, b'{}'))
+
+if __name__ == '__main__':
+    unittest.main()
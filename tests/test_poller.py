@@ -0,0 +1,75 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import json
+import mock
+import unittest
+from acmedns.poller import StatusPoller
+from acmedns.transport import Response
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class StatusPollerTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.requests = []
+        self.statuses = {
+            'http://acme/a': [('pending', '5'), ('valid', None)],
+            'http://acme/b': [('pending', None), ('pending', None), ('invalid', None)],
+        }
+
+    def get(self, uri):
+        self.requests.append((self.clock.now, uri))
+        status, retry_after = self.statuses[uri].pop(0)
+        headers = [('Retry-After', retry_after)] if retry_after else []
+        return Response(200, headers, json.dumps({'status': status}).encode('utf8'))
+
+    @mock.patch('acmedns.poller.time')
+    def test_poll_honours_retry_after(self, mock_time):
+        mock_time.time.side_effect = self.clock.time
+        mock_time.sleep.side_effect = self.clock.sleep
+        transport = mock.Mock()
+        transport.get.side_effect = self.get
+
+        poller = StatusPoller(transport, initial_delay=1)
+        results = [(resource['uri'], status['status'])
+                   for resource, status in poller.poll([{'uri': 'http://acme/a'}, {'uri': 'http://acme/b'}])]
+
+        self.assertListEqual(results, [('http://acme/b', 'invalid'), ('http://acme/a', 'valid')])
+        self.assertListEqual(self.requests, [
+            (1000.0, 'http://acme/a'), (1000.0, 'http://acme/b'),
+            (1001.0, 'http://acme/b'), (1003.0, 'http://acme/b'), (1005.0, 'http://acme/a')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import threading
+import unittest
+import dns.message
+import dns.resolver
+import dns.rrset
+from acmedns.propagation import PropagationChecker
+
+NAME = '_acme-challenge.www.example.com'
+
+
+class PropagationCheckerTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.served = {}
+        self.checker = PropagationChecker(timeout=0)
+
+    def tearDown(self):
+        self.checker.close()
+
+    def udp(self, request, nameserver, timeout):
+        response = dns.message.make_response(request)
+        if nameserver in self.served:
+            response.answer.append(dns.rrset.from_text(NAME, 60, 'IN', 'TXT', '"%s"' % self.served[nameserver]))
+        return response
+
+    @mock.patch('acmedns.propagation.dns.query.udp')
+    @mock.patch('acmedns.propagation.dns.resolver.query')
+    def test_wait_all_nameservers_serve_token(self, mock_query, mock_udp):
+        mock_query.side_effect = lambda name, rdtype: \
+            [mock.Mock(target='ns1.example.com'), mock.Mock(target='ns2.example.com')] if rdtype == 'NS' \
+            else [mock.Mock(address='10.0.0.1' if name == 'ns1.example.com' else '10.0.0.2')]
+        mock_udp.side_effect = self.udp
+        record = ('example.com', NAME, 'token')
+
+        self.served = {'10.0.0.1': 'token', '10.0.0.2': 'stale'}
+        self.assertListEqual(self.checker.wait([record]), [NAME])
+
+        self.served = {'10.0.0.1': 'token', '10.0.0.2': 'token'}
+        self.assertListEqual(self.checker.wait([record]), [])
+
+        # nameservers are looked up once per zone
+        self.assertEqual(mock_query.call_count, 3)
+
+    @mock.patch('acmedns.propagation.dns.query.udp')
+    @mock.patch('acmedns.propagation.dns.resolver.query')
+    def test_wait_system_resolver_without_nameservers(self, mock_query, mock_udp):
+        answers = {'TXT': []}
+
+        def query(name, rdtype):
+            if rdtype == 'NS':
+                raise dns.resolver.NXDOMAIN()
+            return answers[rdtype]
+        mock_query.side_effect = query
+        record = ('example.com', NAME, 'token')
+
+        self.assertListEqual(self.checker.wait([record]), [NAME])
+
+        answers['TXT'] = [mock.Mock(strings=[b'tok', b'en'])]
+        self.assertListEqual(self.checker.wait([record]), [])
+        self.assertFalse(mock_udp.called)
+        self.assertListEqual([c[0] for c in mock_query.call_args_list],
+                             [('example.com', 'NS'), (NAME, 'TXT'), (NAME, 'TXT')])
+
+    @mock.patch('acmedns.propagation.dns.resolver.query')
+    def test_close_stops_threads(self, mock_query):
+        mock_query.side_effect = lambda name, rdtype: [] if rdtype == 'NS' else [mock.Mock(strings=[b'token'])]
+        threads = threading.active_count()
+
+        self.assertListEqual(self.checker.wait([('example.com', NAME, 'token')]), [])
+        self.assertGreaterEqual(threading.active_count(), threads + self.checker.workers)
+        self.checker.close()
+        self.assertEqual(threading.active_count(), threads)
+
+if __name__ == '__main__':
+    unittest.main()
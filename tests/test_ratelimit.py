@@ -0,0 +1,106 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import unittest
+from acmedns.client import RateLimitError, ValidationError
+import threading
+from acmedns.ratelimit import IssuanceScheduler, RateLimiter, CERTIFICATES, FAILED_VALIDATIONS, LIMITS
+from acmedns.store import JsonStore
+
+
+class IssuanceSchedulerTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.inventory = mock.Mock()
+        self.entries = {
+            'a.csr': {'names': ['example.com', 'www.example.com'], 'not_after': 2000},
+            'b.csr': {'names': ['mail.example.com'], 'not_after': 1000},
+            'c.csr': {'names': ['example.org'], 'not_after': None},
+        }
+        self.inventory.get.side_effect = self.entries.get
+        self.limiter = RateLimiter(JsonStore(None), 'account', dict(LIMITS, **{
+            CERTIFICATES: (2, 7 * 86400), FAILED_VALIDATIONS: (1, 3600)}))
+        self.scheduler = IssuanceScheduler(self.limiter, self.inventory)
+
+    def test_plan_by_urgency_within_limits(self):
+        ready, deferred = self.scheduler.plan(['a.csr', 'b.csr', 'c.csr'])
+        self.assertListEqual(ready, ['c.csr', 'b.csr', 'a.csr'])
+        self.scheduler.record('b.csr', True)
+        self.scheduler.record('a.csr', False, ValueError("error"))
+
+        # example.com has room for one more certificate only
+        ready, deferred = self.scheduler.plan(['a.csr', 'b.csr'])
+        self.assertListEqual(ready, ['b.csr'])
+        self.assertListEqual(list(deferred), ['a.csr'])
+        self.assertGreater(deferred['a.csr'], 0)
+
+    def test_record_errors(self):
+        self.scheduler.plan(['a.csr', 'c.csr'])
+        self.scheduler.record('a.csr', False, ValidationError("invalid", 'www.example.com'))
+        self.scheduler.record('c.csr', False, RateLimitError(
+            "rate limited", "Error creating new cert :: too many certificates already issued for: example.org", 60))
+
+        ready, deferred = self.scheduler.plan(['a.csr', 'b.csr', 'c.csr'])
+        self.assertListEqual(ready, ['b.csr'])
+        self.assertAlmostEqual(deferred['c.csr'], 60, delta=1)
+
+    def test_pending_authorizations(self):
+        scheduler = IssuanceScheduler(self.limiter, self.inventory, max_pending=3)
+
+        # pending authorizations limit the CSR in flight, not the CSR planned
+        ready, deferred = scheduler.plan(['a.csr', 'b.csr', 'c.csr'])
+        self.assertListEqual(ready, ['c.csr', 'b.csr', 'a.csr'])
+
+        # 3 pending authorizations at most: c.csr and b.csr have 1 name, a.csr has 2 and waits
+        self.assertTrue(scheduler.acquire('c.csr'))
+        self.assertTrue(scheduler.acquire('b.csr'))
+        self.assertFalse(scheduler.acquire('a.csr', blocking=False))
+
+        # signed or not, their authorizations are no longer pending
+        thread = threading.Thread(target=scheduler.acquire, args=('a.csr',))
+        thread.start()
+        scheduler.record('c.csr', True)
+        scheduler.record('b.csr', False, ValueError("error"))
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        scheduler.plan(['b.csr', 'c.csr'])
+        self.assertTrue(scheduler.acquire('b.csr', blocking=False))
+        self.assertFalse(scheduler.acquire('c.csr', blocking=False))
+        scheduler.cancel('a.csr')
+        self.assertTrue(scheduler.acquire('c.csr', blocking=False))
+
+    def test_blocked_after_planning(self):
+        ready, deferred = self.scheduler.plan(['a.csr', 'b.csr', 'c.csr'])
+        self.assertEqual(self.scheduler.blocked('a.csr'), 0)
+
+        self.scheduler.record('c.csr', False, RateLimitError("rate limited", "too many new orders recently", 120))
+        self.assertAlmostEqual(self.scheduler.blocked('a.csr'), 120, delta=1)
+        self.assertAlmostEqual(self.scheduler.blocked('b.csr'), 120, delta=1)
+
+        # the tokens of a cancelled CSR are given back
+        self.scheduler.cancel('a.csr')
+        self.scheduler.cancel('b.csr')
+        self.assertEqual(self.limiter.wait_time(CERTIFICATES, 'example.com', 2), 0)
+
+if __name__ == '__main__':
+    unittest.main()
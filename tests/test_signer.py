@@ -0,0 +1,62 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import unittest
+from acmedns.client import Client
+from acmedns.signer import load_signer, LazySigner, OpenSSLSigner
+from acmedns.store import JsonStore
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+ACCOUNT_KEY = os.path.join(FIXTURES_DIR, 'account.key')
+ACCOUNT_KEY_PKCS8 = os.path.join(FIXTURES_DIR, 'account.pkcs8.key')
+
+
+class SignerTestSuite(unittest.TestCase):
+
+    def test_public_numbers(self):
+        signer = load_signer(ACCOUNT_KEY)
+        signer_pkcs8 = load_signer(ACCOUNT_KEY_PKCS8)
+
+        self.assertEqual(signer.exponent, 65537)
+        self.assertEqual(signer.modulus.bit_length(), 2048)
+        self.assertEqual(signer.modulus, signer_pkcs8.modulus)
+
+    def test_sign_same_as_openssl(self):
+        data = b'protected.payload'
+        self.assertEqual(load_signer(ACCOUNT_KEY).sign(data), OpenSSLSigner(ACCOUNT_KEY).sign(data))
+
+    def test_cached_account_jwk_does_not_load_key(self):
+        store = JsonStore(None)
+        jwk, thumbprint = Client.cached_account_jwk(LazySigner(ACCOUNT_KEY), store)
+        self.assertEqual((jwk, thumbprint), Client.account_jwk(load_signer(ACCOUNT_KEY)))
+
+        signer = LazySigner(ACCOUNT_KEY)
+        signer.load = None  # any use of the key would fail
+        self.assertEqual(Client.cached_account_jwk(signer, store), (jwk, thumbprint))
+
+        # the JWK of the PKCS#8 encoding of the same key is not mixed up with it
+        self.assertEqual(Client.cached_account_jwk(LazySigner(ACCOUNT_KEY_PKCS8), store), (jwk, thumbprint))
+        self.assertEqual(len(store.items()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
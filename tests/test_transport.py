@@ -0,0 +1,99 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import threading
+import unittest
+from acmedns.transport import HttpTransport
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer  # Python 3
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # Python 2
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    failures = 0
+    posts = 0
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        code, body = 200, b'ok'
+        if self.path == '/flaky' and Handler.failures > 0:
+            Handler.failures -= 1
+            code, body = 503, b'unavailable'
+        self.send_response(code)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Replay-Nonce', 'nonce')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        Handler.posts += 1
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpTransportTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        Handler.connections = set()
+        Handler.posts = 0
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.transport = HttpTransport(timeout=5, backoff=0)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for i in range(5):
+            response = self.transport.get(self.url + '/directory')
+            self.assertEqual(response.code, 200)
+            self.assertEqual(response.header('replay-nonce'), 'nonce')
+        self.assertEqual(len(Handler.connections), 1)
+
+    def test_retry_server_error(self):
+        Handler.failures = 2
+        response = self.transport.get(self.url + '/flaky')
+        self.assertEqual(response.code, 200)
+        self.assertEqual(response.body, b'ok')
+
+        Handler.failures = 5
+        self.assertEqual(self.transport.get(self.url + '/flaky').code, 503)
+
+    def test_post_sent_once(self):
+        self.assertEqual(self.transport.post(self.url + '/new-order', b'jws').code, 503)
+        self.assertEqual(Handler.posts, 1)
+
+if __name__ == '__main__':
+    unittest.main()
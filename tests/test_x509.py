@@ -0,0 +1,53 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import os
+import subprocess
+import unittest
+from acmedns.x509 import Certificate, CertificateRequest
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class X509TestSuite(unittest.TestCase):
+
+    def test_certificate_request(self):
+        csr_file = os.path.join(FIXTURES_DIR, 'domain.csr')
+        csr = CertificateRequest.from_file(csr_file)
+
+        self.assertEqual(csr.common_name, 'example.com')
+        self.assertListEqual(csr.names, ['example.com', 'www.example.com', 'a.b.example.com'])
+        der = subprocess.Popen(["openssl", "req", "-in", csr_file, "-outform", "DER"],
+                               stdout=subprocess.PIPE).communicate()[0]
+        self.assertEqual(csr.der, der)
+        self.assertEqual(CertificateRequest(der).names, csr.names)
+
+    def test_certificate(self):
+        cert = Certificate.from_file(os.path.join(FIXTURES_DIR, 'domain.crt'))
+
+        self.assertListEqual(cert.names, ['example.com', 'www.example.com'])
+        self.assertEqual(cert.not_after.year - cert.not_before.year, 10)
+        self.assertFalse(cert.expires_within(86400))
+        self.assertTrue(cert.expires_within(11 * 365 * 86400))
+
+if __name__ == '__main__':
+    unittest.main()
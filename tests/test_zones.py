@@ -0,0 +1,94 @@
+# -*- encoding: utf-8 -*-
+#
+# Copyright (c) 2016 Wayoos
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import mock
+import unittest
+import dns.resolver
+from acmedns.zones import PublicSuffixList, ZoneResolver
+from fakes import FakeDns
+
+RULES = """
+// comment
+com
+uk
+co.uk
+*.ck
+!www.ck
+"""
+
+
+class PublicSuffixListTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.suffixes = PublicSuffixList(RULES.splitlines())
+
+    def test_registered_domain(self):
+        self.assertEqual(self.suffixes.registered_domain('a.b.example.com'), 'example.com')
+        self.assertEqual(self.suffixes.registered_domain('www.example.co.uk'), 'example.co.uk')
+        self.assertEqual(self.suffixes.registered_domain('a.example.bar.ck'), 'example.bar.ck')
+        self.assertEqual(self.suffixes.registered_domain('a.www.ck'), 'www.ck')
+        self.assertEqual(self.suffixes.registered_domain('example.org'), 'example.org')
+        self.assertIsNone(self.suffixes.registered_domain('co.uk'))
+
+
+class ZoneResolverTestSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.dns = FakeDns(None, zones=('example.com', 'b.example.com', 'example.co.uk'))
+
+    def test_split_from_soa(self):
+        resolver = ZoneResolver()
+        with mock.patch('dns.resolver.query', side_effect=self.dns.query) as mock_query:
+            self.assertEqual(resolver.split('example.com'), ('example.com', '_acme-challenge'))
+            self.assertEqual(resolver.split('a.b.example.com'), ('b.example.com', '_acme-challenge.a'))
+            self.assertEqual(resolver.split('x.y.example.com'), ('example.com', '_acme-challenge.x.y'))
+            self.assertEqual(resolver.split('www.example.co.uk'), ('example.co.uk', '_acme-challenge.www'))
+            calls = mock_query.call_count
+            # zones are cached
+            self.assertEqual(resolver.split('x.y.example.com'), ('example.com', '_acme-challenge.x.y'))
+            self.assertEqual(mock_query.call_count, calls)
+
+    def test_split_cname_to_other_zone(self):
+        # the SOA answered for a CNAME is the one of its target zone
+        cnames = {'www.example.com': 'lb.example.net', 'example.co.uk': 'example.net'}
+        fake_dns = FakeDns(None, zones=('example.com', 'example.net', 'example.co.uk'), cnames=cnames)
+        resolver = ZoneResolver()
+        with mock.patch('dns.resolver.query', side_effect=fake_dns.query):
+            self.assertEqual(resolver.split('www.example.com'), ('example.com', '_acme-challenge.www'))
+            self.assertEqual(resolver.split('a.www.example.com'), ('example.com', '_acme-challenge.a.www'))
+            self.assertEqual(resolver.split('example.co.uk'), ('example.co.uk', '_acme-challenge'))
+
+    @mock.patch('dns.resolver.query', side_effect=dns.resolver.NXDOMAIN())
+    def test_split_from_adapter_zones(self, mock_query):
+        adapter = mock.Mock()
+        adapter.list_zones.return_value = ['example.com', 'sub.example.com']
+        resolver = ZoneResolver(adapter)
+        self.assertEqual(resolver.split('www.sub.example.com'), ('sub.example.com', '_acme-challenge.www'))
+        self.assertEqual(resolver.split('www.example.com'), ('example.com', '_acme-challenge.www'))
+        adapter.list_zones.assert_called_once_with()
+        self.assertEqual(mock_query.call_count, 0)
+
+        # unknown zones fall back to the registered domain
+        self.assertEqual(resolver.split('www.example.co.uk'), ('example.co.uk', '_acme-challenge.www'))
+
+if __name__ == '__main__':
+    unittest.main()